@@ -10,9 +10,17 @@ You should have received a copy of the GNU General Public License along with thi
 '''
 
 import sys
+import os
 import argparse
-import gzip
 import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# shared kb_motupan utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from kb_motupan.Utils.CompressedIO import open_text, strip_codec_ext
+from kb_motupan.Utils.GeneIdMap import GeneIdMapWriter
 
 
 # getargs()
@@ -24,7 +32,8 @@ def getargs():
     parser.add_argument("-c", "--checkminfile", help="input file with checkm scores")
     parser.add_argument("-m", "--motupanfaafile", help="output fasta file for mOTUpan")
     parser.add_argument("-q", "--qualitymotupanfile", help="output quality checkm file for mOTUpan")
-    parser.add_argument("-g", "--geneidmappingfile", help="output gene id mapping file")
+    parser.add_argument("-g", "--geneidmappingfile", help="output binary gene id map file (.gene_id_map.bin)")
+    parser.add_argument("-t", "--threads", type=int, default=1, help="processes for formatting genome faa files in parallel (default: 1)")
     args = parser.parse_args()
 
     if len(sys.argv) < 10:
@@ -63,7 +72,7 @@ def get_fasta_files_from_listfile (listfile):
     with open(listfile, 'r') as f:
         for line in f:
             filepath = line.strip()
-            genome_id = re.sub (r'^.*\/', '', filepath)
+            genome_id = re.sub (r'^.*\/', '', strip_codec_ext (filepath))
             genome_id = re.sub (r'\.faa', '', genome_id)
             genome_id = re.sub (r'\.fasta', '', genome_id)
             genome_id = re.sub (r'_protein', '', genome_id)
@@ -89,7 +98,7 @@ def get_genome_ids_from_faas (input_faa_files):
 def get_checkm_scores (checkminfile):
     checkm_scores = dict()
 
-    with open(checkminfile, 'r') as f:
+    with open_text(checkminfile, 'r') as f:
         for line in f:
             if line.startswith ('accession'):
                 continue
@@ -106,7 +115,7 @@ def get_checkm_scores (checkminfile):
 #
 def write_checkm_file (qualitymotupanfile, checkm_scores, genome_ids):
     
-    with open(qualitymotupanfile, 'w') as f:
+    with open_text(qualitymotupanfile, 'w') as f:
         f.write("\t".join(['Bin Id', 'Completeness', 'Contamination'])+"\n")
         for genome_id in sorted(genome_ids.keys()):
             f.write("\t".join([genome_id, checkm_scores[genome_id]['comp'], checkm_scores[genome_id]['cont']])+"\n")
@@ -114,44 +123,80 @@ def write_checkm_file (qualitymotupanfile, checkm_scores, genome_ids):
     return
 
                     
-# write_faa_file ()
+# rewrite_genome_faa ()
 #
-def write_faa_file (motupanfaafile, input_faa_files):
-    gene_id_mapping = dict()
-
-    with open (motupanfaafile, 'w') as faa_out:
-        
-        for genome_id in sorted(input_faa_files.keys()):
-            gene_cnt = 0
-            if input_faa_files[genome_id].lower().endswith('.gz'):
-                faa_in = gzip.open(input_faa_files[genome_id], 'rt')
+#   returns the old gene ids in gene order (new id ordinal - 1)
+#
+def rewrite_genome_faa (genome_id, faa_path, faa_out):
+    old_gene_ids = []
+    gene_cnt = 0
+
+    with open_text(faa_path, 'r') as faa_in:
+        for faa_line in faa_in:
+            if faa_line.startswith('>'):
+                gene_cnt += 1
+                old_gene_id = faa_line.split()[0].replace('>','')
+                new_gene_id = genome_id+'_'+str(gene_cnt)
+                old_gene_ids.append(old_gene_id)
+                new_faa_line = faa_line.replace(old_gene_id, new_gene_id)
+                faa_out.write(new_faa_line)
             else:
-                faa_in = open(input_faa_files[genome_id], 'r')
-
-            for faa_line in faa_in:
-                if faa_line.startswith('>'):
-                    gene_cnt += 1
-                    old_gene_id = faa_line.split()[0].replace('>','')
-                    new_gene_id = genome_id+'_'+str(gene_cnt)
-                    gene_id_mapping[new_gene_id] = old_gene_id
-                    new_faa_line = faa_line.replace(old_gene_id, new_gene_id)
-                    faa_out.write(new_faa_line)
-                else:
-                    faa_out.write(faa_line)
-                    
-        faa_in.close()
+                faa_out.write(faa_line)
 
-    return gene_id_mapping
+    return old_gene_ids
 
 
-# write_gene_id_mapping_file ()
+# format_genome_faa_shard ()
 #
-def write_gene_id_mapping_file (geneidmappingfile, gene_id_mapping):
+def format_genome_faa_shard (genome_id, faa_path, shard_dir):
+    shard_path = os.path.join (shard_dir, genome_id+'.faa')
+    with open (shard_path, 'w') as shard_out:
+        old_gene_ids = rewrite_genome_faa (genome_id, faa_path, shard_out)
+
+    return (shard_path, old_gene_ids)
+
+                    
+# add_genome_gene_ids ()
+#
+def add_genome_gene_ids (id_map_writer, genome_id, old_gene_ids):
+    id_map_writer.add_genome (genome_id)
+    for old_gene_id in old_gene_ids:
+        id_map_writer.add_gene (old_gene_id)
+
+
+# write_faa_file ()
+#
+#   with threads > 1, each genome is formatted into its own shard by a process
+#   pool and the shards are concatenated in sorted genome order.  old gene ids
+#   go to id_map_writer (GeneIdMapWriter) in the same order.
+#
+def write_faa_file (motupanfaafile, input_faa_files, id_map_writer, threads=1):
+
+    with open_text (motupanfaafile, 'w') as faa_out:
+
+        if threads <= 1:
+            for genome_id in sorted(input_faa_files.keys()):
+                add_genome_gene_ids (id_map_writer, genome_id, rewrite_genome_faa (genome_id, input_faa_files[genome_id], faa_out))
+            return
+
+        shard_dir = tempfile.mkdtemp (prefix='faa_shards.', dir=os.path.dirname(os.path.abspath(motupanfaafile)))
+        try:
+            with ProcessPoolExecutor (max_workers=threads) as executor:
+                shard_futures = dict()
+                for genome_id in sorted(input_faa_files.keys()):
+                    shard_futures[genome_id] = executor.submit (format_genome_faa_shard,
+                                                                genome_id,
+                                                                input_faa_files[genome_id],
+                                                                shard_dir)
+                for genome_id in sorted(input_faa_files.keys()):
+                    (shard_path, old_gene_ids) = shard_futures[genome_id].result()
+                    with open (shard_path, 'r') as shard_in:
+                        shutil.copyfileobj (shard_in, faa_out, 1024*1024)
+                    os.remove (shard_path)
+                    add_genome_gene_ids (id_map_writer, genome_id, old_gene_ids)
+        finally:
+            shutil.rmtree (shard_dir, ignore_errors=True)
 
-    with open (geneidmappingfile, 'w') as f_out:
-        for new_gene_id in sorted(gene_id_mapping.keys()):
-            f_out.write("\t".join([new_gene_id, gene_id_mapping[new_gene_id]])+"\n")
-            
 
 # main()
 #
@@ -170,11 +215,9 @@ def main() -> int:
     # write new checkm file
     write_checkm_file (args.qualitymotupanfile, checkm_scores, genome_ids)
 
-    # write new faa file
-    gene_id_mapping = write_faa_file (args.motupanfaafile, input_faa_files)
-
-    # write gene id mapping file
-    write_gene_id_mapping_file (args.geneidmappingfile, gene_id_mapping)
+    # write new faa file and gene id map
+    with GeneIdMapWriter (args.geneidmappingfile) as id_map_writer:
+        write_faa_file (args.motupanfaafile, input_faa_files, id_map_writer, threads=args.threads)
     
     print ("DONE")
     return 0
@@ -12,10 +12,18 @@ You should have received a copy of the GNU General Public License along with thi
 import sys
 import os
 import argparse
-import gzip
 import re
-import json
 import hashlib
+from array import array
+
+# shared kb_motupan utils (lib is also on PYTHONPATH when run by the module)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from kb_motupan.Utils.AnnotationCache import open_store_annotations, open_genome_obj_annotations
+from kb_motupan.Utils.CompressedIO import open_text, strip_codec_ext
+from kb_motupan.Utils.MMseqsClusters import read_cluster_genes
+from kb_motupan.Utils.GeneCodes import ORDINAL_BITS, ORDINAL_MASK
+from kb_motupan.Utils.GeneIdMap import open_gene_id_map
+from kb_motupan.Utils.JSONStream import dump_streaming
 
 
 # getargs()
@@ -26,8 +34,10 @@ def getargs():
     parser.add_argument("-m", "--mOTUpan_infile", help="mOTUpan output file to reformat")
     parser.add_argument("-r", "--reference_map_infile", help="genome name to kbase object reference map file")
     parser.add_argument("-j", "--json_genome_obj_paths_file", help="genome json objs paths mapping file")
+    parser.add_argument("-s", "--annotation_store_file", help="genome feature annotation store (sqlite)")
     parser.add_argument("-g", "--genefamily_mmseqs_infile", help="mmseqs2 gene family clusters file")
-    parser.add_argument("-i", "--id_map_file", help="file with gene id mapping")
+    parser.add_argument("-k", "--cluster_genes_file", help="cluster members json saved by cluster conversion (instead of --genefamily_mmseqs_infile)")
+    parser.add_argument("-i", "--id_map_file", help="gene id map file (binary .gene_id_map.bin, or older text map)")
     parser.add_argument("-p", "--pangenome_outfile", help="json pangenome out file")
     parser.add_argument("-c", "--completeness_outfile", help="posterior completeness scores calculated by mOTUpan")
     parser.add_argument("-v", "--version_mmseqs2", help="version of MMseqs2 binary")
@@ -57,8 +67,20 @@ def getargs():
            not os.path.getsize(args.json_genome_obj_paths_file) > 0:
             print ("{} {} must exist and not be empty\n".format('json_genome_obj_paths_file', args.json_genome_obj_paths_file))
             args_pass = False
-    if args.genefamily_mmseqs_infile is None:
-        print ("must specify --{}\n".format('genefamily_mmseqs_infile'))
+    if args.annotation_store_file is not None:
+        if not os.path.exists(args.annotation_store_file) or \
+           not os.path.isfile(args.annotation_store_file) or \
+           not os.path.getsize(args.annotation_store_file) > 0:
+            print ("{} {} must exist and not be empty\n".format('annotation_store_file', args.annotation_store_file))
+            args_pass = False
+    if args.cluster_genes_file is not None:
+        if not os.path.exists(args.cluster_genes_file) or \
+           not os.path.isfile(args.cluster_genes_file) or \
+           not os.path.getsize(args.cluster_genes_file) > 0:
+            print ("--{} {} must exist and not be empty\n".format('cluster_genes_file', args.cluster_genes_file))
+            args_pass = False
+    elif args.genefamily_mmseqs_infile is None:
+        print ("must specify --{} or --{}\n".format('genefamily_mmseqs_infile', 'cluster_genes_file'))
         args_pass = False
     elif not os.path.exists(args.genefamily_mmseqs_infile) or \
          not os.path.isfile(args.genefamily_mmseqs_infile) or \
@@ -98,10 +120,7 @@ def get_genome_name2ref_map (reference_map_infile):
 
     genome_name2ref_map = dict()
     
-    if reference_map_infile.lower().endswith('.gz'):
-        f = gzip.open(reference_map_infile, 'rt')
-    else:
-        f = open(reference_map_infile, 'r')
+    f = open_text(reference_map_infile, 'r')
 
     for line in f:
         line = line.rstrip()
@@ -113,118 +132,234 @@ def get_genome_name2ref_map (reference_map_infile):
     return genome_name2ref_map
 
 
-# get_genome_objs ()
+# get_genome_obj_paths ()
 #
-def get_genome_objs (json_genome_obj_paths_file):
-
-    genome_objs = dict()
-    if json_genome_obj_paths_file is not None:
-        with open (json_genome_obj_paths_file, 'r') as jgopf:
-            for jgopf_line in jgopf:
-                jgopf_line = jgopf_line.rstrip()
-                [genome_name, json_genome_obj_path] = jgopf_line.split("\t")
-
-                print ("reading genome obj {} from file {} ...".format(genome_name, json_genome_obj_path))
-                with open (json_genome_obj_path, 'r') as json_genome_obj_file:
-                    genome_objs[genome_name] = json.loads(json_genome_obj_file.read())
-        
-    return genome_objs
+def get_genome_obj_paths (json_genome_obj_paths_file):
 
+    genome_obj_paths = dict()
+    with open (json_genome_obj_paths_file, 'r') as jgopf:
+        for jgopf_line in jgopf:
+            jgopf_line = jgopf_line.rstrip()
+            [genome_name, json_genome_obj_path] = jgopf_line.split("\t")
+            genome_obj_paths[genome_name] = json_genome_obj_path
 
-# get_gene2gene_map ()
-#
-def get_gene2gene_map (id_map_file):
-
-    print ("reading id map file {} ...".format(id_map_file))
+    return genome_obj_paths
 
-    gene2gene_map = dict()
-    
-    if id_map_file.lower().endswith('.gz'):
-        f = gzip.open(id_map_file, 'rt')
-    else:
-        f = open(id_map_file, 'r')
 
-    for line in f:
-        line = line.rstrip()
+# get_gene_id_table ()
+#
+#   genome index and gene ordinal -> scaffold based gene id, from the gene id map
+#
+def get_gene_id_table (id_map_file):
 
-        (genome_based_gene_id, scaffold_based_gene_id) = line.split("\t")
-        gene2gene_map[genome_based_gene_id] = scaffold_based_gene_id
-    f.close()
+    print ("reading id map file {} ...".format(id_map_file))
 
-    return gene2gene_map
+    return open_gene_id_map (id_map_file)
 
 
 # get_cluster_genes ()
 #
-def get_cluster_genes (mmseqs_file):
+#   cluster id -> gene codes (see Utils/GeneCodes), from mmseqs tsv
+#
+def get_cluster_genes (mmseqs_file, gene_id_table):
 
     print ("reading cluster members file {} ...".format(mmseqs_file))
 
     cluster_genes = dict()
     
-    if mmseqs_file.lower().endswith('.gz'):
-        f = gzip.open(mmseqs_file, 'rt')
-    else:
-        f = open(mmseqs_file, 'r')
+    f = open_text(mmseqs_file, 'r')
 
     for line in f:
         line = line.rstrip()
 
         (cluster_id, genome_based_gene_id) = line.split("\t")
         if cluster_id not in cluster_genes:
-            cluster_genes[cluster_id] = []
-        cluster_genes[cluster_id].append(genome_based_gene_id)
+            cluster_genes[cluster_id] = array('q')
+        cluster_genes[cluster_id].append(gene_id_table.encode (genome_based_gene_id))
     f.close()
 
     return cluster_genes
 
 
-# get_completeness_scores ()
+# parse_mOTUpan_file ()
 #
-def get_completeness_scores (mOTUpan_infile):
-    completeness_scores = dict()
-    print ("reading mOTUpan file {} for completeness scores ...".format(mOTUpan_infile))
-    if mOTUpan_infile.lower().endswith('.gz'):
-        f = gzip.open(mOTUpan_infile, 'rt')
-    else:
-        f = open(mOTUpan_infile, 'r')
+#   single pass generator: yields ('header', header_info) once the '#' header
+#   lines are read, then ('cluster', row_fields) for each cluster row
+#
+def parse_mOTUpan_file (mOTUpan_infile):
+    print ("reading mOTUpan file {} ...".format(mOTUpan_infile))
+
+    header_info = { 'type_ver': None,
+                    'pangenome_id': None,
+                    'genome_count': None,
+                    'core_length': None,
+                    'mean_est_genome_size': None,
+                    'completeness_scores': dict(),
+                    'prior_genome_completeness': dict(),
+                    'posterior_genome_completeness': dict()
+                    }
+    header_done = False
+
+    with open_text(mOTUpan_infile, 'r') as f:
+        for line in f:
+            line = line.rstrip()
+            if line == '':
+                continue
+            elif line.startswith('#'):
+
+                if line.startswith('#mOTUlizer:mOTUpan:'):
+                    header_info['type_ver'] = line.replace('#mOTUlizer:mOTUpan:', '')
+                elif line.startswith('#run_name='):
+                    header_info['pangenome_id'] = line.replace('#run_name=', '')
+                elif line.startswith('#genome_count='):
+                    header_info['genome_count'] = line.replace('#genome_count=', '')
+                elif line.startswith('#core_length='):
+                    header_info['core_length'] = line.replace('#core_length=', '')
+                elif line.startswith('#mean_est_genome_size='):
+                    mean_est_genome_size = line.replace('#mean_est_genome_size=', '')
+                    header_info['mean_est_genome_size'] = mean_est_genome_size.replace(';traits_per_genome', '')
+                elif line.startswith('#genomes='):
+                    genome_line = line.replace('#genomes=', '')
+                    for genome_info in genome_line.split(';'):
+                        [genome_id, prior, posterior] = genome_info.split(':')
+                        prior_comp = prior.replace('prior_complete=', '')
+                        posterior_comp = posterior.replace('posterior_complete=', '')
+                        header_info['completeness_scores'][genome_id] = posterior_comp
+                        header_info['prior_genome_completeness'][genome_id] = float(prior_comp)
+                        header_info['posterior_genome_completeness'][genome_id] = float(posterior_comp)
+            elif line.startswith('trait_name'):
+                continue
+            else:
+                if not header_done:
+                    header_done = True
+                    yield ('header', header_info)
+                yield ('cluster', line.split("\t"))
+
+    if not header_done:
+        yield ('header', header_info)
+
+
+# gen_orthologs ()
+#
+#   generator of ortholog clusters, in mOTUpan file order, so the pangenome
+#   json can be written one cluster at a time
+#
+def gen_orthologs (mOTUpan_records,
+                   annotation_cache,
+                   gene_id_table,
+                   genome_refs_by_i,
+                   cluster_genes,
+                   force_oldfields):
+    source_gene_ids = gene_id_table.source_gene_ids
+
+    for (record_type, record) in mOTUpan_records:
+        if record_type == 'cluster':
+            [cluster_id, cat_acc_core, genome_occurences, log_likelihood_to_be_core, mean_copy_per_genome, genomes_in_clust, genes_in_clust] = record
 
-    for line in f:
-        if line.startswith('#genomes='):
-            genome_line = line.rstrip().replace('#genomes=', '')
-            for genome_info in genome_line.split(';'):
-                [genome_id, prior, posterior] = genome_info.split(':')
-                prior_comp = prior.replace('prior_complete=', '')
-                posterior_comp = posterior.replace('posterior_complete=', '')
-                completeness_scores[genome_id] = posterior_comp
-            break
-    f.close()
+            # note: genes_in_clust should be 'NA'
+            this_cluster = dict()
+            this_cluster['id'] = cluster_id
+            this_cluster['function'] = ''
+            this_cluster['protein_translation'] = ''
+            this_cluster['md5'] = ''
+            if not force_oldfields:
+                this_cluster['genome_occ'] = int(genome_occurences)
+                this_cluster['cat'] = cat_acc_core  # either 'accessory' or 'core'
+                this_cluster['core_log_likelihood'] = float(log_likelihood_to_be_core)
+                this_cluster['mean_copies'] = float(mean_copy_per_genome) * len(cluster_genes[cluster_id])
+                this_cluster['function_sources'] = []
+                this_cluster['function_logic'] = ''
+                this_cluster['protein_translation_source'] = None
+
+            these_genes = []
+            this_longest_protein_translation = ''
+            this_protein_translation_source = None
+            these_gene_names = []
+            this_function_logic = 'union'
+            these_functions_order = []
+            these_functions = dict()
+            these_functions_sources = []
+            #for gene_id in genes_in_clust.split(';'):
+            #    these_genes.append([gene_id, gene2order[gene_id], gene2genome_map[gene_id]])
+            for gene_code in cluster_genes[cluster_id]:
+                genome_i = gene_code >> ORDINAL_BITS
+                gene_order = gene_code & ORDINAL_MASK
+                scaffold_based_gene_id = source_gene_ids[genome_i][gene_order]
+                genome_ref = genome_refs_by_i[genome_i]
+                genome_id = genome_ref
+                #if not force_oldfields:
+                #    genome_id = genome_name
+                these_genes.append([scaffold_based_gene_id,
+                                    gene_order,
+                                    genome_id])
+
+                gene_annotations = None
+                if annotation_cache is not None:
+                    gene_annotations = annotation_cache.get (genome_i, gene_order)
+                if gene_annotations is not None:
+                    (these_vals, these_function_vals, this_protein_translation) = gene_annotations
+
+                    # gene names
+                    for gene_name in these_vals:
+                        if gene_name not in these_gene_names:
+                            these_gene_names.append(gene_name)
+                                
+                    # functions
+                    if len(these_function_vals) > 0:
+                        these_functions_sources.append((scaffold_based_gene_id,genome_ref))
+                    for each_function in these_function_vals:
+                        if each_function not in these_functions:
+                            these_functions[each_function] = True
+                            these_functions_order.append(each_function)
+
+                    # protein translation
+                    if not this_longest_protein_translation or \
+                       len(this_longest_protein_translation) < len(this_protein_translation):
+                        this_longest_protein_translation = this_protein_translation
+                        this_protein_translation_source = (scaffold_based_gene_id,genome_ref)
+                            
+                    
+            this_cluster['orthologs'] = these_genes
+
+            if not force_oldfields:
+                this_cluster['gene_name'] = these_gene_names
+                this_cluster['function'] = ';'.join(these_functions_order)
+                this_cluster['function_sources'] = these_functions_sources
+                this_cluster['function_logic'] = this_function_logic
+                this_cluster['protein_translation'] = this_longest_protein_translation
+                this_cluster['protein_translation_source'] = this_protein_translation_source
+                this_cluster['md5'] = hashlib.md5(this_longest_protein_translation.encode('utf-8')).hexdigest()
 
-    return completeness_scores
+            yield this_cluster
+
+    if annotation_cache is not None:
+        print ("loaded annotations for {} clustered genes in {} genomes".format(annotation_cache.gene_cnt, len(annotation_cache.genomes or [])))
 
 
 # build_pangenome_obj ()
 #
+#   mOTUpan_records: parse_mOTUpan_file() generator, after its header record.
+#   'orthologs' is a gen_orthologs() generator, consumed when the obj is written.
+#
 def build_pangenome_obj (mOTUpan_infile,
+                         mOTUpan_header,
+                         mOTUpan_records,
                          genome_name2ref_map,
-                         genome_objs,
-                         gene2gene_map,
+                         annotation_cache,
+                         gene_id_table,
                          cluster_genes,
-                         completeness_scores,
                          version_mmseqs2,
                          cluster_method_params_str,
                          pangenome_method_params_str,
                          force_oldfields):
-    print ("reading mOTUpan file {} for pangenome_obj ...".format(mOTUpan_infile))
+    print ("building pangenome_obj from mOTUpan file {} ...".format(mOTUpan_infile))
 
     # init structs
     pangenome_obj = dict()
-    orthologs = []
-    prior_genome_completeness = dict()
-    posterior_genome_completeness = dict()
+    completeness_scores = mOTUpan_header['completeness_scores']
 
     # get pangenome name
-    pangenome_name = re.sub(r'^.*/', '', mOTUpan_infile)
+    pangenome_name = re.sub(r'^.*/', '', strip_codec_ext (mOTUpan_infile))
     pangenome_name += '.Pangenome'
 
     # get genome names
@@ -235,36 +370,32 @@ def build_pangenome_obj (mOTUpan_infile,
     genome_ref2name_map = dict()
     if genome_name2ref_map:
         for genome_name in genome_names:
+            if genome_name not in genome_name2ref_map:
+                raise ValueError ("Missing genome {} in genome name to ref map".format(genome_name))
             genome_ref = genome_name2ref_map[genome_name]
             genome_refs.append(genome_ref)
             genome_ref2name_map[genome_ref] = genome_name
 
-    # prep for functions and protein_translation
-    gene_names = dict()
-    gene_functions = dict()
-    protein_translations = dict()
-    if not force_oldfields and genome_objs:
+    # per genome index values for gene codes (every genome with clustered genes needs a ref)
+    clustered_genome_is = set()
+    for gene_codes in cluster_genes.values():
+        for gene_code in gene_codes:
+            clustered_genome_is.add(gene_code >> ORDINAL_BITS)
+    genome_refs_by_i = [None] * len(gene_id_table.genome_names)
+    for genome_i in sorted(clustered_genome_is):
+        genome_name = gene_id_table.genome_names[genome_i]
+        if genome_name not in genome_name2ref_map:
+            raise ValueError ("Missing genome {} in genome name to ref map".format(genome_name))
+        genome_refs_by_i[genome_i] = genome_name2ref_map[genome_name]
+
+    # functions and protein_translation are loaded for clustered genes on first use
+    if force_oldfields:
+        annotation_cache = None
+    if annotation_cache is not None:
+        annotated_genome_names = annotation_cache.get_genome_names()
         for genome_name in genome_names:
-            if genome_name not in genome_objs:
-                raise ValueError ("Missing genome {} in genome_objs".format(genome_name))
-            genome_obj = genome_objs[genome_name]
-            gene_names[genome_name] = dict()
-            gene_functions[genome_name] = dict()
-            protein_translations[genome_name] = dict()
-            for feature in genome_obj['features']:
-                fid = feature['id']
-                gene_names[genome_name][fid] = []
-                gene_functions[genome_name][fid] = []
-                protein_translations[genome_name][fid] = ''
-                if 'aliases' in feature:
-                    for alias in feature['aliases']:
-                        [alias_type, alias_val] = alias
-                        if alias_type == 'gene':
-                            gene_names[genome_name][fid].append(alias_val)
-                if 'functions' in feature:
-                    gene_functions[genome_name][fid] = feature['functions']
-                if 'protein_translation' in feature:
-                    protein_translations[genome_name][fid] = feature['protein_translation']
+            if genome_name not in annotated_genome_names:
+                raise ValueError ("Missing genome {} in genome annotations".format(genome_name))
             
     # assign pangenome type and params
     pangenome_type = 'mOTUpan'
@@ -292,143 +423,30 @@ def build_pangenome_obj (mOTUpan_infile,
     # assign cluster cats mapping
     cluster_cats = { 'mOTUpan': { 'core': 'core', 'accessory': 'flexible' } }
 
-    
-    # get ortholog clusters
-    #
-    if mOTUpan_infile.lower().endswith('.gz'):
-        f = gzip.open(mOTUpan_infile, 'rt')
-    else:
-        f = open(mOTUpan_infile, 'r')
-
-    for line in f:
-        line = line.rstrip()
-        if line == '':
-            continue
-        elif line.startswith('#'):
-
-            if line.startswith('#mOTUlizer:mOTUpan:'):
-                type_ver = line.replace('#mOTUlizer:mOTUpan:', '')
-            elif line.startswith('#run_name='):
-                pangenome_id = line.replace('#run_name=', '')
-            elif line.startswith('#genome_count='):
-                genome_count = line.replace('#genome_count=', '')
-            elif line.startswith('#core_length='):
-                core_length = line.replace('#core_length=', '')
-            elif line.startswith('#mean_est_genome_size='):
-                mean_est_genome_size = line.replace('#mean_est_genome_size=', '')
-                mean_est_genome_size = mean_est_genome_size.replace(';traits_per_genome', '')
-            elif line.startswith('#genomes='):
-                genome_line = line.rstrip().replace('#genomes=', '')
-                for genome_info in genome_line.split(';'):
-                    [genome_id, prior, posterior] = genome_info.split(':')
-                    prior_comp = prior.replace('prior_complete=', '')
-                    posterior_comp = posterior.replace('posterior_complete=', '')
-                    prior_genome_completeness[genome_id] = float(prior_comp)
-                    posterior_genome_completeness[genome_id] = float(posterior_comp)
-        elif line.startswith('trait_name'):
-            continue
-        else:
-            [cluster_id, cat_acc_core, genome_occurences, log_likelihood_to_be_core, mean_copy_per_genome, genomes_in_clust, genes_in_clust] = line.split("\t")
-
-            # note: genes_in_clust should be 'NA'
-            this_cluster = dict()
-            this_cluster['id'] = cluster_id
-            this_cluster['function'] = ''
-            this_cluster['protein_translation'] = ''
-            this_cluster['md5'] = ''
-            if not force_oldfields:
-                this_cluster['genome_occ'] = int(genome_occurences)
-                this_cluster['cat'] = cat_acc_core  # either 'accessory' or 'core'
-                this_cluster['core_log_likelihood'] = float(log_likelihood_to_be_core)
-                this_cluster['mean_copies'] = float(mean_copy_per_genome) * len(cluster_genes[cluster_id])
-                this_cluster['function_sources'] = []
-                this_cluster['function_logic'] = ''
-                this_cluster['protein_translation_source'] = None
-
-            these_genes = []
-            this_longest_protein_translation = ''
-            this_protein_translation_source = None
-            these_gene_names = []
-            this_function_logic = 'union'
-            these_functions_order = []
-            these_functions = dict()
-            these_functions_sources = []
-            #for gene_id in genes_in_clust.split(';'):
-            #    these_genes.append([gene_id, gene2order[gene_id], gene2genome_map[gene_id]])
-            for genome_based_gene_id in cluster_genes[cluster_id]:
-                scaffold_based_gene_id = re.sub('^.*\.f:', '', gene2gene_map[genome_based_gene_id])
-                gene_order = int(re.sub('^.+_', '', genome_based_gene_id))
-                genome_name = re.sub('_\d+$', '', genome_based_gene_id)
-                genome_ref = genome_name2ref_map[genome_name]
-                genome_id = genome_ref
-                #if not force_oldfields:
-                #    genome_id = genome_name
-                these_genes.append([scaffold_based_gene_id,
-                                    gene_order,
-                                    genome_id])
-
-                if not force_oldfields and genome_objs and genome_name in genome_objs:
-                    # gene names
-                    if scaffold_based_gene_id in gene_names[genome_name]:
-                        for gene_name in gene_names[genome_name][scaffold_based_gene_id]:
-                            if gene_name not in these_gene_names:
-                                these_gene_names.append(gene_name)
-                                
-                    # functions
-                    if scaffold_based_gene_id in gene_functions[genome_name]:
-                        if len(gene_functions[genome_name][scaffold_based_gene_id]) > 0:
-                            these_functions_sources.append((scaffold_based_gene_id,genome_ref))
-                        for each_function in gene_functions[genome_name][scaffold_based_gene_id]:
-                            if each_function not in these_functions:
-                                these_functions[each_function] = True
-                                these_functions_order.append(each_function)
-
-                    # protein translation
-                    if scaffold_based_gene_id in protein_translations[genome_name]:
-                        if not this_longest_protein_translation or \
-                           len(this_longest_protein_translation) < len(protein_translations[genome_name][scaffold_based_gene_id]):
-                            this_longest_protein_translation = protein_translations[genome_name][scaffold_based_gene_id]
-                            this_protein_translation_source = (scaffold_based_gene_id,genome_ref)
-                            
-                    
-            this_cluster['orthologs'] = these_genes
-
-            if not force_oldfields:
-                this_cluster['gene_name'] = these_gene_names
-                this_cluster['function'] = ';'.join(these_functions_order)
-                this_cluster['function_sources'] = these_functions_sources
-                this_cluster['function_logic'] = this_function_logic
-                this_cluster['protein_translation'] = this_longest_protein_translation
-                this_cluster['protein_translation_source'] = this_protein_translation_source
-                this_cluster['md5'] = hashlib.md5(this_longest_protein_translation.encode('utf-8')).hexdigest()
-
-            orthologs.append(this_cluster)
-            
-    f.close()
 
     # build pangenome_obj
     pangenome_obj['name'] = pangenome_name
-    pangenome_obj['id'] = pangenome_id
+    pangenome_obj['id'] = mOTUpan_header['pangenome_id']
     pangenome_obj['type'] = pangenome_type
-    pangenome_obj['orthologs'] = orthologs
+    pangenome_obj['orthologs'] = gen_orthologs (mOTUpan_records, annotation_cache, gene_id_table, genome_refs_by_i, cluster_genes, force_oldfields)
     pangenome_obj['genome_refs'] = genome_refs
     if not force_oldfields:
         pangenome_obj['genome_names'] = genome_names
         pangenome_obj['genome_name_to_ref'] = genome_name2ref_map
         pangenome_obj['genome_ref_to_name'] = genome_ref2name_map
         
-        pangenome_obj['type_ver'] = type_ver
+        pangenome_obj['type_ver'] = mOTUpan_header['type_ver']
         pangenome_obj['cluster_cats'] = cluster_cats
         pangenome_obj['clustering_method'] = clustering_method
         pangenome_obj['clustering_method_ver'] = clustering_method_ver
         pangenome_obj['clustering_method_params'] = clustering_method_params
         pangenome_obj['pangenome_method_params'] = pangenome_method_params
         
-        pangenome_obj['genome_count'] = int(genome_count)
-        pangenome_obj['core_length'] = int(core_length)
-        pangenome_obj['mean_est_genome_size'] = float(mean_est_genome_size)
-        pangenome_obj['prior_genome_completeness'] = prior_genome_completeness
-        pangenome_obj['posterior_genome_completeness'] = posterior_genome_completeness
+        pangenome_obj['genome_count'] = int(mOTUpan_header['genome_count'])
+        pangenome_obj['core_length'] = int(mOTUpan_header['core_length'])
+        pangenome_obj['mean_est_genome_size'] = float(mOTUpan_header['mean_est_genome_size'])
+        pangenome_obj['prior_genome_completeness'] = mOTUpan_header['prior_genome_completeness']
+        pangenome_obj['posterior_genome_completeness'] = mOTUpan_header['posterior_genome_completeness']
     
     return pangenome_obj
     
@@ -437,10 +455,7 @@ def build_pangenome_obj (mOTUpan_infile,
 #
 def write_completeness_file (completeness_file, completeness_scores):
     print ("writing completeness {} ...".format(completeness_file))
-    if completeness_file.lower().endswith('.gz'):
-        f = gzip.open(completeness_file, 'wt')
-    else:
-        f = open(completeness_file, 'w')
+    f = open_text(completeness_file, 'w')
 
     outbuf = []
     outbuf.append("\t".join(['Bin Id','Completeness', 'Contamination']))
@@ -454,11 +469,13 @@ def write_completeness_file (completeness_file, completeness_scores):
 
 # write_pangenome_json_file ()
 #
+#   orthologs are serialized as they are generated, rather than held for json.dump()
+#
 def write_pangenome_json_file (pangenome_outfile, pangenome_obj):
     print ("writing pangenome as json {} ...".format(pangenome_outfile))
 
-    with open(pangenome_outfile, 'w', encoding='utf-8') as f:
-        json.dump(pangenome_obj, f, ensure_ascii=False, indent=4)
+    with open_text(pangenome_outfile, 'w') as f:
+        dump_streaming(pangenome_obj, f, ensure_ascii=False, indent=4)
 
     return pangenome_outfile
 
@@ -473,28 +490,37 @@ def main() -> int:
     if args.reference_map_infile:
         genome_name2ref_map = get_genome_name2ref_map (args.reference_map_infile)
 
-    # read genome objs
-    genome_objs = None
-    if args.json_genome_obj_paths_file:
-        genome_objs = get_genome_objs (args.json_genome_obj_paths_file)
-        
     # read gene id to gene id mapping
-    gene2gene_map = get_gene2gene_map (args.id_map_file)
+    gene_id_table = get_gene_id_table (args.id_map_file)
 
-    # read cluster gene id members
-    cluster_genes = get_cluster_genes (args.genefamily_mmseqs_infile)
+    # read cluster gene id members (saved by cluster conversion, else from mmseqs tsv)
+    if args.cluster_genes_file:
+        print ("reading cluster members file {} ...".format(args.cluster_genes_file))
+        cluster_genes = gene_id_table.encode_cluster_genes (read_cluster_genes (args.cluster_genes_file))
+    else:
+        cluster_genes = get_cluster_genes (args.genefamily_mmseqs_infile, gene_id_table)
+
+    # genome annotations (store, or legacy per-genome json objs), loaded once for clustered genes
+    annotation_cache = None
+    if args.annotation_store_file:
+        print ("using genome annotations from store {} ...".format(args.annotation_store_file))
+        annotation_cache = open_store_annotations (args.annotation_store_file, gene_id_table, cluster_genes)
+    elif args.json_genome_obj_paths_file:
+        annotation_cache = open_genome_obj_annotations (get_genome_obj_paths (args.json_genome_obj_paths_file), gene_id_table, cluster_genes)
     
-    # parse out posterior completenss scores and write file
-    completeness_scores = get_completeness_scores (args.mOTUpan_infile)
-    write_completeness_file (args.completeness_outfile, completeness_scores)
+    # one pass over mOTUpan file: header first for posterior completeness scores
+    mOTUpan_records = parse_mOTUpan_file (args.mOTUpan_infile)
+    (record_type, mOTUpan_header) = next(mOTUpan_records)
+    write_completeness_file (args.completeness_outfile, mOTUpan_header['completeness_scores'])
 
-    # parse out clusters and gene ids and write json file
+    # then clusters and gene ids, and write json file
     pangenome_obj = build_pangenome_obj (args.mOTUpan_infile,
+                                         mOTUpan_header,
+                                         mOTUpan_records,
                                          genome_name2ref_map,
-                                         genome_objs,
-                                         gene2gene_map,
+                                         annotation_cache,
+                                         gene_id_table,
                                          cluster_genes,
-                                         completeness_scores,
                                          args.version_mmseqs2,
                                          args.cluster_method_params,
                                          args.pangenome_method_params,
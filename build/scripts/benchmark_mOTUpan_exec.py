@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+'''
+Compare mOTUpan run as a mOTUpan.py subprocess with mOTUpan run in-process
+through mOTUlizer's API, on the same gene clusters and checkm files.
+'''
+
+import sys
+import os
+import argparse
+import json
+import subprocess
+import tempfile
+import time
+
+# shared kb_motupan utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'lib'))
+from kb_motupan.Utils.CompressedIO import open_text
+from kb_motupan.Utils import MOTUpanAPI
+
+
+# getargs()
+#
+def getargs():
+    parser = argparse.ArgumentParser(description="time mOTUpan subprocess vs in-process mOTUlizer API")
+
+    parser.add_argument("-g", "--gene_clusters_file", help="mOTUpan gene clusters json (-motupan_in.json)")
+    parser.add_argument("-q", "--checkm_file", help="checkm style completeness file")
+    parser.add_argument("-i", "--max_iter", default="1", help="mOTUpan max_iter (def: 1)")
+    parser.add_argument("-n", "--repeats", default="3", help="runs of each mode (def: 3)")
+    parser.add_argument("-b", "--motupan_bin", default="/opt/conda3/bin/mOTUpan.py", help="mOTUpan.py path (def: /opt/conda3/bin/mOTUpan.py)")
+    args = parser.parse_args()
+
+    if len(sys.argv) < 3:
+        parser.print_help()
+        sys.exit(-1)
+    args_pass = True
+
+    for arg_name in ['gene_clusters_file', 'checkm_file']:
+        arg_val = getattr(args, arg_name)
+        if not arg_val:
+            print ("must specify --{}\n".format(arg_name))
+            args_pass = False
+        elif not os.path.isfile(arg_val) or not os.path.getsize(arg_val) > 0:
+            print ("--{} {} must exist and not be empty\n".format(arg_name, arg_val))
+            args_pass = False
+
+    if not args_pass:
+        parser.print_help()
+        sys.exit(-1)
+
+    return args
+
+
+# get_table_body ()
+#
+#   table rows without the '#' header lines, which hold run name and version
+#
+def get_table_body (pan_table):
+    return [line for line in pan_table.splitlines() if not line.startswith('#')]
+
+
+# run_subprocess_mode ()
+#
+def run_subprocess_mode (args, out_dir):
+    out_path = os.path.join (out_dir, 'subprocess.mOTUpan')
+    cmd = [args.motupan_bin,
+           '--gene_clusters_file', args.gene_clusters_file,
+           '--checkm', args.checkm_file,
+           '--max_iter', str(args.max_iter),
+           '--output', out_path]
+    start = time.time()
+    subprocess.run (cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    elapsed = time.time() - start
+    with open_text (out_path, 'r') as out_handle:
+        return (elapsed, out_handle.read())
+
+
+# run_api_mode ()
+#
+#   includes reading the input files, as mOTUpan.py does
+#
+def run_api_mode (args):
+    start = time.time()
+    with open_text (args.gene_clusters_file, 'r') as gene_clusters_handle:
+        genome_clusters = json.load (gene_clusters_handle)
+    genome_completeness = MOTUpanAPI.read_checkm_completeness (args.checkm_file)
+    pan_table = MOTUpanAPI.run_motupan (genome_clusters, genome_completeness, args.max_iter)
+    return (time.time() - start, pan_table)
+
+
+# main()
+#
+def main() -> int:
+    args = getargs()
+
+    if not MOTUpanAPI.api_available():
+        print ("mOTUlizer not importable, can't run in-process mode")
+        return -1
+
+    timings = { 'subprocess': [], 'api': [] }
+    tables = dict()
+    with tempfile.TemporaryDirectory() as out_dir:
+        for repeat_i in range(int(args.repeats)):
+            (elapsed, tables['subprocess']) = run_subprocess_mode (args, out_dir)
+            timings['subprocess'].append(elapsed)
+            (elapsed, tables['api']) = run_api_mode (args)
+            timings['api'].append(elapsed)
+            print ("run {}: subprocess {:.2f}s, api {:.2f}s".format(repeat_i+1, timings['subprocess'][-1], timings['api'][-1]))
+
+    for mode in ['subprocess', 'api']:
+        print ("{}: min {:.2f}s, mean {:.2f}s".format(mode, min(timings[mode]), sum(timings[mode])/len(timings[mode])))
+    print ("speedup (min): {:.2f}x".format(min(timings['subprocess']) / max(min(timings['api']), 1e-9)))
+
+    if get_table_body (tables['subprocess']) == get_table_body (tables['api']):
+        print ("outputs match")
+    else:
+        print ("OUTPUTS DIFFER")
+        return 1
+
+    return 0
+
+
+# exec()
+#
+if __name__ == '__main__':
+    sys.exit(main())
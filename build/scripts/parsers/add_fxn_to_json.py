@@ -12,10 +12,13 @@ You should have received a copy of the GNU General Public License along with thi
 import sys
 import os
 import argparse
-import gzip
 import re
 import json
 
+# shared kb_motupan utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', '..', 'lib'))
+from kb_motupan.Utils.CompressedIO import open_text, find_existing_path
+
 
 # getargs()
 #
@@ -113,7 +116,7 @@ def create_json_paths (base_dir, input_clades_file):
 #
 def read_pangenome_json (input_json_file):
     print ("reading pangenome json file {} ...".format(input_json_file))
-    with open (input_json_file, 'r') as json_h:
+    with open_text (find_existing_path (input_json_file), 'r') as json_h:
         pangenome_obj = json.load (json_h)
 
     return pangenome_obj
@@ -125,10 +128,7 @@ def read_prefered_genomes (prefered_genomes_file):
     prefered_genomes = dict()
 
     print ("reading prefered genomes file {} ...".format(prefered_genomes_file))
-    if prefered_genomes_file.lower().endswith('.gz'):
-        f = gzip.open(prefered_genomes_file, 'rt')
-    else:
-        f = open(prefered_genomes_file, 'r')
+    f = open_text(prefered_genomes_file, 'r')
     for line in f:
         if line.startswith('#'):
             continue
@@ -145,10 +145,7 @@ def read_genome_UPA_to_ID (upa_mapping_file, target_genome_IDs):
     genome_UPAs_to_IDs = dict()
 
     print ("reading genome IDs and UPAs file {} ...".format(upa_mapping_file))
-    if upa_mapping_file.lower().endswith('.gz'):
-        f = gzip.open(upa_mapping_file, 'rt')
-    else:
-        f = open(upa_mapping_file, 'r')
+    f = open_text(upa_mapping_file, 'r')
     for line in f:
         if line.startswith('#'):
             continue
@@ -217,10 +214,7 @@ def read_gene_functions (function_dir, genome_UPAs_to_IDs, domain):
             all_done = False
             last_upa = None
         
-            if f_path.lower().endswith('.gz'):
-                f = gzip.open(f_path_file, 'rt')
-            else:
-                f = open(f_path, 'r')
+            f = open_text(f_path, 'r')
 
             for line in f:
                 if line.startswith('#'):
@@ -12,11 +12,15 @@ You should have received a copy of the GNU General Public License along with thi
 import sys
 import os
 import argparse
-import gzip
 import re
 import json
 import hashlib
 
+# shared kb_motupan utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', '..', 'lib'))
+from kb_motupan.Utils.CompressedIO import open_text, find_existing_path
+from kb_motupan.Utils.GeneIdMap import open_gene_id_map, GENE_ID_MAP_EXT
+
 
 # getargs()
 #
@@ -93,7 +97,7 @@ def create_json_paths (base_dir, input_clades_file):
 #
 def read_pangenome_json (input_json_file):
     print ("reading pangenome json file {} ...".format(input_json_file))
-    with open (input_json_file, 'r') as json_h:
+    with open_text (find_existing_path (input_json_file), 'r') as json_h:
         pangenome_obj = json.load (json_h)
 
     return pangenome_obj
@@ -105,10 +109,7 @@ def read_genome_ID_to_UPA (upa_mapping_file, target_genome_IDs):
     genome_IDs_to_UPAs = dict()
 
     print ("reading genome IDs and UPAs file {} ...".format(upa_mapping_file))
-    if upa_mapping_file.lower().endswith('.gz'):
-        f = gzip.open(upa_mapping_file, 'rt')
-    else:
-        f = open(upa_mapping_file, 'r')
+    f = open_text(upa_mapping_file, 'r')
     for line in f:
         if line.startswith('#'):
             continue
@@ -148,7 +149,7 @@ def get_clust_rep_seqs (input_json_file):
 
     clust_rep_seq_file = input_json_file.replace('-mOTUpan-pangenome-fxn.json', '-clust_rep_seq.fasta')
 
-    with open (clust_rep_seq_file, 'r') as clust_rep_seq_h:
+    with open_text (find_existing_path (clust_rep_seq_file), 'r') as clust_rep_seq_h:
         last_clust_id = None
         seq = ''
         for clust_rep_seq_line in clust_rep_seq_h:
@@ -173,17 +174,14 @@ def get_clust_rep_seqs (input_json_file):
 
 # get_gene_id_map ()
 #
+#   mmapped binary map, or the text map from older runs
+#
 def get_gene_id_map (input_json_file):
-    gene_id_map = dict()
-
-    gene_id_map_file = input_json_file.replace('-mOTUpan-pangenome-fxn.json', '.gene_id_map')
-
-    with open (gene_id_map_file, 'r') as gene_id_map_h:
-        for gene_id_map_line in gene_id_map_h:
-            [genome_based_gene_id, scaffold_based_gene_id] = gene_id_map_line.rstrip().split()
-            gene_id_map[genome_based_gene_id] = scaffold_based_gene_id
+    gene_id_map_file = input_json_file.replace('-mOTUpan-pangenome-fxn.json', GENE_ID_MAP_EXT)
+    if not os.path.exists (gene_id_map_file):
+        gene_id_map_file = input_json_file.replace('-mOTUpan-pangenome-fxn.json', '.gene_id_map')
 
-    return gene_id_map
+    return open_gene_id_map (gene_id_map_file)
     
 
 # add_prot_seqs_to_pangenome ()
@@ -199,7 +197,7 @@ def add_prot_seqs_to_pangenome (pangenome_obj, cluster_rep_seqs, gene_id_map, ge
             raise ValueError ("Missing cluster rep seq for cluster id {} in pangenome {}".format(cluster_id, pangeome_obj['name']))
 
         genome_id = re.sub('_\d+$', '', cluster_id)
-        rep_seq_source_gene_id = gene_id_map[cluster_id]
+        rep_seq_source_gene_id = gene_id_map.lookup (cluster_id)
         rep_seq_source_upa = genome_IDs_to_UPAs[genome_id]
         cluster_rep_seq_source = [rep_seq_source_gene_id, rep_seq_source_upa]
         
@@ -12,11 +12,14 @@ You should have received a copy of the GNU General Public License along with thi
 import sys
 import os
 import argparse
-import gzip
 import re
 import json
 import hashlib
 
+# shared kb_motupan utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', '..', 'lib'))
+from kb_motupan.Utils.CompressedIO import open_text, find_existing_path
+
 
 # getargs()
 #
@@ -52,7 +55,7 @@ def getargs():
 #
 def read_pangenome_json (input_json_file):
     print ("reading pangenome json file {} ...".format(input_json_file))
-    with open (input_json_file, 'r') as json_h:
+    with open_text (find_existing_path (input_json_file), 'r') as json_h:
         pangenome_obj = json.load (json_h)
 
     return pangenome_obj
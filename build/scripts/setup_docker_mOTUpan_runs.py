@@ -12,11 +12,15 @@ You should have received a copy of the GNU General Public License along with thi
 import sys
 import os
 import argparse
-import gzip
 import re
 import shutil
 import json
 
+# shared kb_motupan utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'lib'))
+from kb_motupan.Utils.CompressedIO import open_text
+from kb_motupan.Utils.GeneIdMap import GeneIdMapWriter, GENE_ID_MAP_EXT
+
 
 # getargs()
 #
@@ -31,6 +35,7 @@ def getargs():
     parser.add_argument("-f", "--faa_dir", default="/kbase/ke/db/gtdb_r214/all_faas", help="location of the faa files (def: /kbase/ke/db/gtdb_r214/all_faas)")
     parser.add_argument("-r", "--run_dir", help="where to build the run files - e.g. docker_work (must be relative path)")
     parser.add_argument("-m", "--mount_path", default="/pangenome", help="docker path to run_dir (def: /pangenome)")
+    parser.add_argument("-T", "--tmp_dir", default=None, help="docker path on fast local storage for mmseqs temp files - e.g. /kb/module/work/tmp (def: use run_dir)")
     args = parser.parse_args()
 
     if len(sys.argv) < 5:
@@ -107,10 +112,7 @@ def getargs():
 def get_target_clades (target_clades_file):
     these_target_clades = []
     print ("reading target clades file {} ...".format(target_clades_file))
-    if target_clades_file.lower().endswith('.gz'):
-        f = gzip.open(clades_file, 'rt')
-    else:
-        f = open(target_clades_file, 'r')
+    f = open_text(target_clades_file, 'r')
 
     this_clade = None
     for line in f:
@@ -148,10 +150,7 @@ def get_member_genome_ids (gtdb_metadata_file, sp_reps_only_for_genus=True):
     GTDB_REP_FLAG_I        = 15
     GTDB_TAX_I             = 16
     
-    if gtdb_metadata_file.lower().endswith('.gz'):
-        f = gzip.open(gtdb_metadata_file, 'rt')
-    else:
-        f = open(gtdb_metadata_file, 'r')
+    f = open_text(gtdb_metadata_file, 'r')
 
     for line in f:
         if line.startswith ('accession'):
@@ -201,10 +200,7 @@ def get_checkm_scores (gtdb_metadata_file):
     #GTDB_TAX_I             = 16
 
     print ("reading CheckM scores from file {} ...".format(gtdb_metadata_file))
-    if gtdb_metadata_file.lower().endswith('.gz'):
-        f = gzip.open(gtdb_metadata_file, 'rt')
-    else:
-        f = open(gtdb_metadata_file, 'r')
+    f = open_text(gtdb_metadata_file, 'r')
 
     for line in f:
         if line.startswith ('accession'):
@@ -248,51 +244,40 @@ def create_faa_file (faa_dir,
                      short_clade,
                      genome_members):
     faa_out_file = os.path.join (this_run_dir, short_clade+'.faa')
-    id_map_file = os.path.join (this_run_dir, short_clade+'.gene_id_map')
+    id_map_file = os.path.join (this_run_dir, short_clade+GENE_ID_MAP_EXT)
     print ("creating faa file {} ...".format(faa_out_file))
 
-    faa_buf = []
-    id_map_buf = []
+    # stream one genome at a time so memory doesn't scale with clade proteome
+    with open (faa_out_file, 'w', buffering=1024*1024) as faa_path_handle, \
+         GeneIdMapWriter (id_map_file) as id_map_writer:
 
-    for genome_id in genome_members[full_clade]:
-        db_src = genome_id[0:3]
-        f_1 = genome_id[4:7]
-        f_2 = genome_id[7:10]
-        f_3 = genome_id[10:13]
+        for genome_id in genome_members[full_clade]:
+            db_src = genome_id[0:3]
+            f_1 = genome_id[4:7]
+            f_2 = genome_id[7:10]
+            f_3 = genome_id[10:13]
 
-        faa_in_file = genome_id+'_protein.faa.gz'
-        faa_path = os.path.join (faa_dir, db_src, f_1, f_2, f_3, faa_in_file)
-        if not os.path.exists (faa_path) or \
-           not os.path.getsize (faa_path) > 0:
+            faa_in_file = genome_id+'_protein.faa.gz'
+            faa_path = os.path.join (faa_dir, db_src, f_1, f_2, f_3, faa_in_file)
+            if not os.path.exists (faa_path) or \
+               not os.path.getsize (faa_path) > 0:
                 
-            print ("faa file for {} is missing or empty\n".format(genome_id))
-            sys.exit (-2)
-
-        # rewrite gene ids to match genome_id as base and store old genome id
-        gene_cnt = 0
-        if faa_path.lower().endswith('.gz'):
-            faa_in = gzip.open(faa_path, 'rt')
-        else:
-            faa_in = open(faa_path, 'r')
-
-        for faa_line in faa_in:
-            if faa_line.startswith('>'):
-                gene_cnt += 1
-                old_gene_id = faa_line.split()[0].replace('>','')
-                new_gene_id = genome_id+'_'+str(gene_cnt)
-                id_map_buf.append("\t".join([new_gene_id,old_gene_id]))
-                new_faa_line = faa_line.replace(old_gene_id, new_gene_id)
-                faa_buf.append(new_faa_line)
-            else:
-                faa_buf.append(faa_line)
-        faa_in.close()        
-            
-    # write files
-    with open (faa_out_file, 'w') as faa_path_handle:
-        faa_path_handle.write("".join(faa_buf))
-
-    with open (id_map_file, 'w') as id_map_path_handle:
-        id_map_path_handle.write("\n".join(id_map_buf)+"\n")
+                print ("faa file for {} is missing or empty\n".format(genome_id))
+                sys.exit (-2)
+
+            # rewrite gene ids to match genome_id as base and store old gene id by gene order
+            id_map_writer.add_genome (genome_id)
+            faa_in = open_text(faa_path, 'r')
+
+            with faa_in:
+                for faa_line in faa_in:
+                    if faa_line.startswith('>'):
+                        old_gene_id = faa_line.split()[0].replace('>','')
+                        gene_cnt = id_map_writer.add_gene (old_gene_id)
+                        new_gene_id = genome_id+'_'+str(gene_cnt)
+                        faa_path_handle.write(faa_line.replace(old_gene_id, new_gene_id))
+                    else:
+                        faa_path_handle.write(faa_line)
                 
     return (faa_out_file, id_map_file)
 
@@ -368,7 +353,8 @@ def create_params_file (docker_base_dir,
                         faa_path,
                         id_map_path,
                         checkm_path,
-                        genome_name2ref_path):
+                        genome_name2ref_path,
+                        tmp_dir=None):
 
     params_dir = os.path.join (docker_base_dir, 'params')
     if not os.path.exists (params_dir):
@@ -393,6 +379,8 @@ def create_params_file (docker_base_dir,
         'force_redo': 0
         #'json_genome_obj_paths_file': motupan_input_files['json_genome_obj_paths_file'],
     }
+    if tmp_dir:
+        params_obj['tmp_dir'] = tmp_dir
 
     with open(params_path, 'w', encoding='utf-8') as f:
         json.dump(params_obj, f, ensure_ascii=False, indent=4)    
@@ -523,7 +511,8 @@ def main() -> int:
                                           faa_file,
                                           id_map_file,
                                           checkm_file,
-                                          genome_name2ref_file)
+                                          genome_name2ref_file,
+                                          args.tmp_dir)
 
         # write run mOTUpan script
         runner_cmd = make_runner_cmd (clade_i,
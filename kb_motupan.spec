@@ -40,6 +40,7 @@ module kb_motupan {
 	file_path genome_name2ref_path;
 	file_path run_dir;
 	file_path json_genome_obj_paths_file;
+	file_path annotation_store_path;
 	file_path output_pangenome_json_path;
 	
 	string mmseqs_cluster_mode;
@@ -47,14 +48,63 @@ module kb_motupan {
 	/*int    mmseqs_cov_mode;*/
 	float  mmseqs_min_coverage;
 	int    motupan_max_iter;
+	bool   dedup_exact_seqs;
+	int    threads;
+	string max_memory;
+	file_path tmp_dir;
     } run_mmseqs2_and_mOTUpan_files_Params;
 
     typedef structure {
 	file_path pangenome_json;
+	file_path posterior_qual;
     } run_mmseqs2_and_mOTUpan_files_Output;
 
     funcdef run_mmseqs2_and_mOTUpan_files (run_mmseqs2_and_mOTUpan_files_Params params)  returns (run_mmseqs2_and_mOTUpan_files_Output output) authentication required;
 
+
+    /* run_mmseqs2_and_mOTUpan_sweep()
+    **
+    **  Method for running mmseqs2 and mOTUpan from files for several
+    **  (min_seq_id, min_coverage) combos, sharing one mmseqs2 seq db and
+    **  prefilter.  output_pangenome_json_path is the base name for the
+    **  per-combo pangenome JSON files.
+    */
+    typedef structure {
+	float  min_seq_id;
+	float  min_coverage;
+    } mmseqs_sweep_combo;
+
+    typedef structure {
+	file_path input_faa_path;
+	file_path input_qual_path;
+	file_path input_gene_id_map_path;
+	file_path genome_name2ref_path;
+	file_path run_dir;
+	file_path json_genome_obj_paths_file;
+	file_path annotation_store_path;
+	file_path output_pangenome_json_path;
+	
+	list<mmseqs_sweep_combo> sweep_combos;
+	int    motupan_max_iter;
+	bool   dedup_exact_seqs;
+	int    threads;
+	string max_memory;
+	file_path tmp_dir;
+    } run_mmseqs2_and_mOTUpan_sweep_Params;
+
+    typedef structure {
+	float  min_seq_id;
+	float  min_coverage;
+	file_path pangenome_json;
+	file_path posterior_qual;
+    } mmseqs_sweep_result;
+
+    typedef structure {
+	list<mmseqs_sweep_result> sweep_results;
+    } run_mmseqs2_and_mOTUpan_sweep_Output;
+
+    funcdef run_mmseqs2_and_mOTUpan_sweep (run_mmseqs2_and_mOTUpan_sweep_Params params)  returns (run_mmseqs2_and_mOTUpan_sweep_Output output) authentication required;
+
     
     /* run_kb_motupan()
     **
@@ -66,6 +116,9 @@ module kb_motupan {
 	data_obj_name output_pangenome_name;
 
 	string checkm_version;
+	string completeness_mode;
+	float  prior_completeness;
+	mapping<string,float> genome_prior_completeness;  /* genome name or ref -> prior completeness */
 	string mmseqs_cluster_mode;
 	float  mmseqs_min_seq_id;
 	/*int    mmseqs_cov_mode;*/
@@ -79,6 +132,17 @@ module kb_motupan {
         string               pcp_genome_disp_name_config;	
 
 	bool                 run_as_test_mode;
+
+	int                  genome_fetch_chunk_size;
+	int                  genome_fetch_threads;
+	string               genome_fetch_mode;
+	bool                 use_genome_cache;
+	int                  checkm_parallel_jobs;
+	int                  checkm_threads;
+	bool                 dedup_exact_seqs;
+	int                  threads;
+	string               max_memory;
+	file_path            tmp_dir;
     } run_kb_motupan_Params;
     
     funcdef run_kb_motupan (run_kb_motupan_Params params)  returns (ReportResults output) authentication required;
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+'''
+Annotations of clustered genes for the pangenome builder.
+
+Only the genes that appear in clusters are looked up, and only their gene
+names, functions and protein translation are kept.  On first use every
+annotated genome is read once, in genome index order, and its clustered
+genes packed into a sorted ordinal array plus one encoded blob, so lookups
+in cluster order never reload a genome and memory scales with the
+clustered genes rather than with whole genome objects.
+
+Annotations come from a loader callable
+    load_feature_annotations (genome_name, feature_ids)
+        -> {fid: (gene_names, functions, protein_translation)}
+see open_store_annotations() and open_genome_obj_annotations().
+'''
+import json
+from array import array
+from bisect import bisect_left
+
+from kb_motupan.Utils.AnnotationStore import AnnotationStore
+from kb_motupan.Utils.CompressedIO import open_text
+from kb_motupan.Utils.GeneCodes import ORDINAL_BITS, ORDINAL_MASK
+
+
+### get_genome_ordinals ()
+#
+#   {cluster_id: gene codes} -> {genome_i: sorted, unique gene ordinals in clusters}
+#
+def get_genome_ordinals (cluster_genes):
+    genome_ordinals = dict()
+    for gene_codes in cluster_genes.values():
+        for gene_code in gene_codes:
+            genome_i = gene_code >> ORDINAL_BITS
+            if genome_i not in genome_ordinals:
+                genome_ordinals[genome_i] = set()
+            genome_ordinals[genome_i].add(gene_code & ORDINAL_MASK)
+    return { genome_i: array('L', sorted(ordinals)) for genome_i, ordinals in genome_ordinals.items() }
+
+
+class AnnotationCache:
+    '''
+    Per genome: sorted ordinals of the annotated clustered genes, offsets
+    into a utf-8 json blob of their [gene_names, functions, protein_translation].
+    '''
+
+    ### __init__ ()
+    #
+    #   genome_names: genomes load_feature_annotations() has annotations for
+    #
+    def __init__ (self, genome_names, load_feature_annotations, gene_id_table, cluster_genes):
+        self.genome_names = set(genome_names)
+        self.load_feature_annotations = load_feature_annotations
+        self.gene_id_table = gene_id_table
+        self.cluster_genes = cluster_genes
+        self.genomes = None
+        self.gene_cnt = 0
+
+
+    ### get_genome_names ()
+    #
+    def get_genome_names (self):
+        return self.genome_names
+
+
+    ### load ()
+    #
+    #   one pass over the genomes with clustered genes
+    #
+    def load (self):
+        self.genomes = dict()
+        genome_ordinals = get_genome_ordinals (self.cluster_genes)
+        for genome_i in sorted(genome_ordinals.keys()):
+            genome_name = self.gene_id_table.genome_names[genome_i]
+            if genome_name not in self.genome_names:
+                continue
+            genome_source_gene_ids = self.gene_id_table.source_gene_ids[genome_i]
+            fid_ordinals = { genome_source_gene_ids[ordinal]: ordinal for ordinal in genome_ordinals[genome_i] }
+            feature_annotations = self.load_feature_annotations (genome_name, set(fid_ordinals.keys()))
+
+            ordinal_annotations = sorted([ (fid_ordinals[fid], annotations) for fid, annotations in feature_annotations.items() if fid in fid_ordinals ],
+                                         key=lambda ordinal_annotation: ordinal_annotation[0])
+            ordinals = array('L')
+            offsets = array('Q', [0])
+            blob = bytearray()
+            for (ordinal, annotations) in ordinal_annotations:
+                ordinals.append(ordinal)
+                blob += json.dumps (list(annotations), ensure_ascii=False).encode('utf-8')
+                offsets.append(len(blob))
+            self.genomes[genome_i] = (ordinals, offsets, bytes(blob))
+            self.gene_cnt += len(ordinals)
+
+
+    ### get ()
+    #
+    #   (gene_names, functions, protein_translation) for a clustered gene, or None
+    #
+    def get (self, genome_i, ordinal):
+        if self.genomes is None:
+            self.load()
+        if genome_i not in self.genomes:
+            return None
+        (ordinals, offsets, blob) = self.genomes[genome_i]
+        gene_i = bisect_left (ordinals, ordinal)
+        if gene_i == len(ordinals) or ordinals[gene_i] != ordinal:
+            return None
+        return tuple(json.loads (blob[offsets[gene_i]:offsets[gene_i+1]].decode('utf-8')))
+
+
+### open_store_annotations ()
+#
+#   annotations from the run AnnotationStore (sqlite)
+#
+def open_store_annotations (annotation_store_file, gene_id_table, cluster_genes):
+    annotation_store = AnnotationStore (annotation_store_file)
+    return AnnotationCache (annotation_store.get_genome_names(),
+                            annotation_store.get_feature_annotations,
+                            gene_id_table,
+                            cluster_genes)
+
+
+### load_genome_obj_feature_annotations ()
+#
+#   parses one genome object JSON file and keeps only the features in feature_ids
+#
+def load_genome_obj_feature_annotations (genome_obj_path, feature_ids):
+    with open_text (genome_obj_path, 'r') as json_genome_obj_file:
+        genome_obj = json.load (json_genome_obj_file)
+
+    feature_annotations = dict()
+    for feature in genome_obj['features']:
+        fid = feature['id']
+        if fid not in feature_ids:
+            continue
+        gene_names = []
+        for alias in feature.get('aliases', []):
+            [alias_type, alias_val] = alias
+            if alias_type == 'gene':
+                gene_names.append(alias_val)
+        feature_annotations[fid] = (gene_names,
+                                    feature.get('functions', []),
+                                    feature.get('protein_translation', ''))
+    return feature_annotations
+
+
+### open_genome_obj_annotations ()
+#
+#   annotations from per-genome object JSON files ({genome_name: json path})
+#
+def open_genome_obj_annotations (genome_obj_paths, gene_id_table, cluster_genes):
+    return AnnotationCache (genome_obj_paths.keys(),
+                            lambda genome_name, feature_ids: load_genome_obj_feature_annotations (genome_obj_paths[genome_name], feature_ids),
+                            gene_id_table,
+                            cluster_genes)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import sqlite3
+
+
+class AnnotationStore:
+    '''
+    Slim per-feature annotations for a run, keyed by (genome_name, feature_id).
+
+    Holds only what the pangenome builder uses (gene name aliases, functions,
+    protein translation) in a single indexed SQLite file, written at genome
+    ingest and read back by parse_mmseqs_and_mOTUpan.py.
+    '''
+
+    SQL_BATCH = 500
+
+    ### __init__ ()
+    #
+    def __init__ (self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname (os.path.abspath (db_path))
+        if not os.path.exists (db_dir):
+            os.makedirs (db_dir, mode=0o777, exist_ok=True)
+        with self.connect() as conn:
+            conn.execute ('CREATE TABLE IF NOT EXISTS annotations ('
+                          ' genome_name TEXT NOT NULL,'
+                          ' feature_id TEXT NOT NULL,'
+                          ' gene_names TEXT NOT NULL,'
+                          ' functions TEXT NOT NULL,'
+                          ' protein_translation TEXT NOT NULL,'
+                          ' PRIMARY KEY (genome_name, feature_id)) WITHOUT ROWID')
+
+
+    ### connect ()
+    #
+    #   run scratch file, so skip fsyncs
+    #
+    def connect (self):
+        conn = sqlite3.connect (self.db_path, timeout=60)
+        conn.execute ('PRAGMA synchronous=OFF')
+        return conn
+
+
+    ### add_genome ()
+    #
+    #   features: genome obj features; only those with a protein translation are kept
+    #
+    def add_genome (self, genome_name, features):
+        rows = []
+        for feature in features:
+            if not feature.get('protein_translation'):
+                continue
+            gene_names = []
+            for alias in feature.get('aliases', []):
+                [alias_type, alias_val] = alias
+                if alias_type == 'gene':
+                    gene_names.append(alias_val)
+            rows.append ((genome_name,
+                          feature['id'],
+                          json.dumps(gene_names),
+                          json.dumps(feature.get('functions', [])),
+                          feature['protein_translation']))
+        with self.connect() as conn:
+            conn.executemany ('INSERT OR REPLACE INTO annotations'
+                              ' (genome_name, feature_id, gene_names, functions, protein_translation)'
+                              ' VALUES (?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+
+    ### get_genome_names ()
+    #
+    def get_genome_names (self):
+        with self.connect() as conn:
+            return [row[0] for row in conn.execute ('SELECT DISTINCT genome_name FROM annotations ORDER BY genome_name')]
+
+
+    ### get_feature_annotations ()
+    #
+    #   returns {fid: (gene_names, functions, protein_translation)} for fids in feature_ids,
+    #   looked up on the (genome_name, feature_id) key
+    #
+    def get_feature_annotations (self, genome_name, feature_ids):
+        feature_annotations = dict()
+        feature_ids = sorted(feature_ids)
+        with self.connect() as conn:
+            for batch_start in range(0, len(feature_ids), self.SQL_BATCH):
+                batch_fids = feature_ids[batch_start:batch_start+self.SQL_BATCH]
+                placeholders = ','.join(['?'] * len(batch_fids))
+                rows = conn.execute ('SELECT feature_id, gene_names, functions, protein_translation'
+                                     ' FROM annotations WHERE genome_name = ? AND feature_id IN ('+placeholders+')',
+                                     [genome_name] + batch_fids)
+                for (fid, fid_gene_names, fid_functions, protein_translation) in rows:
+                    feature_annotations[fid] = (json.loads(fid_gene_names), json.loads(fid_functions), protein_translation)
+        return feature_annotations
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import gzip
+import sqlite3
+from abc import ABC, abstractmethod
+
+
+#
+# Completeness providers are walked in order by get_genome_qual_scores().
+# Each one gets the genomes still lacking scores, as a list of
+#   {'name': genome_name, 'ref': genome_upa}
+# and returns the ones it can score as
+#   {genome_name: {'completeness': x, 'contamination': y}}
+#
+
+
+class CompletenessProvider (ABC):
+    name = 'base'
+
+    ### get_scores ()
+    #
+    @abstractmethod
+    def get_scores (self, genomes):
+        pass
+
+
+class EmbeddedScoresProvider (CompletenessProvider):
+    '''
+    quality_scores already stored in the genome objects (gathered at ingest)
+    '''
+    name = 'genome_obj'
+
+    ### __init__ ()
+    #
+    def __init__ (self, embedded_qual_scores):
+        self.embedded_qual_scores = embedded_qual_scores
+
+    ### get_scores ()
+    #
+    def get_scores (self, genomes):
+        return {genome['name']: self.embedded_qual_scores[genome['name']]
+                for genome in genomes if genome['name'] in self.embedded_qual_scores}
+
+
+class CachedScoresProvider (CompletenessProvider):
+    '''
+    scores from earlier runs in the local QualScoreCache
+    '''
+    name = 'cache'
+
+    ### __init__ ()
+    #
+    def __init__ (self, qual_score_cache, checkm_version):
+        self.qual_score_cache = qual_score_cache
+        self.checkm_version = checkm_version
+
+    ### get_scores ()
+    #
+    def get_scores (self, genomes):
+        cached_qual_scores = self.qual_score_cache.get_many ([genome['ref'] for genome in genomes], self.checkm_version)
+        return {genome['name']: cached_qual_scores[genome['ref']]
+                for genome in genomes if genome['ref'] in cached_qual_scores}
+
+
+class GTDBMetadataProvider (CompletenessProvider):
+    '''
+    CheckM scores from a GTDB metadata TSV (same columns read by
+    setup_docker_mOTUpan_runs.get_checkm_scores()), matched on the
+    GCA_/GCF_ accession in the genome name.  The TSV is indexed once into
+    SQLite and reindexed only when the TSV changes.  log is the caller's
+    logger for progress messages.
+    '''
+    name = 'gtdb_metadata'
+
+    GENOME_ID_I            = 0
+    CHECKM_COMPLETENESS_I  = 2
+    CHECKM_CONTAMINATION_I = 3
+
+    ### __init__ ()
+    #
+    def __init__ (self, gtdb_metadata_file, index_path, log):
+        self.gtdb_metadata_file = gtdb_metadata_file
+        self.index_path = index_path
+        self.log = log
+        self.build_index()
+
+    ### get_accession ()
+    #
+    @staticmethod
+    def get_accession (genome_name):
+        accession_match = re.search(r'(GC[AF]_\d{9}\.\d+)', genome_name)
+        if accession_match is None:
+            return None
+        return accession_match.group(1)
+
+    ### build_index ()
+    #
+    def build_index (self):
+        tsv_stat = os.stat (self.gtdb_metadata_file)
+        tsv_sig = "{}:{}:{}".format(os.path.abspath(self.gtdb_metadata_file), tsv_stat.st_size, int(tsv_stat.st_mtime))
+
+        conn = sqlite3.connect (self.index_path, timeout=60)
+        try:
+            conn.execute ('CREATE TABLE IF NOT EXISTS index_info (sig TEXT)')
+            conn.execute ('CREATE TABLE IF NOT EXISTS checkm_scores ('
+                          ' accession TEXT PRIMARY KEY,'
+                          ' completeness REAL,'
+                          ' contamination REAL)')
+            row = conn.execute ('SELECT sig FROM index_info').fetchone()
+            if row is not None and row[0] == tsv_sig:
+                return
+
+            self.log ("indexing GTDB metadata file {} ...".format(self.gtdb_metadata_file))
+            if self.gtdb_metadata_file.lower().endswith('.gz'):
+                f = gzip.open(self.gtdb_metadata_file, 'rt')
+            else:
+                f = open(self.gtdb_metadata_file, 'r')
+
+            with conn:
+                conn.execute ('DELETE FROM checkm_scores')
+                conn.execute ('DELETE FROM index_info')
+                rows = []
+                for line in f:
+                    if line.startswith ('accession'):
+                        continue
+                    metadata = line.rstrip().split("\t")
+                    genome_id = metadata[self.GENOME_ID_I]
+                    genome_id = re.sub(r'^GB_', '', genome_id)
+                    genome_id = re.sub(r'^RS_', '', genome_id)
+                    rows.append ((genome_id,
+                                  float(metadata[self.CHECKM_COMPLETENESS_I]),
+                                  float(metadata[self.CHECKM_CONTAMINATION_I])))
+                    if len(rows) >= 10000:
+                        conn.executemany ('INSERT OR REPLACE INTO checkm_scores VALUES (?, ?, ?)', rows)
+                        rows = []
+                conn.executemany ('INSERT OR REPLACE INTO checkm_scores VALUES (?, ?, ?)', rows)
+                conn.execute ('INSERT INTO index_info VALUES (?)', (tsv_sig,))
+            f.close()
+        finally:
+            conn.close()
+
+    ### get_scores ()
+    #
+    def get_scores (self, genomes):
+        qual_scores = dict()
+        conn = sqlite3.connect (self.index_path, timeout=60)
+        try:
+            for genome in genomes:
+                accession = self.get_accession (genome['name'])
+                if accession is None:
+                    continue
+                row = conn.execute ('SELECT completeness, contamination FROM checkm_scores WHERE accession = ?',
+                                    (accession,)).fetchone()
+                if row is not None:
+                    qual_scores[genome['name']] = {'completeness': row[0], 'contamination': row[1]}
+        finally:
+            conn.close()
+        return qual_scores
+
+
+class UserPriorProvider (CompletenessProvider):
+    '''
+    per-genome prior completeness supplied by the user, keyed by genome ref
+    or genome name (ref checked first)
+    '''
+    name = 'user_prior'
+
+    ### __init__ ()
+    #
+    def __init__ (self, genome_prior_completeness):
+        self.genome_prior_completeness = {genome_key: float(prior_completeness)
+                                          for genome_key, prior_completeness in genome_prior_completeness.items()}
+
+    ### get_scores ()
+    #
+    def get_scores (self, genomes):
+        qual_scores = dict()
+        for genome in genomes:
+            for genome_key in [genome['ref'], genome['name']]:
+                if genome_key in self.genome_prior_completeness:
+                    qual_scores[genome['name']] = {'completeness': self.genome_prior_completeness[genome_key], 'contamination': 'N/A'}
+                    break
+        return qual_scores
+
+
+class UniformPriorProvider (CompletenessProvider):
+    '''
+    same prior completeness for every genome (CheckM-free fast mode, where
+    mOTUpan's posterior completeness is what gets used)
+    '''
+    name = 'uniform_prior'
+
+    ### __init__ ()
+    #
+    def __init__ (self, prior_completeness):
+        self.prior_completeness = float(prior_completeness)
+
+    ### get_scores ()
+    #
+    def get_scores (self, genomes):
+        return {genome['name']: {'completeness': self.prior_completeness, 'contamination': 'N/A'}
+                for genome in genomes}
+
+
+class CheckMProvider (CompletenessProvider):
+    '''
+    last resort: run CheckM (run_checkm is supplied by the Impl)
+    '''
+
+    ### __init__ ()
+    #
+    def __init__ (self, run_checkm, name='CheckM'):
+        self.run_checkm = run_checkm
+        self.name = name
+
+    ### get_scores ()
+    #
+    def get_scores (self, genomes):
+        return self.run_checkm (genomes)
+
+
+### get_completeness_providers ()
+#
+#   user supplied priors, then cheapest source first.  CheckM is not included:
+#   the caller runs a CheckMProvider on what's left.  qual_score_cache and
+#   gtdb_metadata_file are optional; GTDB scores are CheckM-1 scores
+#
+def get_completeness_providers (embedded_qual_scores, checkm_version, log,
+                                qual_score_cache=None,
+                                gtdb_metadata_file=None,
+                                gtdb_metadata_index=None,
+                                completeness_mode='checkm',
+                                prior_completeness=95.0,
+                                genome_prior_completeness=None):
+    providers = []
+    if genome_prior_completeness:
+        providers.append(UserPriorProvider(genome_prior_completeness))
+    providers.append(EmbeddedScoresProvider(embedded_qual_scores))
+    if qual_score_cache is not None:
+        providers.append(CachedScoresProvider(qual_score_cache, checkm_version))
+    if gtdb_metadata_file and checkm_version == 'CheckM-1':
+        try:
+            providers.append(GTDBMetadataProvider(gtdb_metadata_file, gtdb_metadata_index, log))
+        except Exception as e:
+            log ("unable to use GTDB metadata file {}: {}".format(gtdb_metadata_file, str(e)))
+
+    # fast mode never runs CheckM.  mOTUpan estimates posterior completeness
+    if completeness_mode == 'fast':
+        providers.append(UniformPriorProvider(prior_completeness))
+    return providers
+
+
+### resolve_genome_qual_scores ()
+#
+#   resolve each genome with the first provider that has it, filling
+#   genome_qual_scores and genome_qual_sources.  Returns the genomes
+#   no provider had
+#
+def resolve_genome_qual_scores (providers, unresolved_genomes, genome_qual_scores, genome_qual_sources, log):
+    for provider in providers:
+        if not unresolved_genomes:
+            break
+        log ("checking {} for completeness of {} genomes".format(provider.name, len(unresolved_genomes)))
+        found_qual_scores = provider.get_scores (unresolved_genomes)
+        for genome in unresolved_genomes:
+            if genome['name'] in found_qual_scores:
+                log ("found completeness score for {} ({}) from {}".format(genome['name'], genome['ref'], provider.name))
+                genome_qual_scores[genome['name']] = found_qual_scores[genome['name']]
+                genome_qual_sources[genome['name']] = provider.name
+        unresolved_genomes = [genome for genome in unresolved_genomes if genome['name'] not in genome_qual_scores]
+
+    return unresolved_genomes
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+'''
+Shared reader/writer for pipeline intermediates.
+
+The codec is picked from the file extension ('.gz' gzip, '.zst' zstd, else
+plain text), so readers don't need to know how a file was written.  zstd
+needs the optional zstandard module; without it 'zstd' falls back to gzip.
+'''
+import os
+import io
+import gzip
+import shutil
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CODEC_EXTENSIONS = { 'none': '',
+                     'gzip': '.gz',
+                     'zstd': '.zst'
+                     }
+CODEC_ALIASES = { 'gz': 'gzip',
+                  'zst': 'zstd',
+                  'plain': 'none',
+                  '': 'none'
+                  }
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+### resolve_codec ()
+#
+def resolve_codec (codec):
+    codec = str(codec or 'none').lower()
+    codec = CODEC_ALIASES.get(codec, codec)
+    if codec not in CODEC_EXTENSIONS:
+        raise ValueError ("unknown compression codec '{}' (must be one of {})".format(codec, ", ".join(sorted(CODEC_EXTENSIONS.keys()))))
+    if codec == 'zstd' and zstandard is None:
+        codec = 'gzip'
+    return codec
+
+
+### codec_path ()
+#
+def codec_path (path, codec):
+    return path + CODEC_EXTENSIONS[resolve_codec(codec)]
+
+
+### path_codec ()
+#
+def path_codec (path):
+    lower_path = path.lower()
+    for codec in ['gzip', 'zstd']:
+        if lower_path.endswith(CODEC_EXTENSIONS[codec]):
+            return codec
+    return 'none'
+
+
+### strip_codec_ext ()
+#
+def strip_codec_ext (path):
+    return path[:len(path)-len(CODEC_EXTENSIONS[path_codec(path)])]
+
+
+### find_existing_path ()
+#
+#   path itself if present, else a compressed copy of it
+#
+def find_existing_path (path):
+    for ext in ['', CODEC_EXTENSIONS['gzip'], CODEC_EXTENSIONS['zstd']]:
+        if os.path.isfile (path+ext):
+            return path+ext
+    return path
+
+
+### open_text ()
+#
+#   mode is 'r', 'w', or 'a'.  buffering only applies to plain files
+#
+def open_text (path, mode='r', buffering=-1):
+    codec = path_codec (path)
+    if codec == 'gzip':
+        return gzip.open (path, mode+'t', compresslevel=GZIP_LEVEL, encoding='utf-8')
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError ("zstandard module required to open {}".format(path))
+        raw_handle = open (path, mode+'b')
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader (raw_handle, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer (raw_handle, closefd=True)
+        return io.TextIOWrapper (stream, encoding='utf-8')
+    return open (path, mode, buffering=buffering, encoding='utf-8')
+
+
+### compress_file ()
+#
+#   replace plain file with compressed copy, returning the new path
+#
+def compress_file (path, codec):
+    codec = resolve_codec (codec)
+    if codec == 'none' or path_codec(path) != 'none' or not os.path.isfile (path):
+        return path
+    out_path = codec_path (path, codec)
+    with open (path, 'rb') as in_handle:
+        if codec == 'gzip':
+            with gzip.open (out_path, 'wb', compresslevel=GZIP_LEVEL) as out_handle:
+                shutil.copyfileobj (in_handle, out_handle, 1024*1024)
+        else:
+            with open (out_path, 'wb') as out_raw_handle:
+                zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream (in_handle, out_raw_handle)
+    os.remove (path)
+    return out_path
+
+
+### decompress_file ()
+#
+#   replace compressed file with plain copy, for tools that can't read it, returning the new path
+#
+def decompress_file (path):
+    if path_codec(path) == 'none' or not os.path.isfile (path):
+        return path
+    out_path = strip_codec_ext (path)
+    with open_text (path, 'r') as in_handle, \
+         open (out_path, 'w', encoding='utf-8') as out_handle:
+        shutil.copyfileobj (in_handle, out_handle, 1024*1024)
+    os.remove (path)
+    return out_path
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+'''
+Exact-sequence dedup of the protein faa before MMseqs2 clustering.
+
+Only the first copy of each distinct sequence is clustered.  The other
+copies are listed in a dup map ("kept_gene_id<TAB>dup_gene_id") and put
+back into their kept copy's cluster afterwards, so the expanded clusters
+hold every input gene.
+'''
+import hashlib
+
+from kb_motupan.Utils.CompressedIO import open_text
+
+
+### dedup_faa_file ()
+#
+#   write first copy of each distinct protein sequence to dedup_faa_path
+#   and "kept_gene_id<TAB>dup_gene_id" rows for the other copies to dup_map_path.
+#   returns (total proteins, distinct proteins)
+#
+def dedup_faa_file (faa_path, dedup_faa_path, dup_map_path, buffering=-1):
+    seq_digest_to_gene_id = dict()
+    total_cnt = 0
+    unique_cnt = 0
+
+    def write_record (gene_id, header, seq_lines):
+        seq = "".join(seq_lines)
+        seq_digest = hashlib.md5(seq.encode('ascii')).digest()
+        kept_gene_id = seq_digest_to_gene_id.get(seq_digest)
+        if kept_gene_id is None:
+            seq_digest_to_gene_id[seq_digest] = gene_id
+            dedup_faa_handle.write(header+seq+"\n")
+            return 1
+        dup_map_handle.write(kept_gene_id+"\t"+gene_id+"\n")
+        return 0
+
+    with open_text (faa_path, 'r') as faa_handle, \
+         open_text (dedup_faa_path, 'w', buffering=buffering) as dedup_faa_handle, \
+         open_text (dup_map_path, 'w', buffering=buffering) as dup_map_handle:
+
+        gene_id = None
+        header = None
+        seq_lines = []
+        for faa_line in faa_handle:
+            if faa_line.startswith('>'):
+                if gene_id is not None:
+                    total_cnt += 1
+                    unique_cnt += write_record (gene_id, header, seq_lines)
+                header = faa_line
+                gene_id = faa_line[1:].split()[0]
+                seq_lines = []
+            else:
+                seq_lines.append(faa_line.strip())
+        if gene_id is not None:
+            total_cnt += 1
+            unique_cnt += write_record (gene_id, header, seq_lines)
+
+    return (total_cnt, unique_cnt)
+
+
+### expand_dedup_clusters ()
+#
+#   add back the dropped duplicate genes to the cluster of their kept copy
+#
+def expand_dedup_clusters (dedup_cluster_path, dup_map_path, cluster_path, buffering=-1):
+    dup_gene_ids = dict()
+    with open_text (dup_map_path, 'r') as dup_map_handle:
+        for line in dup_map_handle:
+            (kept_gene_id, dup_gene_id) = line.rstrip().split("\t")
+            if kept_gene_id not in dup_gene_ids:
+                dup_gene_ids[kept_gene_id] = []
+            dup_gene_ids[kept_gene_id].append(dup_gene_id)
+
+    with open (dedup_cluster_path, 'r') as dedup_cluster_handle, \
+         open (cluster_path, 'w', buffering=buffering) as cluster_handle:
+        for line in dedup_cluster_handle:
+            (cluster_id, gene_id) = line.rstrip().split("\t")
+            cluster_handle.write(cluster_id+"\t"+gene_id+"\n")
+            for dup_gene_id in dup_gene_ids.get(gene_id, []):
+                cluster_handle.write(cluster_id+"\t"+dup_gene_id+"\n")
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+'''
+Integer codes for the "<genome_name>_<ordinal>" gene ids written at faa
+formatting (ingest_genome_objs(), format_faas_for_mOTUpan.py).
+
+A gene code is (genome_index << ORDINAL_BITS) | ordinal, so per-gene data
+can sit in per-genome lists indexed by ordinal instead of dicts keyed by
+millions of id strings, and the genome and gene order come back with shifts
+rather than regexes.
+'''
+from array import array
+
+from kb_motupan.Utils.CompressedIO import open_text
+
+
+ORDINAL_BITS = 32
+ORDINAL_MASK = (1 << ORDINAL_BITS) - 1
+
+# prefix on the original gene ids in the run gene id map ("<genome_name>.f:<feature_id>")
+SOURCE_ID_SEP = '.f:'
+
+
+### split_gene_id ()
+#
+#   "<genome_name>_<ordinal>" -> (genome_name, ordinal)
+#
+def split_gene_id (genome_based_gene_id):
+    (genome_name, sep, ordinal) = genome_based_gene_id.rpartition('_')
+    return (genome_name, int(ordinal))
+
+
+class GeneIdTable:
+    '''
+    Genome index and per-genome ordinal -> source gene id (feature id).
+    '''
+
+    ### __init__ ()
+    #
+    def __init__ (self):
+        self.genome_names = []
+        self.genome_index = dict()
+        self.source_gene_ids = []
+
+
+    ### get_genome_i ()
+    #
+    def get_genome_i (self, genome_name, add=False):
+        genome_i = self.genome_index.get(genome_name)
+        if genome_i is None:
+            if not add:
+                raise KeyError ("genome {} not in gene id map".format(genome_name))
+            genome_i = len(self.genome_names)
+            self.genome_index[genome_name] = genome_i
+            self.genome_names.append(genome_name)
+            self.source_gene_ids.append([None])  # ordinals start at 1
+        return genome_i
+
+
+    ### add ()
+    #
+    def add (self, genome_based_gene_id, source_gene_id):
+        (genome_name, ordinal) = split_gene_id (genome_based_gene_id)
+        genome_gene_ids = self.source_gene_ids[self.get_genome_i (genome_name, add=True)]
+        if ordinal >= len(genome_gene_ids):
+            genome_gene_ids.extend ([None] * (ordinal + 1 - len(genome_gene_ids)))
+        genome_gene_ids[ordinal] = source_gene_id
+
+
+    ### encode ()
+    #
+    def encode (self, genome_based_gene_id):
+        (genome_name, ordinal) = split_gene_id (genome_based_gene_id)
+        return (self.get_genome_i (genome_name) << ORDINAL_BITS) | ordinal
+
+
+    ### lookup ()
+    #
+    #   "<genome_name>_<ordinal>" -> source gene id
+    #
+    def lookup (self, genome_based_gene_id):
+        (genome_name, ordinal) = split_gene_id (genome_based_gene_id)
+        return self.source_gene_ids[self.get_genome_i (genome_name)][ordinal]
+
+
+    ### encode_cluster_genes ()
+    #
+    #   {cluster_id: [gene_id]} -> {cluster_id: array of gene codes}
+    #
+    def encode_cluster_genes (self, cluster_genes):
+        return { cluster_id: array('q', [self.encode (gene_id) for gene_id in gene_ids])
+                 for cluster_id, gene_ids in cluster_genes.items() }
+
+
+    ### read_id_map ()
+    #
+    #   run gene id map ("<genome_name>_<ordinal><TAB>[<genome_name>.f:]<feature_id>")
+    #
+    @classmethod
+    def read_id_map (cls, id_map_file):
+        gene_id_table = cls()
+        with open_text (id_map_file, 'r') as id_map_handle:
+            for line in id_map_handle:
+                (genome_based_gene_id, scaffold_based_gene_id) = line.rstrip().split("\t")
+                gene_id_table.add (genome_based_gene_id, scaffold_based_gene_id.rpartition(SOURCE_ID_SEP)[2])
+        return gene_id_table
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+'''
+Binary, memory-mapped gene id map: gene ordinal -> source gene id, per genome.
+
+Replaces the two-column text .gene_id_map ("<genome_name>_<ordinal><TAB>
+<source_gene_id>"), which readers had to load into a dict of millions of
+string pairs.  Layout (little-endian):
+
+    header        magic, version, genome count, gene count, section offsets
+    genome table  per genome: name start/end (in names), first gene, gene count
+    gene offsets  gene count + 1 offsets into the id pool
+    names         genome names, utf-8
+    id pool       source gene ids, utf-8, in genome then ordinal order
+
+so the source id of (genome_i, ordinal) is one slice of the mapped file.
+open_gene_id_map() also reads the older text format.
+'''
+import os
+import sys
+import mmap
+import shutil
+import struct
+import tempfile
+from array import array
+
+from kb_motupan.Utils.CompressedIO import find_existing_path
+from kb_motupan.Utils.GeneCodes import GeneIdTable
+
+
+GENE_ID_MAP_EXT = '.gene_id_map.bin'
+MAGIC = b'KBGIDMAP'
+VERSION = 1
+HEADER_FMT = '<8sIIQQQQQ'
+GENOME_FMT = '<QQQQ'
+
+
+### is_gene_id_map ()
+#
+def is_gene_id_map (path):
+    try:
+        with open (path, 'rb') as map_handle:
+            return map_handle.read (len(MAGIC)) == MAGIC
+    except (IOError, OSError):
+        return False
+
+
+### open_gene_id_map ()
+#
+#   GeneIdMap for binary maps, else GeneIdTable parsed from a text id map
+#
+def open_gene_id_map (path):
+    if is_gene_id_map (path):
+        return GeneIdMap (path)
+    return GeneIdTable.read_id_map (find_existing_path (path))
+
+
+class GeneIdMapWriter:
+    '''
+    Streams genes one genome at a time.  Only the gene offsets (8 bytes per
+    gene) and genome names are held in memory; ids go to a temp pool file.
+    '''
+
+    ### __init__ ()
+    #
+    def __init__ (self, path):
+        self.path = path
+        self.genome_names = []
+        self.genome_first_genes = []
+        self.gene_offsets = array('Q', [0])
+        self.pool_handle = tempfile.NamedTemporaryFile (prefix='gene_id_pool.', dir=os.path.dirname (os.path.abspath (path)), delete=False)
+        self.pool_size = 0
+
+
+    ### add_genome ()
+    #
+    #   following add_gene() calls are this genome's ordinals 1, 2, ...
+    #
+    def add_genome (self, genome_name):
+        self.genome_names.append(genome_name)
+        self.genome_first_genes.append(len(self.gene_offsets) - 1)
+
+
+    ### add_gene ()
+    #
+    def add_gene (self, source_gene_id):
+        source_gene_id_bytes = source_gene_id.encode('utf-8')
+        self.pool_handle.write (source_gene_id_bytes)
+        self.pool_size += len(source_gene_id_bytes)
+        self.gene_offsets.append(self.pool_size)
+        return len(self.gene_offsets) - 1 - self.genome_first_genes[-1]
+
+
+    ### close ()
+    #
+    def close (self):
+        self.pool_handle.close()
+        try:
+            gene_cnt = len(self.gene_offsets) - 1
+            genome_cnt = len(self.genome_names)
+            names = b''
+            genome_table = b''
+            for genome_i, genome_name in enumerate(self.genome_names):
+                name_start = len(names)
+                names += genome_name.encode('utf-8')
+                if genome_i + 1 < genome_cnt:
+                    genome_gene_cnt = self.genome_first_genes[genome_i+1] - self.genome_first_genes[genome_i]
+                else:
+                    genome_gene_cnt = gene_cnt - self.genome_first_genes[genome_i]
+                genome_table += struct.pack (GENOME_FMT, name_start, len(names), self.genome_first_genes[genome_i], genome_gene_cnt)
+
+            gene_offsets = self.gene_offsets
+            if sys.byteorder != 'little':
+                gene_offsets = array('Q', gene_offsets)
+                gene_offsets.byteswap()
+            genome_table_start = struct.calcsize (HEADER_FMT)
+            gene_offsets_start = genome_table_start + len(genome_table)
+            names_start = gene_offsets_start + len(gene_offsets) * gene_offsets.itemsize
+            pool_start = names_start + len(names)
+
+            with open (self.path, 'wb') as map_handle:
+                map_handle.write (struct.pack (HEADER_FMT, MAGIC, VERSION, genome_cnt, gene_cnt,
+                                               genome_table_start, gene_offsets_start, names_start, pool_start))
+                map_handle.write (genome_table)
+                gene_offsets.tofile (map_handle)
+                map_handle.write (names)
+                with open (self.pool_handle.name, 'rb') as pool_handle:
+                    shutil.copyfileobj (pool_handle, map_handle, 1024*1024)
+        finally:
+            os.remove (self.pool_handle.name)
+        return self.path
+
+
+    ### __enter__ ()
+    #
+    def __enter__ (self):
+        return self
+
+
+    ### __exit__ ()
+    #
+    def __exit__ (self, exc_type, exc_value, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.pool_handle.close()
+            os.remove (self.pool_handle.name)
+        return False
+
+
+class GenomeGeneIds:
+    '''
+    One genome's source gene ids by ordinal (index 0 unused, as in GeneIdTable).
+    '''
+
+    ### __init__ ()
+    #
+    def __init__ (self, gene_id_map, first_gene, gene_cnt):
+        self.gene_id_map = gene_id_map
+        self.first_gene = first_gene
+        self.gene_cnt = gene_cnt
+
+
+    ### __len__ ()
+    #
+    def __len__ (self):
+        return self.gene_cnt + 1
+
+
+    ### __getitem__ ()
+    #
+    def __getitem__ (self, ordinal):
+        if ordinal == 0:
+            return None
+        if ordinal < 0 or ordinal > self.gene_cnt:
+            raise IndexError ("gene ordinal {} out of range".format(ordinal))
+        return self.gene_id_map.get_pool_str (self.first_gene + ordinal - 1)
+
+
+    ### __iter__ ()
+    #
+    def __iter__ (self):
+        for ordinal in range(self.gene_cnt + 1):
+            yield self[ordinal]
+
+
+class GeneIdMap (GeneIdTable):
+    '''
+    Read-only GeneIdTable backed by a memory-mapped binary gene id map.
+    '''
+
+    ### __init__ ()
+    #
+    def __init__ (self, path):
+        self.path = path
+        self.map_handle = open (path, 'rb')
+        self.mm = mmap.mmap (self.map_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, genome_cnt, gene_cnt,
+         genome_table_start, gene_offsets_start, names_start, self.pool_start) = struct.unpack_from (HEADER_FMT, self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError ("{} is not a version {} gene id map".format(path, VERSION))
+
+        if sys.byteorder == 'little':
+            self.gene_offsets = memoryview(self.mm)[gene_offsets_start:names_start].cast('Q')
+        else:
+            self.gene_offsets = array('Q', self.mm[gene_offsets_start:names_start])
+            self.gene_offsets.byteswap()
+
+        self.genome_names = []
+        self.genome_index = dict()
+        self.source_gene_ids = []
+        for genome_i in range(genome_cnt):
+            (name_start, name_end, first_gene, genome_gene_cnt) = struct.unpack_from (GENOME_FMT, self.mm, genome_table_start + genome_i * struct.calcsize (GENOME_FMT))
+            genome_name = self.mm[names_start+name_start:names_start+name_end].decode('utf-8')
+            self.genome_index[genome_name] = genome_i
+            self.genome_names.append(genome_name)
+            self.source_gene_ids.append(GenomeGeneIds (self, first_gene, genome_gene_cnt))
+
+
+    ### get_pool_str ()
+    #
+    def get_pool_str (self, gene_i):
+        return self.mm[self.pool_start+self.gene_offsets[gene_i]:self.pool_start+self.gene_offsets[gene_i+1]].decode('utf-8')
+
+
+    ### add ()
+    #
+    def add (self, genome_based_gene_id, source_gene_id):
+        raise ValueError ("gene id map {} is read-only".format(self.path))
+
+
+    ### close ()
+    #
+    def close (self):
+        if isinstance (self.gene_offsets, memoryview):
+            self.gene_offsets.release()
+        self.mm.close()
+        self.map_handle.close()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import gzip
+import uuid
+import fcntl
+
+
+class GenomeCache:
+    '''
+    On-disk cache of slimmed genome objects keyed by immutable UPA
+    (wsid/objid/ver), with a size cap and least-recently-used eviction.
+
+    Entries are written to a temp file and renamed into place, so readers
+    never see partial files, and eviction is serialized with a lock file so
+    several runs on one host can share the same cache dir.
+    '''
+
+    LOCK_FILE = '.lock'
+    ENTRY_SUFFIX = '.json.gz'
+
+
+    ### __init__ ()
+    #
+    def __init__ (self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        if not os.path.exists (self.cache_dir):
+            os.makedirs (self.cache_dir, mode=0o777, exist_ok=True)
+
+        
+    ### is_upa ()
+    #
+    @staticmethod
+    def is_upa (ref):
+        return re.match(r'^\d+/\d+/\d+$', ref) is not None
+
+
+    ### entry_path ()
+    #
+    def entry_path (self, upa):
+        (wsid, objid, ver) = upa.split('/')
+        return os.path.join (self.cache_dir, wsid, objid, ver+self.ENTRY_SUFFIX)
+
+
+    ### get ()
+    #
+    def get (self, upa):
+        if not self.is_upa (upa):
+            return None
+        entry_path = self.entry_path (upa)
+        try:
+            with gzip.open (entry_path, 'rt') as entry_h:
+                genome_obj = json.load (entry_h)
+            os.utime (entry_path)  # mark as recently used
+        except (FileNotFoundError, EOFError, OSError, ValueError):
+            return None
+        return genome_obj
+
+
+    ### put ()
+    #
+    def put (self, upa, genome_obj):
+        if not self.is_upa (upa):
+            return None
+        entry_path = self.entry_path (upa)
+        entry_dir = os.path.dirname (entry_path)
+        os.makedirs (entry_dir, mode=0o777, exist_ok=True)
+
+        tmp_path = os.path.join (entry_dir, '.'+str(uuid.uuid4())+'.tmp')
+        try:
+            with gzip.open (tmp_path, 'wt') as tmp_h:
+                json.dump (genome_obj, tmp_h)
+            os.replace (tmp_path, entry_path)
+        finally:
+            if os.path.exists (tmp_path):
+                os.remove (tmp_path)
+
+        return entry_path
+
+
+    ### evict ()
+    #
+    #   remove least recently used entries until cache is under max_bytes
+    #
+    def evict (self):
+        lock_path = os.path.join (self.cache_dir, self.LOCK_FILE)
+        with open (lock_path, 'a') as lock_h:
+            fcntl.flock (lock_h, fcntl.LOCK_EX)
+            try:
+                entries = []
+                total_bytes = 0
+                for root, dirs, files in os.walk (self.cache_dir):
+                    for filename in files:
+                        if not filename.endswith (self.ENTRY_SUFFIX):
+                            continue
+                        entry_path = os.path.join (root, filename)
+                        try:
+                            entry_stat = os.stat (entry_path)
+                        except FileNotFoundError:
+                            continue
+                        entries.append ((entry_stat.st_mtime, entry_stat.st_size, entry_path))
+                        total_bytes += entry_stat.st_size
+
+                if total_bytes <= self.max_bytes:
+                    return 0
+
+                evicted_cnt = 0
+                for (mtime, size, entry_path) in sorted (entries):
+                    if total_bytes <= self.max_bytes:
+                        break
+                    try:
+                        os.remove (entry_path)
+                    except FileNotFoundError:
+                        pass
+                    total_bytes -= size
+                    evicted_cnt += 1
+                return evicted_cnt
+            finally:
+                fcntl.flock (lock_h, fcntl.LOCK_UN)
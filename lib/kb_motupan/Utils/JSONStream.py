@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+'''
+Write a top-level JSON object whose large array fields are streamed.
+
+Fields are written in dict order.  A field whose value is an iterator or
+generator (not a list) is written as an array one item at a time, so the
+items never need to be held together.  Output matches
+json.dump(obj, handle, indent=indent, ensure_ascii=ensure_ascii) byte for
+byte, once the iterators are expanded to lists.
+'''
+import json
+from collections.abc import Iterator
+
+
+### indent_json ()
+#
+#   json text for val, with continuation lines shifted right by prefix
+#
+def indent_json (val, indent, prefix, ensure_ascii):
+    return json.dumps (val, indent=indent, ensure_ascii=ensure_ascii).replace("\n", "\n"+prefix)
+
+
+### write_streamed_array ()
+#
+def write_streamed_array (handle, items, indent, prefix, ensure_ascii):
+    item_prefix = prefix + ' ' * indent
+    item_cnt = 0
+    for item in items:
+        handle.write ((",\n" if item_cnt else "[\n") + item_prefix + indent_json (item, indent, item_prefix, ensure_ascii))
+        item_cnt += 1
+    handle.write ("\n"+prefix+"]" if item_cnt else "[]")
+    return item_cnt
+
+
+### dump_streaming ()
+#
+#   obj: dict, with iterator values for the arrays to stream
+#
+def dump_streaming (obj, handle, indent=4, ensure_ascii=False):
+    if not obj:
+        handle.write ("{}")
+        return
+    field_prefix = ' ' * indent
+    for field_i, (key, val) in enumerate(obj.items()):
+        handle.write (("{\n" if field_i == 0 else ",\n") + field_prefix + json.dumps (key, ensure_ascii=ensure_ascii) + ": ")
+        if isinstance (val, Iterator):
+            write_streamed_array (handle, val, indent, field_prefix, ensure_ascii)
+        else:
+            handle.write (indent_json (val, indent, field_prefix, ensure_ascii))
+    handle.write ("\n}")
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+'''
+MMseqs2 cluster tsv to mOTUpan input, without the mOTUconvert.py subprocess.
+
+One streaming pass over "cluster_id<TAB>gene_id" rows gives both the
+mOTUpan gene clusters JSON ({genome: [cluster_id]}) and the cluster ->
+member genes map, which is saved so parse_mmseqs_and_mOTUpan.py doesn't
+reread the tsv.  Gene ids are "<genome_name>_<gene_order>".
+'''
+import re
+import json
+
+from kb_motupan.Utils.CompressedIO import open_text
+
+
+GENE_ORDER_SUFFIX_RE = re.compile(r'_\d+$')
+
+
+### get_genome_name ()
+#
+def get_genome_name (genome_based_gene_id):
+    return GENE_ORDER_SUFFIX_RE.sub('', genome_based_gene_id)
+
+
+### read_mmseqs_clusters ()
+#
+#   returns ({cluster_id: [gene_id]}, {genome_name: [cluster_id]}), in file order
+#
+def read_mmseqs_clusters (cluster_tsv_path):
+    cluster_genes = dict()
+    genome_clusters = dict()
+    genome_cluster_seen = set()
+    with open_text (cluster_tsv_path, 'r') as cluster_handle:
+        for line in cluster_handle:
+            (cluster_id, genome_based_gene_id) = line.rstrip().split("\t")
+            if cluster_id not in cluster_genes:
+                cluster_genes[cluster_id] = []
+            cluster_genes[cluster_id].append(genome_based_gene_id)
+
+            genome_name = get_genome_name (genome_based_gene_id)
+            if (genome_name, cluster_id) in genome_cluster_seen:
+                continue
+            genome_cluster_seen.add ((genome_name, cluster_id))
+            if genome_name not in genome_clusters:
+                genome_clusters[genome_name] = []
+            genome_clusters[genome_name].append(cluster_id)
+    return (cluster_genes, genome_clusters)
+
+
+### write_json ()
+#
+def write_json (path, obj):
+    with open_text (path, 'w') as json_handle:
+        json.dump (obj, json_handle)
+
+
+### read_cluster_genes ()
+#
+def read_cluster_genes (cluster_genes_path):
+    with open_text (cluster_genes_path, 'r') as json_handle:
+        return json.load (json_handle)
+
+
+### convert_mmseqs_clusters ()
+#
+#   write mOTUpan gene clusters JSON and cluster genes JSON from the cluster tsv,
+#   returning (cluster count, {genome_name: [cluster_id]})
+#
+def convert_mmseqs_clusters (cluster_tsv_path, motupan_gene_clusters_path, cluster_genes_path):
+    (cluster_genes, genome_clusters) = read_mmseqs_clusters (cluster_tsv_path)
+    write_json (motupan_gene_clusters_path, genome_clusters)
+    write_json (cluster_genes_path, cluster_genes)
+    return (len(cluster_genes), genome_clusters)
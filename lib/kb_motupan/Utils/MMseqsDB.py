@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import shutil
+import hashlib
+import fcntl
+import tempfile
+
+from kb_motupan.Utils.CompressedIO import open_text
+
+
+class MMseqsDB:
+    '''
+    Persistent MMseqs2 sequence databases and prefilter results, kept outside
+    the run directory and keyed by the content of the input protein fasta.
+
+    Runs the same steps as mmseqs easy-cluster / easy-linclust (createdb,
+    cluster or linclust, createtsv, rep and all seqs fasta) but reuses an
+    existing createdb, and for parameter sweeps shares one prefilter across
+    align + clust runs with different min-seq-id / coverage.
+
+    run_cmd (cmd_list, run_dir) -> (retcode, output_lines) runs each command.
+    memory_args (e.g. ['--split-memory-limit', '16G']) only go to the
+    cluster, linclust, and prefilter steps.  If tmp_dir is given (e.g.
+    node-local SSD), mmseqs temporary files go there and only the final
+    cluster tsv and fasta files are copied to out_prefix.
+    '''
+
+    LOCK_FILE = '.lock'
+    DONE_SUFFIX = '.done'
+    SEQ_DB = 'seqDB'
+    OUTPUT_SUFFIXES = ['_cluster.tsv', '_rep_seq.fasta', '_all_seqs.fasta']
+
+
+    ### __init__ ()
+    #
+    def __init__ (self, mmseqs_bin, cache_dir, max_bytes, run_cmd):
+        self.mmseqs_bin = mmseqs_bin
+        self.cache_dir = os.path.abspath (cache_dir)
+        self.max_bytes = int(max_bytes)
+        self.run_cmd = run_cmd
+        if not os.path.exists (self.cache_dir):
+            os.makedirs (self.cache_dir, mode=0o777, exist_ok=True)
+
+
+    ### get_faa_digest ()
+    #
+    #   digest of uncompressed faa text, so recompressing doesn't miss the cache
+    #
+    @staticmethod
+    def get_faa_digest (faa_path):
+        digest = hashlib.sha1()
+        with open_text (faa_path, 'r') as faa_handle:
+            while True:
+                chunk = faa_handle.read (1024*1024)
+                if not chunk:
+                    break
+                digest.update (chunk.encode('utf-8'))
+        return digest.hexdigest()
+
+
+    ### get_entry_dir ()
+    #
+    def get_entry_dir (self, faa_path):
+        entry_dir = os.path.join (self.cache_dir, self.get_faa_digest (faa_path))
+        os.makedirs (entry_dir, mode=0o777, exist_ok=True)
+        os.utime (entry_dir)  # mark as recently used
+        return entry_dir
+
+
+    ### run_once ()
+    #
+    #   run cmds to create db_name in entry_dir unless already done, serialized per entry
+    #
+    def run_once (self, entry_dir, db_name, cmds):
+        done_path = os.path.join (entry_dir, db_name+self.DONE_SUFFIX)
+        with open (os.path.join (entry_dir, self.LOCK_FILE), 'a') as lock_h:
+            fcntl.flock (lock_h, fcntl.LOCK_EX)
+            try:
+                if os.path.exists (done_path):
+                    return (False, [])
+                output_lines = []
+                for cmd in cmds:
+                    (retcode, cmd_output_lines) = self.run_cmd (cmd, entry_dir)
+                    output_lines.extend (cmd_output_lines)
+                with open (done_path, 'w') as done_h:
+                    done_h.write ("\n")
+                return (True, output_lines)
+            finally:
+                fcntl.flock (lock_h, fcntl.LOCK_UN)
+
+
+    ### get_seq_db ()
+    #
+    def get_seq_db (self, faa_path):
+        entry_dir = self.get_entry_dir (faa_path)
+        self.run_once (entry_dir, self.SEQ_DB, [[self.mmseqs_bin, 'createdb', os.path.abspath(faa_path), self.SEQ_DB]])
+        return (entry_dir, self.SEQ_DB)
+
+
+    ### cluster_workflow ()
+    #
+    #   same outputs as mmseqs easy-cluster / easy-linclust into out_prefix_{cluster.tsv,rep_seq.fasta,all_seqs.fasta}
+    #
+    def cluster_workflow (self, faa_path, out_prefix, cluster_mode, cluster_args, threads, memory_args=[], tmp_dir=None):
+        threads_args = ['--threads', str(threads)]
+        (entry_dir, seq_db) = self.get_seq_db (faa_path)
+        cluster_cmd = {'easy-cluster': 'cluster', 'easy-linclust': 'linclust'}[cluster_mode]
+        clust_tag = self.get_args_tag ([cluster_cmd] + cluster_args)
+        clust_db = 'clu_'+clust_tag
+        if tmp_dir:
+            clust_tmp_dir = tempfile.mkdtemp (prefix='mmseqs_tmp_'+clust_tag+'.', dir=os.path.abspath (tmp_dir))
+        else:
+            clust_tmp_dir = os.path.join (entry_dir, 'tmp_'+clust_tag)
+        try:
+            (ran, output_lines) = self.run_once (entry_dir, clust_db,
+                                                 [[self.mmseqs_bin, cluster_cmd, seq_db, clust_db, clust_tmp_dir] + cluster_args + threads_args + memory_args])
+        finally:
+            shutil.rmtree (clust_tmp_dir, ignore_errors=True)
+        self.write_cluster_outputs (entry_dir, seq_db, clust_db, out_prefix, threads_args, tmp_dir)
+        return (entry_dir, output_lines)
+
+
+    ### get_prefilter_db ()
+    #
+    #   one all-vs-all prefilter per seq db (default, most permissive settings)
+    #
+    def get_prefilter_db (self, faa_path, threads, memory_args=[]):
+        (entry_dir, seq_db) = self.get_seq_db (faa_path)
+        pref_db = 'prefDB'
+        self.run_once (entry_dir, pref_db, [[self.mmseqs_bin, 'prefilter', seq_db, seq_db, pref_db, '--threads', str(threads)] + memory_args])
+        return (entry_dir, seq_db, pref_db)
+
+
+    ### cluster_from_prefilter ()
+    #
+    #   align shared prefilter hits with these thresholds, then clust
+    #
+    def cluster_from_prefilter (self, faa_path, out_prefix, align_args, threads, memory_args=[], tmp_dir=None):
+        threads_args = ['--threads', str(threads)]
+        (entry_dir, seq_db, pref_db) = self.get_prefilter_db (faa_path, threads, memory_args)
+        align_tag = self.get_args_tag (align_args)
+        aln_db = 'aln_'+align_tag
+        clust_db = 'clu_sweep_'+align_tag
+        self.run_once (entry_dir, clust_db,
+                       [[self.mmseqs_bin, 'align', seq_db, seq_db, pref_db, aln_db] + align_args + threads_args,
+                        [self.mmseqs_bin, 'clust', seq_db, aln_db, clust_db] + threads_args])
+        self.write_cluster_outputs (entry_dir, seq_db, clust_db, out_prefix, threads_args, tmp_dir)
+        return entry_dir
+
+
+    ### write_cluster_outputs ()
+    #
+    def write_cluster_outputs (self, entry_dir, seq_db, clust_db, out_prefix, threads_args, tmp_dir=None):
+        out_prefix = os.path.abspath (out_prefix)
+        if tmp_dir:
+            work_dir = tempfile.mkdtemp (prefix='mmseqs_work.', dir=os.path.abspath (tmp_dir))
+            work_prefix = os.path.join (work_dir, os.path.basename (out_prefix))
+        else:
+            work_dir = out_prefix+'_mmseqs_work'
+            os.makedirs (work_dir, mode=0o777, exist_ok=True)
+            work_prefix = out_prefix
+        seq_db = os.path.join (entry_dir, seq_db)
+        clust_db = os.path.join (entry_dir, clust_db)
+        rep_db = os.path.join (work_dir, 'clu_rep')
+        seqs_db = os.path.join (work_dir, 'clu_seqs')
+        try:
+            for cmd in [[self.mmseqs_bin, 'createtsv', seq_db, seq_db, clust_db, work_prefix+'_cluster.tsv'] + threads_args,
+                        [self.mmseqs_bin, 'result2repseq', seq_db, clust_db, rep_db] + threads_args,
+                        [self.mmseqs_bin, 'result2flat', seq_db, seq_db, rep_db, work_prefix+'_rep_seq.fasta', '--use-fasta-header'],
+                        [self.mmseqs_bin, 'createseqfiledb', seq_db, clust_db, seqs_db] + threads_args,
+                        [self.mmseqs_bin, 'result2flat', seq_db, seq_db, seqs_db, work_prefix+'_all_seqs.fasta']]:
+                self.run_cmd (cmd, entry_dir)
+            # only the final outputs go back to the run dir
+            if work_prefix != out_prefix:
+                for suffix in self.OUTPUT_SUFFIXES:
+                    shutil.move (work_prefix+suffix, out_prefix+suffix)
+        finally:
+            shutil.rmtree (work_dir, ignore_errors=True)
+
+
+    ### get_args_tag ()
+    #
+    @staticmethod
+    def get_args_tag (args):
+        return hashlib.sha1 (" ".join([str(arg) for arg in args]).encode('utf-8')).hexdigest()[0:12]
+
+
+    ### evict ()
+    #
+    #   remove least recently used db entries (except keep_entry_dir) until under max_bytes
+    #
+    def evict (self, keep_entry_dir=None):
+        lock_path = os.path.join (self.cache_dir, self.LOCK_FILE)
+        with open (lock_path, 'a') as lock_h:
+            fcntl.flock (lock_h, fcntl.LOCK_EX)
+            try:
+                entries = []
+                total_bytes = 0
+                for entry_name in os.listdir (self.cache_dir):
+                    entry_dir = os.path.join (self.cache_dir, entry_name)
+                    if not re.match(r'^[0-9a-f]{40}$', entry_name) or not os.path.isdir (entry_dir):
+                        continue
+                    entry_bytes = 0
+                    for root, dirs, files in os.walk (entry_dir):
+                        for filename in files:
+                            try:
+                                entry_bytes += os.path.getsize (os.path.join (root, filename))
+                            except FileNotFoundError:
+                                pass
+                    entries.append ((os.path.getmtime (entry_dir), entry_bytes, entry_dir))
+                    total_bytes += entry_bytes
+
+                evicted_cnt = 0
+                for (mtime, entry_bytes, entry_dir) in sorted (entries):
+                    if total_bytes <= self.max_bytes:
+                        break
+                    if keep_entry_dir and os.path.abspath (entry_dir) == os.path.abspath (keep_entry_dir):
+                        continue
+                    shutil.rmtree (entry_dir, ignore_errors=True)
+                    total_bytes -= entry_bytes
+                    evicted_cnt += 1
+                return evicted_cnt
+            finally:
+                fcntl.flock (lock_h, fcntl.LOCK_UN)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+'''
+Run mOTUpan in-process through mOTUlizer's mOTU class.
+
+Takes the gene clusters ({genome: [cluster_id]}) and prior completeness
+({genome: percent}) already in memory, instead of mOTUpan.py rereading
+them from the JSON and .checkm files.  Returns the same table mOTUpan.py
+writes with --output.  Callers fall back to the mOTUpan.py subprocess only
+if check_api() fails (mOTUlizer isn't importable or its API doesn't match);
+errors from the run itself are not API mismatches.
+'''
+import inspect
+
+from kb_motupan.Utils.CompressedIO import open_text
+
+try:
+    from mOTUlizer.classes.mOTU import mOTU
+except ImportError:
+    mOTU = None
+
+
+MOTU_KWARGS = ['name', 'faas', 'gene_clusters_dict', 'genome_completion_dict', 'max_it']
+
+
+### api_available ()
+#
+def api_available ():
+    return mOTU is not None
+
+
+### check_api ()
+#
+#   ImportError if mOTUlizer is missing, TypeError if mOTU doesn't take
+#   the arguments run_motupan() passes
+#
+def check_api ():
+    if mOTU is None:
+        raise ImportError ("mOTUlizer not installed")
+    motu_params = inspect.signature (mOTU.__init__).parameters
+    if not any (param.kind == param.VAR_KEYWORD for param in motu_params.values()):
+        missing_kwargs = [kwarg for kwarg in MOTU_KWARGS if kwarg not in motu_params]
+        if missing_kwargs:
+            raise TypeError ("mOTU() does not take {}".format(", ".join(missing_kwargs)))
+    if not callable (getattr (mOTU, 'pretty_pan_table', None)):
+        raise TypeError ("mOTU has no pretty_pan_table()")
+
+
+### read_checkm_completeness ()
+#
+#   {genome: completeness} from a 'Bin Id<TAB>Completeness<TAB>...' file
+#
+def read_checkm_completeness (checkm_path):
+    completeness = dict()
+    with open_text (checkm_path, 'r') as checkm_handle:
+        header = checkm_handle.readline().rstrip("\n").split("\t")
+        bin_id_i = header.index('Bin Id')
+        completeness_i = header.index('Completeness')
+        for line in checkm_handle:
+            row = line.rstrip("\n").split("\t")
+            if len(row) <= completeness_i:
+                continue
+            completeness[row[bin_id_i]] = float(row[completeness_i])
+    return completeness
+
+
+### run_motupan ()
+#
+#   returns the mOTUpan output table as text
+#
+def run_motupan (genome_clusters, genome_completeness, max_iter, name=None):
+    check_api()
+    gene_clusters_dict = { genome: set(clusters) for genome, clusters in genome_clusters.items() }
+    motu = mOTU (name = name,
+                 faas = {},
+                 gene_clusters_dict = gene_clusters_dict,
+                 genome_completion_dict = genome_completeness,
+                 max_it = int(max_iter))
+    pan_table = motu.pretty_pan_table()
+    if not isinstance (pan_table, str):
+        pan_table = "".join (pan_table)
+    return pan_table
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import os
+import fcntl
+import sqlite3
+import tempfile
+
+
+class QualScoreCache:
+    '''
+    Persistent store of genome quality scores keyed by
+    (genome UPA, checkm_version) -> (completeness, contamination).
+
+    Backed by a single SQLite file so several runs (or a fleet of workers
+    sharing an exported TSV) can reuse CheckM results instead of rerunning it.
+    '''
+
+    TSV_HEADER = ['genome_upa', 'checkm_version', 'completeness', 'contamination']
+    SQL_BATCH = 500
+
+
+    ### __init__ ()
+    #
+    def __init__ (self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname (os.path.abspath (db_path))
+        if not os.path.exists (db_dir):
+            os.makedirs (db_dir, mode=0o777, exist_ok=True)
+        with self.connect() as conn:
+            conn.execute ('PRAGMA journal_mode=WAL')
+            conn.execute ('CREATE TABLE IF NOT EXISTS qual_scores ('
+                          ' genome_upa TEXT NOT NULL,'
+                          ' checkm_version TEXT NOT NULL,'
+                          ' completeness REAL NOT NULL,'
+                          ' contamination TEXT NOT NULL,'
+                          ' PRIMARY KEY (genome_upa, checkm_version))')
+
+
+    ### connect ()
+    #
+    #   new connection per call so the cache can be used from worker threads
+    #
+    def connect (self):
+        return sqlite3.connect (self.db_path, timeout=60)
+
+
+    ### get_many ()
+    #
+    #   returns {genome_upa: {'completeness': float, 'contamination': float or 'N/A'}}
+    #
+    def get_many (self, genome_upas, checkm_version):
+        qual_scores = dict()
+        genome_upas = list(genome_upas)
+        with self.connect() as conn:
+            for batch_start in range(0, len(genome_upas), self.SQL_BATCH):
+                batch_upas = genome_upas[batch_start:batch_start+self.SQL_BATCH]
+                placeholders = ','.join(['?'] * len(batch_upas))
+                rows = conn.execute ('SELECT genome_upa, completeness, contamination FROM qual_scores'
+                                     ' WHERE checkm_version = ? AND genome_upa IN ('+placeholders+')',
+                                     [checkm_version] + batch_upas)
+                for (genome_upa, completeness, contamination) in rows:
+                    qual_scores[genome_upa] = {'completeness': completeness,
+                                               'contamination': self.decode_contamination(contamination)}
+        return qual_scores
+
+
+    ### put_many ()
+    #
+    #   qual_scores: {genome_upa: {'completeness': x, 'contamination': y}}
+    #
+    def put_many (self, qual_scores, checkm_version):
+        rows = []
+        for genome_upa in sorted(qual_scores.keys()):
+            rows.append ((genome_upa,
+                          checkm_version,
+                          float(qual_scores[genome_upa]['completeness']),
+                          str(qual_scores[genome_upa].get('contamination','N/A'))))
+        with self.connect() as conn:
+            conn.executemany ('INSERT OR REPLACE INTO qual_scores'
+                              ' (genome_upa, checkm_version, completeness, contamination)'
+                              ' VALUES (?, ?, ?, ?)', rows)
+        return len(rows)
+
+
+    ### export_tsv ()
+    #
+    #   merge this cache into the shared TSV at tsv_path.  Rows already in the
+    #   TSV (from other workers) are imported first, under a lock on the TSV,
+    #   so the export is the union of every worker's scores.
+    #
+    def export_tsv (self, tsv_path):
+        tsv_dir = os.path.dirname (os.path.abspath (tsv_path))
+        with open (tsv_path+'.lock', 'a') as lock_h:
+            fcntl.flock (lock_h, fcntl.LOCK_EX)
+            try:
+                if os.path.isfile (tsv_path):
+                    self.import_tsv (tsv_path)
+
+                row_cnt = 0
+                tmp_h = tempfile.NamedTemporaryFile (mode='w', dir=tsv_dir, prefix='.qual_scores.', suffix='.tmp', delete=False)
+                try:
+                    with self.connect() as conn, tmp_h:
+                        tmp_h.write ("\t".join(self.TSV_HEADER)+"\n")
+                        for row in conn.execute ('SELECT genome_upa, checkm_version, completeness, contamination'
+                                                 ' FROM qual_scores ORDER BY genome_upa, checkm_version'):
+                            tmp_h.write ("\t".join([str(val) for val in row])+"\n")
+                            row_cnt += 1
+                    os.chmod (tmp_h.name, 0o664)
+                    os.replace (tmp_h.name, tsv_path)
+                finally:
+                    if os.path.exists (tmp_h.name):
+                        os.remove (tmp_h.name)
+            finally:
+                fcntl.flock (lock_h, fcntl.LOCK_UN)
+        return row_cnt
+
+
+    ### import_tsv ()
+    #
+    def import_tsv (self, tsv_path):
+        qual_scores_by_version = dict()
+        with open (tsv_path, 'r') as tsv_h:
+            for line in tsv_h:
+                line = line.rstrip()
+                if not line or line.startswith (self.TSV_HEADER[0]):
+                    continue
+                (genome_upa, checkm_version, completeness, contamination) = line.split("\t")
+                if checkm_version not in qual_scores_by_version:
+                    qual_scores_by_version[checkm_version] = dict()
+                qual_scores_by_version[checkm_version][genome_upa] = {'completeness': completeness,
+                                                                      'contamination': contamination}
+        row_cnt = 0
+        for checkm_version in qual_scores_by_version.keys():
+            row_cnt += self.put_many (qual_scores_by_version[checkm_version], checkm_version)
+        return row_cnt
+
+
+    ### decode_contamination ()
+    #
+    @staticmethod
+    def decode_contamination (contamination):
+        try:
+            return float(contamination)
+        except ValueError:
+            return contamination
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+'''
+CPU, memory, and disk budget of the running container.
+
+Reads the cgroup (v2, then v1) CPU quota and memory limit, so tools are
+sized to what the container may use rather than to the host.
+'''
+import os
+import re
+import shutil
+
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+# cgroup v1 reports "no limit" as a huge number
+UNLIMITED_MEMORY_BYTES = 1 << 60
+
+MEMORY_UNITS = { 'K': 1024,
+                 'M': 1024**2,
+                 'G': 1024**3,
+                 'T': 1024**4
+                 }
+
+
+### read_cgroup_file ()
+#
+def read_cgroup_file (*path_parts):
+    path = os.path.join (CGROUP_ROOT, *path_parts)
+    try:
+        with open (path, 'r') as cgroup_handle:
+            return cgroup_handle.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+### get_cpu_limit ()
+#
+#   number of usable cpus: cgroup quota, capped by the affinity mask
+#
+def get_cpu_limit ():
+    try:
+        cpu_cnt = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpu_cnt = os.cpu_count() or 1
+
+    quota = None
+    period = None
+    cpu_max = read_cgroup_file ('cpu.max')
+    if cpu_max:
+        (quota, period) = (cpu_max.split() + ['100000'])[0:2]
+        if quota == 'max':
+            quota = None
+    else:
+        quota = read_cgroup_file ('cpu', 'cpu.cfs_quota_us')
+        period = read_cgroup_file ('cpu', 'cpu.cfs_period_us')
+        if quota is not None and int(quota) <= 0:
+            quota = None
+
+    if quota is not None and period:
+        cpu_cnt = min(cpu_cnt, max(1, int(int(quota) / int(period))))
+
+    return max(1, cpu_cnt)
+
+
+### get_memory_limit ()
+#
+#   bytes: cgroup limit if set, else physical memory
+#
+def get_memory_limit ():
+    mem_limit = None
+    for path_parts in [('memory.max',), ('memory', 'memory.limit_in_bytes')]:
+        mem_max = read_cgroup_file (*path_parts)
+        if mem_max and mem_max != 'max' and int(mem_max) < UNLIMITED_MEMORY_BYTES:
+            mem_limit = int(mem_max)
+            break
+
+    try:
+        phys_mem = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        phys_mem = None
+
+    if mem_limit is None:
+        return phys_mem
+    if phys_mem is not None:
+        return min(mem_limit, phys_mem)
+    return mem_limit
+
+
+### get_free_space ()
+#
+#   bytes free on the filesystem holding path, or None if unreadable
+#
+def get_free_space (path):
+    try:
+        return shutil.disk_usage (path).free
+    except (IOError, OSError):
+        return None
+
+
+### parse_memory ()
+#
+#   "16G", "512M", "1024" (bytes) -> bytes
+#
+def parse_memory (mem_str):
+    m = re.match(r'^\s*(\d+)\s*([KMGT]?)B?\s*$', str(mem_str).upper())
+    if not m:
+        raise ValueError ("memory size must look like 16G, 512M, or a byte count, not '{}'".format(mem_str))
+    return int(m.group(1)) * MEMORY_UNITS.get(m.group(2), 1)
+
+
+### format_memory ()
+#
+#   bytes -> whole "G" (or "M" below 1G) for tool flags like mmseqs --split-memory-limit
+#
+def format_memory (mem_bytes):
+    if mem_bytes >= MEMORY_UNITS['G']:
+        return str(int(mem_bytes // MEMORY_UNITS['G']))+'G'
+    return str(max(1, int(mem_bytes // MEMORY_UNITS['M'])))+'M'
@@ -3,14 +3,15 @@
 import logging
 import os
 import sys
-import shutil
 import re
 import json
 import subprocess
 import traceback
 import uuid
 import gzip
+import time
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pprint import pprint, pformat
 
 # KBase libs
@@ -21,6 +22,19 @@ from installed_clients.DataFileUtilClient import DataFileUtil
 # KBase modules
 from installed_clients.kb_MsuiteClient import kb_Msuite
 from installed_clients.kb_phylogenomicsClient import kb_phylogenomics
+
+# local utils
+from kb_motupan.Utils.GenomeCache import GenomeCache
+from kb_motupan.Utils.QualScoreCache import QualScoreCache
+from kb_motupan.Utils.AnnotationStore import AnnotationStore
+from kb_motupan.Utils.MMseqsDB import MMseqsDB
+from kb_motupan.Utils.MMseqsClusters import convert_mmseqs_clusters
+from kb_motupan.Utils.GeneIdMap import GeneIdMapWriter, GENE_ID_MAP_EXT
+from kb_motupan.Utils import MOTUpanAPI
+from kb_motupan.Utils.CompressedIO import open_text, codec_path, path_codec, strip_codec_ext, compress_file, decompress_file, find_existing_path, resolve_codec
+from kb_motupan.Utils.ResourceLimits import get_cpu_limit, get_memory_limit, get_free_space, parse_memory, format_memory
+from kb_motupan.Utils.FaaDedup import dedup_faa_file, expand_dedup_clusters
+from kb_motupan.Utils.CompletenessProviders import CheckMProvider, get_completeness_providers, resolve_genome_qual_scores
 #END_HEADER
 
 
@@ -52,10 +66,36 @@ class kb_motupan:
 
     MMSEQS_BINDIR = "/kb/module/mmseqs/bin"
     MMSEQS_BIN = MMSEQS_BINDIR+"/mmseqs"
-    MOTUCONVERT_BIN = "/opt/conda3/bin/mOTUconvert.py"
     MOTUPAN_BIN = "/opt/conda3/bin/mOTUpan.py"
     PARSE_MOTUPAN_BIN = "/kb/module/bin/parse_mmseqs_and_mOTUpan.py"
 
+    # without CheckM priors, let mOTUpan iterate more on posterior completeness
+    FAST_MODE_MOTUPAN_MAX_ITER = 5
+
+    # share of container memory given to mmseqs when max_memory not set
+    MMSEQS_MEMORY_FRACTION = 0.8
+
+    # cluster mode (and auto choice) saved next to the cluster tsv
+    CLUSTER_MODE_EXT = '.cluster_mode.json'
+
+    # share of the thread budget set aside for CheckM while it runs alongside mmseqs
+    CHECKM_THREAD_SHARE = 0.5
+
+    # mmseqs temp space needed per byte of (uncompressed) input faa
+    MMSEQS_TMP_SPACE_FACTOR = 10
+    GZIP_FAA_RATIO = 4
+
+    # buffer size for streamed run files
+    WRITE_BUFFER_SIZE = 1024 * 1024
+
+    # only genome subpaths used by the pipeline (for projected genome fetch)
+    GENOME_INCLUDED_PATHS = ['/features/[*]/id',
+                             '/features/[*]/protein_translation',
+                             '/features/[*]/aliases',
+                             '/features/[*]/functions',
+                             '/quality_scores'
+                             ]
+
     
     ### now_ISO()
     #
@@ -141,6 +181,27 @@ class kb_motupan:
                          str(obj_info[VERSION_I])])
 
     
+    ### get_resource_budget ()
+    #
+    #   threads and max_memory (e.g. "16G") from params, else from container cgroup limits
+    #
+    def get_resource_budget (self, threads=None, max_memory=None, console=None):
+        cpu_limit = get_cpu_limit()
+        if threads:
+            threads = max(1, int(threads))
+        else:
+            threads = cpu_limit
+        if max_memory:
+            max_memory = format_memory (parse_memory (max_memory))
+        else:
+            mem_limit = get_memory_limit()
+            if mem_limit:
+                max_memory = format_memory (int(mem_limit * self.MMSEQS_MEMORY_FRACTION))
+        if console is not None:
+            self.log(console, "resource budget: threads={} (cpus available {}), max_memory={}".format(threads, cpu_limit, max_memory))
+        return (threads, max_memory)
+
+
     ### validate_and_default_params ()
     #
     def validate_and_default_params (self, params, console):
@@ -151,21 +212,64 @@ class kb_motupan:
         if self.check_params (params, required_params):
             self.log(console, 'All required params met');
 
+        # fast mode compensates for uniform priors with more iterations unless max_iter given
+        if params.get('completeness_mode') == 'fast' and not params.get('motupan_max_iter'):
+            self.log(console, "completeness_mode fast: setting motupan_max_iter to {}".format(self.FAST_MODE_MOTUPAN_MAX_ITER))
+            params['motupan_max_iter'] = self.FAST_MODE_MOTUPAN_MAX_ITER
+
         default_vals = {'checkm_version': 'CheckM-1',
+                        'completeness_mode': 'checkm',
+                        'prior_completeness': 95.0,
                         'mmseqs_cluster_mode': 'easy-cluster',
                         'mmseqs_min_seq_id': 0.0,                        
                         'mmseqs_min_coverage': 0.8,
-                        'motupan_max_iter': 1
+                        'motupan_max_iter': 1,
+                        'genome_fetch_chunk_size': 20,
+                        'genome_fetch_threads': 4,
+                        'genome_fetch_mode': 'projected',
+                        'use_genome_cache': 1,
+                        'checkm_parallel_jobs': 2,
+                        'dedup_exact_seqs': 0
                         }
         params = self.set_default_params(params, default_vals, console)
+
+        # size threads and memory to the container.  CheckM runs alongside mmseqs,
+        # so only the threads are split between them (kb_Msuite takes no memory
+        # limit, so mmseqs keeps the whole memory budget), and CheckM's threads
+        # are split among its jobs
+        (params['threads'],
+         params['max_memory']) = self.get_resource_budget (params.get('threads'), params.get('max_memory'), console)
+        if params['completeness_mode'] == 'checkm':
+            checkm_threads = max(1, int(params['threads'] * self.CHECKM_THREAD_SHARE))
+            params['mmseqs_threads'] = max(1, int(params['threads'] * (1.0-self.CHECKM_THREAD_SHARE)))
+            self.log(console, "thread budget while CheckM runs: mmseqs {}, CheckM {}".format(params['mmseqs_threads'], checkm_threads))
+        else:
+            checkm_threads = params['threads']
+            params['mmseqs_threads'] = params['threads']
+        if not params.get('checkm_threads'):
+            params['checkm_threads'] = max(1, checkm_threads // max(1, int(params['checkm_parallel_jobs'])))
+            self.log(console, "Setting param checkm_threads to {}".format(params['checkm_threads']))
+
+        if params.get('tmp_dir') and (not os.path.isabs (params['tmp_dir']) or os.path.isfile (params['tmp_dir'])):
+            raise ValueError ("tmp_dir must be an absolute directory path, not '{}'".format(params['tmp_dir']))
+        if params['genome_fetch_mode'] not in ['projected', 'full']:
+            raise ValueError ("genome_fetch_mode must be 'projected' or 'full', not '{}'".format(params['genome_fetch_mode']))
+        if params['mmseqs_cluster_mode'] not in ['easy-cluster', 'easy-linclust', 'auto']:
+            raise ValueError ("mmseqs_cluster_mode must be 'easy-cluster', 'easy-linclust', or 'auto', not '{}'".format(params['mmseqs_cluster_mode']))
+        if params['completeness_mode'] not in ['checkm', 'fast']:
+            raise ValueError ("completeness_mode must be 'checkm' or 'fast', not '{}'".format(params['completeness_mode']))
+        if not 0.0 < float(params['prior_completeness']) <= 100.0:
+            raise ValueError ("prior_completeness must be a percent between 0 and 100, not '{}'".format(params['prior_completeness']))
+        for genome_key, genome_prior_completeness in (params.get('genome_prior_completeness') or {}).items():
+            if not 0.0 < float(genome_prior_completeness) <= 100.0:
+                raise ValueError ("genome_prior_completeness for {} must be a percent between 0 and 100, not '{}'".format(genome_key, genome_prior_completeness))
         return params
 
 
-    ### get_genome_objs ()
+    ### get_genome_refs ()
     #
-    def get_genome_objs (self, input_ref, console):
+    def get_genome_refs (self, input_ref, console):
         genome_refs = []
-        genome_objs = []
         [OBJID_I, NAME_I, TYPE_I, SAVE_DATE_I, VERSION_I, SAVED_BY_I, WSID_I, WORKSPACE_I, CHSUM_I, SIZE_I, META_I] = range(11)  # object_info tuple
 
         top_obj = self.dfuClient.get_objects({'object_refs':[input_ref]})['data'][0]
@@ -184,193 +288,417 @@ class kb_motupan:
         else:
             raise ValueError(f'{top_type} type is not supported')
 
-        # get objs
-        self.log(console, "Getting genome objects")
+        # dedup refs (Tree ws_refs may list same genome more than once)
+        uniq_genome_refs = []
+        seen_genome_refs = dict()
         for genome_ref in genome_refs:
-            self.log(console, "Getting genome object for ref {}".format(genome_ref))
-            genome_objs.append(self.dfuClient.get_objects({'object_refs':[genome_ref]})['data'][0])
-            
-        return (genome_refs, genome_objs)
+            if genome_ref in seen_genome_refs:
+                self.log(console, "SKIPPING duplicate genome ref {}".format(genome_ref))
+                continue
+            seen_genome_refs[genome_ref] = True
+            uniq_genome_refs.append(genome_ref)
 
+        return uniq_genome_refs
 
-    ### get_genome_qual_scores()
+
+    ### iter_genome_objs ()
     #
-    def get_genome_qual_scores (self, workspace_name, genome_refs, genome_objs, checkm_version, run_as_test_mode, console):
-        genome_qual_scores = dict()
-        needing_checkm_run = dict()
+    #   yields genome objs in genome_refs order, keeping at most fetch_threads
+    #   batches in flight so memory doesn't grow with the number of genomes
+    #
+    def iter_genome_objs (self, genome_refs, console, fetch_chunk_size=20, fetch_threads=4, fetch_mode='projected', use_genome_cache=True):
+
+        # get objs in batches with a bounded number of concurrent requests
+        fetch_chunk_size = max(1, int(fetch_chunk_size))
+        fetch_threads = max(1, int(fetch_threads))
+        genome_ref_batches = []
+        for batch_start in range(0, len(genome_refs), fetch_chunk_size):
+            genome_ref_batches.append(genome_refs[batch_start:batch_start+fetch_chunk_size])
+        self.log(console, "Getting {} genome objects in {} batches (chunk_size={}, threads={}, mode={})".format(len(genome_refs), len(genome_ref_batches), fetch_chunk_size, fetch_threads, fetch_mode))
+
+        fetch_start = time.time()
+        with ThreadPoolExecutor(max_workers=fetch_threads) as executor:
+            batch_futures = []
+            next_batch_i = 0
+            for batch_i in range(len(genome_ref_batches)):
+                while next_batch_i < len(genome_ref_batches) and next_batch_i < batch_i + fetch_threads:
+                    batch_futures.append(executor.submit(self.get_genome_obj_batch, next_batch_i, genome_ref_batches[next_batch_i], fetch_mode, use_genome_cache, console))
+                    next_batch_i += 1
+                try:
+                    these_genome_objs = batch_futures[batch_i].result()
+                except Exception as e:
+                    raise ValueError ("unable to get genome objects for batch {}: {}".format(batch_i, ", ".join(genome_ref_batches[batch_i]))+". "+str(e))
+                batch_futures[batch_i] = None  # release batch
+                
+                while these_genome_objs:
+                    yield these_genome_objs.pop(0)
+
+        self.log(console, "Got {} genome objects in {:.2f} secs".format(len(genome_refs), time.time()-fetch_start))
+
+        # trim cache once per run, rather than walking the cache dir after every batch
+        if use_genome_cache and self.genome_cache is not None:
+            evicted_cnt = self.genome_cache.evict()
+            if evicted_cnt:
+                self.log(console, "Evicted {} genome cache entries".format(evicted_cnt))
+
+
+    ### get_genome_obj_batch ()
+    #
+    def get_genome_obj_batch (self, batch_i, genome_ref_batch, fetch_mode, use_genome_cache, console):
+        [OBJID_I, NAME_I, TYPE_I, SAVE_DATE_I, VERSION_I, SAVED_BY_I, WSID_I, WORKSPACE_I, CHSUM_I, SIZE_I, META_I] = range(11)  # object_info tuple
+        batch_start = time.time()
+        these_genome_objs = [None] * len(genome_ref_batch)
+
+        # check local cache.  the cache is shared by runs on the host, so every ref
+        # still gets one batched info call, which enforces read access and gives
+        # the current object info (name etc.) to return with the cached data
+        if use_genome_cache and self.genome_cache is not None:
+            genome_infos = self.wsClient.get_object_info3({'objects': [{'ref': genome_ref} for genome_ref in genome_ref_batch]})['infos']
+            for genome_i,genome_info in enumerate(genome_infos):
+                cached_genome_obj = self.genome_cache.get (self.getUPA_fromInfo(genome_info))
+                if cached_genome_obj is not None:
+                    these_genome_objs[genome_i] = {'info': genome_info,
+                                                   'data': cached_genome_obj['data']}
+        missing_genome_is = [genome_i for genome_i,genome_obj in enumerate(these_genome_objs) if genome_obj is None]
+        missing_genome_refs = [genome_ref_batch[genome_i] for genome_i in missing_genome_is]
+        
+        if missing_genome_refs:
+            if fetch_mode == 'projected':
+                # only pull the feature subpaths the pipeline reads
+                obj_specs = [{'ref': genome_ref, 'included': self.GENOME_INCLUDED_PATHS} for genome_ref in missing_genome_refs]
+                fetched_genome_objs = self.wsClient.get_objects2({'objects':obj_specs})['data']
+            else:
+                fetched_genome_objs = self.dfuClient.get_objects({'object_refs':missing_genome_refs})['data']
+
+            for fetched_i,genome_obj in enumerate(fetched_genome_objs):
+                if use_genome_cache and self.genome_cache is not None:
+                    genome_obj = {'info': genome_obj['info'],
+                                  'data': self.get_slim_genome_data(genome_obj['data'])}
+                    self.genome_cache.put (self.getUPA_fromInfo(genome_obj['info']), genome_obj)
+                these_genome_objs[missing_genome_is[fetched_i]] = genome_obj
+
+        self.log(console, "Got genome batch {} ({} objs, {} from cache) in {:.2f} secs".format(batch_i, len(genome_ref_batch), len(genome_ref_batch)-len(missing_genome_refs), time.time()-batch_start))
+        return these_genome_objs
+
+
+    ### get_embedded_qual_scores ()
+    #
+    def get_embedded_qual_scores (self, genome_name, genome_data, checkm_version, console):
+        qual_scores = dict()
+        score_found = False
+        if genome_data.get('quality_scores'):
+            for qual_score in genome_data['quality_scores']:
+                if 'method' in qual_score and 'score_interpretation' in qual_score and 'score' in qual_score:
+                    if (checkm_version == 'CheckM-1' and qual_score['method'] == 'CheckM') or \
+                       (checkm_version == 'CheckM-2' and qual_score['method'] == 'CheckM2'):
+                        if qual_score['score_interpretation'] == 'percent_completeness':
+                            self.log(console,"found completeness score for {}".format(genome_name))
+                            score_found = True
+                            if 'contamination' not in qual_scores:
+                                qual_scores['contamination'] = 'N/A'
+                            qual_scores['completeness'] = qual_score['score']
+                        elif qual_score['score_interpretation'] == 'percent_contamination':
+                            qual_scores['contamination'] = qual_score['score']
+
+        if not score_found:
+            return None
+        return qual_scores
+
+
+    ### get_slim_genome_data ()
+    #
+    #   keep only the feature fields used by build_pangenome_obj() (and quality_scores)
+    #
+    def get_slim_genome_data (self, genome_data):
+        slim_features = []
+        for feature in genome_data.get('features',[]):
+            slim_feature = {'id': feature['id']}
+            for field in ['aliases', 'functions', 'protein_translation']:
+                if field in feature:
+                    slim_feature[field] = feature[field]
+            slim_features.append(slim_feature)
+        slim_genome_data = {'features': slim_features}
+        if 'quality_scores' in genome_data:
+            slim_genome_data['quality_scores'] = genome_data['quality_scores']
+        return slim_genome_data
+
+
+    ### ingest_genome_objs ()
+    #
+    #   write each genome's faa records, gene id map rows, name2ref row, and
+    #   slim annotations (to the run's annotation store) as it arrives, keep
+    #   its qual scores, and then drop the object
+    #
+    def ingest_genome_objs (self, genome_objs_iter, motupan_input_files, checkm_version, console):
         genome_names = []
+        genome_refs = []
+        embedded_qual_scores = dict()
 
         [OBJID_I, NAME_I, TYPE_I, SAVE_DATE_I, VERSION_I, SAVED_BY_I, WSID_I, WORKSPACE_I, CHSUM_I, SIZE_I, META_I] = range(11)  # object_info tuple
 
-        # where possible, get completeness from genome obj
-        need_to_run_checkm = False
-        for genome_i,genome_obj in enumerate(genome_objs):
-            genome_name = genome_obj['info'][NAME_I]
-            genome_names.append(genome_name)
-
-            score_found = False
-            if genome_obj['data'].get('quality_scoress'):
-                for qual_score in genome_obj['data']['quality_scores']:
-                    if 'method' in qual_score and 'score_interpretation' in qual_score and 'score' in qual_score:
-                        if (checkm_version == 'CheckM-1' and qual_score['method'] == 'CheckM') or \
-                           (checkm_version == 'CheckM-2' and qual_score['method'] == 'CheckM2'):
-                            if qual_score['score_interpretation'] == 'percent_completeness':
-                                self.log(console,"found completeness score for {}".format(genome_name))
-                                score_found = True
-                                if genome_name not in genome_qual_scores:
-                                    genome_qual_scores[genome_name] = dict()
-                                    genome_qual_scores[genome_name]['contamination'] = 'N/A'
-                                genome_qual_scores[genome_name]['completeness'] = qual_score['score']
-                            elif qual_score['score_interpretation'] == 'percent_contamination':
-                                if genome_name not in genome_qual_scores:
-                                    genome_qual_scores[genome_name] = dict()
-                                genome_qual_scores[genome_name]['contamination'] = qual_score['score']
-
-            if not score_found:
-                need_to_run_checkm = True
-                needing_checkm_run[genome_refs[genome_i]] = True
+        run_dir = motupan_input_files['run_dir']
+        stamp = motupan_input_files['stamp']
 
-                
-        # run CheckM or CheckM2 for those without scores
-        #
-        if need_to_run_checkm:
-
-            # DEBUG since can't run unit tests CheckM without refdata
-            if run_as_test_mode:
-                for genome_i,genome_ref in enumerate(genome_refs):
-                    genome_name = genome_names[genome_i]
-                    if genome_ref not in needing_checkm_run:
-                        self.log(console, "SKIPPING {} ({}) from GenomeSet for CheckM run.  Genome object already has correct quality scores".format(genome_name, genome_ref))
-                        continue
-                
-                    self.log(console, "ADDING {} ({}) to GenomeSet for CheckM run (TEST_MODE NOT RUNNING CHECKM)".format(genome_name, genome_ref))
-                    genome_qual_scores[genome_name] = dict()
-                    genome_qual_scores[genome_name]['completeness'] = 90.0
-                    genome_qual_scores[genome_name]['contamination'] = 2.0
-                return genome_qual_scores
+        annotation_store_file = os.path.join (run_dir, stamp+'-annotations.sqlite')
+        annotation_store = AnnotationStore (annotation_store_file)
+        faa_out_file = codec_path (os.path.join (run_dir, stamp+'.faa'), self.get_faa_codec())
+        id_map_file = os.path.join (run_dir, stamp+GENE_ID_MAP_EXT)  # mmapped by readers, so never compressed
+        name2ref_map_file = codec_path (os.path.join (run_dir, stamp+'-genome_name2ref.map'), self.intermediate_codec)
+        self.log (console,"creating faa file {} ...".format(faa_out_file))
+
+        with open_text (faa_out_file, 'w', buffering=self.WRITE_BUFFER_SIZE) as faa_path_handle, \
+             GeneIdMapWriter (id_map_file) as id_map_writer, \
+             open_text (name2ref_map_file, 'w') as name2ref_map_path_handle:
+
+            for genome_obj in genome_objs_iter:
+                genome_name = genome_obj['info'][NAME_I]
+                genome_ref = self.getUPA_fromInfo(genome_obj['info'])
+                genome_names.append(genome_name)
+                genome_refs.append(genome_ref)
+                name2ref_map_path_handle.write("\t".join([genome_name, genome_ref])+"\n")
+                self.log(console, "ingesting genome {} ({})".format(genome_name, genome_ref))
+
+                # qual scores
+                qual_scores = self.get_embedded_qual_scores (genome_name, genome_obj['data'], checkm_version, console)
+                if qual_scores is not None:
+                    embedded_qual_scores[genome_name] = qual_scores
+
+                # slim annotations
+                annotation_store.add_genome (genome_name, genome_obj['data']['features'])
+
+                # rewrite gene ids to match genome_id as base and store old feature id by gene order
+                id_map_writer.add_genome (genome_name)
+                for feature in genome_obj['data']['features']:
+                    if feature.get('protein_translation'):
+                        gene_cnt = id_map_writer.add_gene (feature['id'])
+                        new_gene_id = genome_name+'_'+str(gene_cnt)
+                        faa_path_handle.write('>'+new_gene_id+"\n"+feature['protein_translation']+"\n")
+
+                # drop genome obj
+                del genome_obj
+
+        motupan_input_files['annotation_store_path'] = annotation_store_file
+        motupan_input_files['input_faa_path'] = faa_out_file
+        motupan_input_files['input_gene_id_map_path'] = id_map_file
+        motupan_input_files['genome_name2ref_path'] = name2ref_map_file
+
+        return (genome_names, genome_refs, embedded_qual_scores)
+
+
+    ### get_completeness_providers ()
+    #
+    #   user supplied priors, then cheapest source first.  CheckM (get_checkm_provider())
+    #   is run separately on what's left, alongside clustering
+    #
+    def get_completeness_providers (self, embedded_qual_scores, checkm_version, console, completeness_mode='checkm', prior_completeness=95.0, genome_prior_completeness=None):
+        return get_completeness_providers (embedded_qual_scores,
+                                           checkm_version,
+                                           lambda msg: self.log(console, msg),
+                                           qual_score_cache=self.qual_score_cache,
+                                           gtdb_metadata_file=self.gtdb_metadata_file,
+                                           gtdb_metadata_index=self.gtdb_metadata_index,
+                                           completeness_mode=completeness_mode,
+                                           prior_completeness=prior_completeness,
+                                           genome_prior_completeness=genome_prior_completeness)
+
+
+    ### get_checkm_provider ()
+    #
+    def get_checkm_provider (self, workspace_name, checkm_version, run_as_test_mode, console, checkm_parallel_jobs=2, checkm_threads=4):
+        # DEBUG since can't run unit tests CheckM without refdata
+        if run_as_test_mode:
+            checkm_name = 'test_mode'
+        else:
+            checkm_name = checkm_version
+        return CheckMProvider(lambda genomes: self.run_checkm_for_genomes (workspace_name,
+                                                                          genomes,
+                                                                          checkm_version,
+                                                                          run_as_test_mode,
+                                                                          console,
+                                                                          checkm_parallel_jobs=checkm_parallel_jobs,
+                                                                          checkm_threads=checkm_threads),
+                              name=checkm_name)
+
+    
+    ### get_genome_qual_scores()
+    #
+    #   first provider with a genome's score wins.  Returns the genomes no provider had
+    #
+    def get_genome_qual_scores (self, providers, unresolved_genomes, genome_qual_scores, genome_qual_sources, console):
+        return resolve_genome_qual_scores (providers,
+                                           unresolved_genomes,
+                                           genome_qual_scores,
+                                           genome_qual_sources,
+                                           lambda msg: self.log(console, msg))
+
+
+    ### run_checkm_for_genomes()
+    #
+    def run_checkm_for_genomes (self, workspace_name, genomes, checkm_version, run_as_test_mode, console, checkm_parallel_jobs=2, checkm_threads=4):
+        genome_qual_scores = dict()
+
+        # DEBUG since can't run unit tests CheckM without refdata
+        if run_as_test_mode:
+            for genome in genomes:
+                self.log(console, "ADDING {} ({}) to GenomeSet for CheckM run (TEST_MODE NOT RUNNING CHECKM)".format(genome['name'], genome['ref']))
+                genome_qual_scores[genome['name']] = dict()
+                genome_qual_scores[genome['name']]['completeness'] = 90.0
+                genome_qual_scores[genome['name']]['contamination'] = 2.0
+            return genome_qual_scores
                 
                     
-            # save hidden genomeset with those genomes that are missing qual scores
-            #
-            checkm_run_genomeset_elements = dict()
-            checkm_run_genomeset_ref = None
-            max_genomes_per_checkm_run = 40
-            subset_checkm_run_genomeset_elements = [{}]
-            subset_checkm_run_genomeset_ref = []
-            subset_checkm_run_genomeset_name = []
-            subset_i = 0
-            subset_cnt = 0
-            for genome_i,genome_ref in enumerate(genome_refs):
-                genome_name = genome_names[genome_i]
-                if genome_ref not in needing_checkm_run:
-                    self.log(console, "SKIPPING {} ({}) from GenomeSet for CheckM run.  Genome object already has correct quality scores".format(genome_name, genome_ref))
-                    continue
-                
-                self.log(console, "ADDING {} ({}) to GenomeSet for CheckM run".format(genome_name, genome_ref))
-                subset_cnt += 1
-                if subset_cnt > max_genomes_per_checkm_run:
-                    subset_cnt = 0
-                    subset_i += 1
-                    subset_checkm_run_genomeset_elements.append({})
-                
-                subset_checkm_run_genomeset_elements[subset_i][genome_ref] = { 'ref': genome_ref }
+        # save hidden genomesets with those genomes that are missing qual scores
+        #
+        max_genomes_per_checkm_run = 40
+        subset_checkm_run_genomeset_elements = []
+        subset_checkm_run_genomeset_ref = []
+        subset_checkm_run_genomeset_name = []
+        for genome in genomes:
+            self.log(console, "ADDING {} ({}) to GenomeSet for CheckM run".format(genome['name'], genome['ref']))
+            if not subset_checkm_run_genomeset_elements or \
+               len(subset_checkm_run_genomeset_elements[-1]) >= max_genomes_per_checkm_run:
+                subset_checkm_run_genomeset_elements.append({})
+            subset_checkm_run_genomeset_elements[-1][genome['ref']] = { 'ref': genome['ref'] }
+
+        # save all subsets in one call
+        ws_id = self.dfuClient.ws_name_to_id (workspace_name)
+        checkm_run_genomeSet_objs = []
+        for subset_i,these_elements in enumerate(subset_checkm_run_genomeset_elements):
+            checkm_run_genomeSet_obj_data = { 'description': 'CheckM run genomes',
+                                              'elements': these_elements
+            }
+            checkm_run_genomeSet_name = 'checkm_run_genomes.GenomeSet.'+str(subset_i)+'.'+ str(uuid.uuid4())
+            subset_checkm_run_genomeset_name.append(checkm_run_genomeSet_name)
+            checkm_run_genomeSet_objs.append({'type': 'KBaseSearch.GenomeSet',
+                                              'data': checkm_run_genomeSet_obj_data,
+                                              'name': checkm_run_genomeSet_name,
+                                              'hidden': 1
+                                              })
+        try:
+            checkm_run_genomeSet_infos = self.dfuClient.save_objects({'id': ws_id,
+                                                                      'objects': checkm_run_genomeSet_objs})
+        except Exception as e:
+            raise ValueError ("ABORT: unable to save GenomeSet objects.\n"+str(e))
+        for checkm_run_genomeSet_info in checkm_run_genomeSet_infos:
+            subset_checkm_run_genomeset_ref.append(self.getUPA_fromInfo (checkm_run_genomeSet_info))
 
-            ws_id = self.dfuClient.ws_name_to_id (workspace_name)
-            for subset_i,these_elements in enumerate(subset_checkm_run_genomeset_elements):
-                checkm_run_genomeSet_obj_data = { 'description': 'CheckM run genomes',
-                                                  'elements': these_elements
-                }
-                checkm_run_genomeSet_name = 'checkm_run_genomes.GenomeSet.'+str(subset_i)+'.'+ str(uuid.uuid4())
-                subset_checkm_run_genomeset_name.append(checkm_run_genomeSet_name)
-                
-                try:
-                    checkm_run_genomeSet_info = self.dfuClient.save_objects(
-                        {'id': ws_id,
-                         'objects': [{
-                             'type': 'KBaseSearch.GenomeSet',
-                             'data': checkm_run_genomeSet_obj_data,
-                             'name': checkm_run_genomeSet_name,
-                             'hidden': 1
-                         }]})[0]
-                except Exception as e:
-                    raise ValueError ("ABORT: unable to save GenomeSet object.\n"+str(e))
-                subset_checkm_run_genomeset_ref.append(self.getUPA_fromInfo (checkm_run_genomeSet_info))
 
+        # Run CheckM on hidden genomesets concurrently, parsing each as it finishes
+        #
+        checkm_parallel_jobs = max(1, int(checkm_parallel_jobs))
+        self.log(console, "RUNNING CheckM on {} GenomeSets ({} at a time, {} threads each)".format(len(subset_checkm_run_genomeset_ref), checkm_parallel_jobs, checkm_threads))
+        with ThreadPoolExecutor(max_workers=checkm_parallel_jobs) as executor:
+            checkm_futures = dict()
+            for subset_i,checkm_run_genomeset_ref in enumerate(subset_checkm_run_genomeset_ref):
+                checkm_future = executor.submit(self.run_checkm_subset,
+                                                workspace_name,
+                                                checkm_run_genomeset_ref,
+                                                subset_checkm_run_genomeset_name[subset_i],
+                                                checkm_version,
+                                                checkm_threads,
+                                                console)
+                checkm_futures[checkm_future] = subset_i
+            for checkm_future in as_completed(checkm_futures):
+                subset_i = checkm_futures[checkm_future]
+                subset_qual_scores = checkm_future.result()
+                self.log(console, "DONE CheckM for {} ({} genomes)".format(subset_checkm_run_genomeset_name[subset_i], len(subset_qual_scores)))
+                genome_qual_scores.update(subset_qual_scores)
+
+                # remember scores for later runs
+                if self.qual_score_cache is not None:
+                    cache_qual_scores = dict()
+                    for genome in genomes:
+                        if genome['name'] in subset_qual_scores:
+                            cache_qual_scores[genome['ref']] = subset_qual_scores[genome['name']]
+                    self.qual_score_cache.put_many (cache_qual_scores, checkm_version)
+            
+        return genome_qual_scores
 
-            # Run CheckM on hidden genomesets
-            #
-            try:
-                checkM_Client = kb_Msuite(self.callbackURL, token=self.token, service_ver=self.SERVICE_VER)
-            except Exception as e:
-                raise ValueError ("unable to instantiate CheckM client")
 
-            for subset_i,checkm_run_genomeset_ref in enumerate(subset_checkm_run_genomeset_ref):
-                checkM_params = {'workspace_name': workspace_name,
-                                 'input_ref': checkm_run_genomeset_ref,
-                                 'reduced_tree': 1,
-                                 'save_output_dir': '0',
-                                 'save_plots_dir': '0',
-                                 'threads': 4
-                }                
+    ### export_qual_score_cache ()
+    #
+    #   merge the qual score cache into the shared TSV (qual-score-cache-export)
+    #   that other workers seed from with qual-score-cache-import
+    #
+    def export_qual_score_cache (self, console):
+        if self.qual_score_cache is None or not self.qual_score_cache_export:
+            return
+        try:
+            export_cnt = self.qual_score_cache.export_tsv (self.qual_score_cache_export)
+            self.log(console, "exported {} qual scores to {}".format(export_cnt, self.qual_score_cache_export))
+        except Exception as e:
+            self.log(console, "unable to export qual score cache to {}: {}".format(self.qual_score_cache_export, str(e)))
+
+
+    ### run_checkm_subset ()
+    #
+    def run_checkm_subset (self, workspace_name, checkm_run_genomeset_ref, checkm_run_genomeset_name, checkm_version, checkm_threads, console):
+        qual_scores = dict()
+        
+        try:
+            checkM_Client = kb_Msuite(self.callbackURL, token=self.token, service_ver=self.SERVICE_VER)
+        except Exception as e:
+            raise ValueError ("unable to instantiate CheckM client")
+
+        checkM_params = {'workspace_name': workspace_name,
+                         'input_ref': checkm_run_genomeset_ref,
+                         'reduced_tree': 1,
+                         'save_output_dir': '0',
+                         'save_plots_dir': '0',
+                         'threads': int(checkm_threads)
+        }                
                 
-                if checkm_version == 'CheckM-2':
-                    raise ValueError ("CheckM2 version not implemented yet")
-                else:
-                    sub_method = 'CheckM'
-                    try:
-                        self.log(console, 'RUNNING CheckM for {}'.format(subset_checkm_run_genomeset_name[subset_i]))
-                        this_retVal = checkM_Client.run_checkM_lineage_wf(checkM_params)
-                    except Exception as e:
-                        raise ValueError ("unable to run "+sub_method+". "+str(e))
+        if checkm_version == 'CheckM-2':
+            raise ValueError ("CheckM2 version not implemented yet")
+        else:
+            sub_method = 'CheckM'
+            try:
+                self.log(console, 'RUNNING CheckM for {}'.format(checkm_run_genomeset_name))
+                this_retVal = checkM_Client.run_checkM_lineage_wf(checkM_params)
+            except Exception as e:
+                raise ValueError ("unable to run "+sub_method+". "+str(e))
                     
-                try:
-                    this_report_obj = self.wsClient.get_objects2({'objects':[{'ref':this_retVal['report_ref']}]})['data'][0]['data']
-                except Exception as e:
-                    raise ValueError("unable to fetch "+sub_method+" report: " + this_retVal['report_ref']+". "+str(e))
+        try:
+            this_report_obj = self.wsClient.get_objects2({'objects':[{'ref':this_retVal['report_ref']}]})['data'][0]['data']
+        except Exception as e:
+            raise ValueError("unable to fetch "+sub_method+" report: " + this_retVal['report_ref']+". "+str(e))
             
-                # retrieve CheckM TSV file
-                checkM_outdir = os.path.join(self.scratch, 'checkM.'+str(datetime.now()))
-                if not os.path.exists(checkM_outdir):
-                    os.makedirs(checkM_outdir)
-                checkM_tsv_basefile = 'CheckM_summary_table.tsv'
-                checkM_tsv_path = os.path.join(checkM_outdir, checkM_tsv_basefile)
-                found_checkM_summary = False
-                if len(this_report_obj.get('file_links',[])) > 0:
-                    for file_link in this_report_obj['file_links']:
-                        if 'name' in file_link and file_link['name'] == checkM_tsv_basefile+'.zip':
-                            self.log(console, "CheckM FILE_LINK contents")
-                            for key in file_link.keys():
-                                self.log(console, "FILE_LINK "+key+": "+str(file_link[key]))
+        # retrieve CheckM TSV file
+        checkM_outdir = os.path.join(self.scratch, 'checkM.'+checkm_run_genomeset_name)
+        if not os.path.exists(checkM_outdir):
+            os.makedirs(checkM_outdir)
+        checkM_tsv_basefile = 'CheckM_summary_table.tsv'
+        checkM_tsv_path = os.path.join(checkM_outdir, checkM_tsv_basefile)
+        found_checkM_summary = False
+        if len(this_report_obj.get('file_links',[])) > 0:
+            for file_link in this_report_obj['file_links']:
+                if 'name' in file_link and file_link['name'] == checkM_tsv_basefile+'.zip':
+                    self.log(console, "CheckM FILE_LINK contents")
+                    for key in file_link.keys():
+                        self.log(console, "FILE_LINK "+key+": "+str(file_link[key]))
                                 
-                            download_ret = self.dfuClient.shock_to_file({'handle_id': file_link['handle'],
-                                                                         'file_path': checkM_tsv_path+'.zip',
-                                                                         'unpack': 'unpack'})
-                            # DEBUG
-                            #for key in download_ret.keys():
-                            #    self.log(console, "DOWNLOAD "+str(key)+": "+str(download_ret[key]))
-                            #for inode in os.listdir(checkM_outdir):
-                            #    print ("INODE: "+str(inode))
-                        
-                            found_checkM_summary = True
-                            break
-                if not found_checkM_summary:
-                    raise ValueError ("Failure retrieving CheckM summary TSV file")
-                [GENOME_I, LINEAGE_I, GENOME_CNT_I, MARKER_CNT_I, MARKER_SET_I, CNT_0, CNT_1, CNT_2, CNT_3, CNT_4, CNT_5plus, COMPLETENESS_I, CONTAMINATION_I] = range(13)
-                self.log(console, "CheckM TSV:")
-                with open (checkM_tsv_path, 'r') as checkM_tsv_handle:
-                    for checkM_line in checkM_tsv_handle.readlines():
-                        checkM_line = checkM_line.rstrip()
-                        self.log(console, checkM_line)
-                        checkM_info = checkM_line.split("\t")
-                        genome_name = checkM_info[GENOME_I]
-                        if genome_name == 'Bin Name':
-                            continue
-                        genome_qual_scores[genome_name] = dict()
-
-                        genome_qual_scores[genome_name]['completeness'] = float(checkM_info[COMPLETENESS_I])  # percent
-                        genome_qual_scores[genome_name]['contamination'] = float(checkM_info[CONTAMINATION_I])  # percent
-            
-        return genome_qual_scores
+                    download_ret = self.dfuClient.shock_to_file({'handle_id': file_link['handle'],
+                                                                 'file_path': checkM_tsv_path+'.zip',
+                                                                 'unpack': 'unpack'})
+                    found_checkM_summary = True
+                    break
+        if not found_checkM_summary:
+            raise ValueError ("Failure retrieving CheckM summary TSV file")
+        [GENOME_I, LINEAGE_I, GENOME_CNT_I, MARKER_CNT_I, MARKER_SET_I, CNT_0, CNT_1, CNT_2, CNT_3, CNT_4, CNT_5plus, COMPLETENESS_I, CONTAMINATION_I] = range(13)
+        self.log(console, "CheckM TSV for {}:".format(checkm_run_genomeset_name))
+        with open (checkM_tsv_path, 'r') as checkM_tsv_handle:
+            for checkM_line in checkM_tsv_handle:
+                checkM_line = checkM_line.rstrip()
+                self.log(console, checkM_line)
+                checkM_info = checkM_line.split("\t")
+                genome_name = checkM_info[GENOME_I]
+                if genome_name == 'Bin Name':
+                    continue
+                qual_scores[genome_name] = dict()
+                qual_scores[genome_name]['completeness'] = float(checkM_info[COMPLETENESS_I])  # percent
+                qual_scores[genome_name]['contamination'] = float(checkM_info[CONTAMINATION_I])  # percent
+
+        return qual_scores
 
 
     ### run_pangenome_circle_plot()
@@ -454,24 +782,12 @@ class kb_motupan:
         return base_genome_ref
     
             
-    ### prepare_motupan_files ()
+    ### prepare_run_dir ()
     #
-    def prepare_motupan_files (self, genome_objs, genome_qual_scores, console):
+    def prepare_run_dir (self, console):
         motupan_input_files = dict()
         stamp = str(int((datetime.utcnow() - datetime.utcfromtimestamp(0)).total_seconds() * 1000))
 
-        [OBJID_I, NAME_I, TYPE_I, SAVE_DATE_I, VERSION_I, SAVED_BY_I, WSID_I, WORKSPACE_I, CHSUM_I, SIZE_I, META_I] = range(11)  # object_info tuple
-
-
-        ### get genome_names and refs
-        #
-        genome_names = []
-        genome_refs = []
-        for genome_obj in genome_objs:
-            genome_names.append(genome_obj['info'][NAME_I])
-            genome_refs.append(self.getUPA_fromInfo(genome_obj['info']))
-
-            
         ### create run directory
         #
         folder = 'mOTUpan_run.'+stamp
@@ -482,96 +798,573 @@ class kb_motupan:
         if not os.path.exists (this_run_dir):
             os.makedirs (this_run_dir, mode=0o777, exist_ok=False)
         motupan_input_files['run_dir'] = this_run_dir
+        motupan_input_files['stamp'] = stamp
 
+        return motupan_input_files
 
-        ### create genome name to ref map file
+    
+    ### prepare_motupan_files ()
+    #
+    #   faa, gene id map, name2ref map, and genome json files are written at ingest
+    #
+    def prepare_motupan_files (self, motupan_input_files, genome_names, genome_refs, genome_qual_scores, genome_qual_sources, console):
+        this_run_dir = motupan_input_files['run_dir']
+        stamp = motupan_input_files['stamp']
+
+        
+        ### create genome qual file
         #
-        name2ref_map_buf = []
-        name2ref_map_file = os.path.join (this_run_dir, stamp+'-genome_name2ref.map')
-        for genome_i,genome_name in enumerate(genome_names):
-            name2ref_map_buf.append("\t".join([genome_name, genome_refs[genome_i]]))
-            with open (name2ref_map_file, 'w') as name2ref_map_path_handle:
-                name2ref_map_path_handle.write("\n".join(name2ref_map_buf)+"\n")
-        motupan_input_files['genome_name2ref_path'] = name2ref_map_file
+        checkm_file = os.path.join (this_run_dir, stamp+'.checkm')
+        self.log (console,"creating checkm file {} ...".format(checkm_file))
 
+        # write file and save path to return
+        with open (checkm_file, 'w') as checkm_handle:
+            checkm_handle.write ("\t".join(['Bin Id', 'Completeness', 'Contamination'])+"\n")
+            for genome_name in genome_names:
+                completeness = genome_qual_scores[genome_name]['completeness']
+                contamination = genome_qual_scores[genome_name]['contamination']
+                checkm_handle.write ("\t".join([genome_name, str(completeness), str(contamination)])+"\n")
+        motupan_input_files['input_qual_path'] = checkm_file
 
-        ### create genome json files
+
+        ### record where each genome's completeness came from
         #
-        json_genome_obj_dir = os.path.join (this_run_dir, stamp+'-genome_objs')
-        if not os.path.exists (json_genome_obj_dir):
-            os.makedirs (json_genome_obj_dir, mode=0o777, exist_ok=False)
-        json_genome_obj_paths_file = os.path.join (this_run_dir, stamp+'-genome_objs.paths')
-        json_genome_obj_paths_buf = []
-        for genome_obj in genome_objs:
-            genome_name = genome_obj['info'][NAME_I]
-            json_genome_obj_path = os.path.join (json_genome_obj_dir, genome_name+'.json')
-            with open (json_genome_obj_path, 'w') as json_genome_obj_file:
-                json.dump(genome_obj['data'], json_genome_obj_file)
-            json_genome_obj_paths_buf.append ("\t".join([genome_name,json_genome_obj_path]))
-        with open (json_genome_obj_paths_file, 'w') as jgopf:
-            jgopf.write("\n".join(json_genome_obj_paths_buf)+"\n")
-        motupan_input_files['json_genome_obj_paths_file'] = json_genome_obj_paths_file
+        qual_sources_file = os.path.join (this_run_dir, stamp+'-completeness_sources.tsv')
+        with open (qual_sources_file, 'w') as qual_sources_handle:
+            qual_sources_handle.write ("\t".join(['Bin Id', 'Genome Ref', 'Completeness', 'Contamination', 'Source'])+"\n")
+            for genome_i,genome_name in enumerate(genome_names):
+                qual_sources_handle.write ("\t".join([genome_name,
+                                                      genome_refs[genome_i],
+                                                      str(genome_qual_scores[genome_name]['completeness']),
+                                                      str(genome_qual_scores[genome_name]['contamination']),
+                                                      genome_qual_sources[genome_name]])+"\n")
+        motupan_input_files['qual_sources_path'] = qual_sources_file
 
-        
-        ### create faa and id_map files
+
+        ### set path for output pangenome json file
         #
-        faa_out_file = os.path.join (this_run_dir, stamp+'.faa')
-        id_map_file = os.path.join (this_run_dir, stamp+'.gene_id_map')
-        self.log (console,"creating faa file {} ...".format(faa_out_file))
+        motupan_input_files['output_pangenome_json_path'] = codec_path (os.path.join (this_run_dir, stamp+'-mOTUpan.json'), self.intermediate_codec)
+        
 
-        faa_buf = []
-        id_map_buf = []
-        for genome_i,genome_obj in enumerate(genome_objs):
+        return motupan_input_files
 
-            genome_name = genome_names[genome_i]
 
-            # rewrite gene ids to match genome_id as base and store old genome id
-            gene_cnt = 0
+    ### get_mmseqs_version ()
+    #
+    def get_mmseqs_version (self, run_dir):
+        (mmseqs_retcode, mmseqs_outbuf) = self.run_subprocess ([self.MMSEQS_BIN, 'version'], run_dir)
+        mmseqs_version = 'unknown'
+        for mmseqs_outline in mmseqs_outbuf:
+            mmseqs_outline = re.sub(r"^b'", '', mmseqs_outline)
+            mmseqs_outline = re.sub(r"\\n'$", '', mmseqs_outline).strip()
+            if mmseqs_outline:
+                mmseqs_version = mmseqs_outline
+                break
+        return mmseqs_version
 
-            #for cds in genome_obj['data']['cdss']:
-            for feature in genome_obj['data']['features']:
-                if feature.get('protein_translation'):
-                    gene_cnt += 1
-                    old_gene_id = genome_name+'.f:'+feature['id']
-                    new_gene_id = genome_name+'_'+str(gene_cnt)
-                    id_map_buf.append("\t".join([new_gene_id,old_gene_id]))
-                    faa_buf.append('>'+new_gene_id)
-                    faa_buf.append(feature['protein_translation'])
-            
-        # write files and save path to return
-        with open (faa_out_file, 'w') as faa_path_handle:
-            faa_path_handle.write("\n".join(faa_buf)+"\n")
-        with open (id_map_file, 'w') as id_map_path_handle:
-            id_map_path_handle.write("\n".join(id_map_buf)+"\n")
-        motupan_input_files['input_faa_path'] = faa_out_file
-        motupan_input_files['input_gene_id_map_path'] = id_map_file
+    
+    ### dedup_faa_file ()
+    #
+    #   write first copy of each distinct protein sequence to dedup_faa_path
+    #   and "kept_gene_id<TAB>dup_gene_id" rows for the other copies to dup_map_path
+    #
+    def dedup_faa_file (self, faa_path, dedup_faa_path, dup_map_path, console):
+        (total_cnt, unique_cnt) = dedup_faa_file (faa_path, dedup_faa_path, dup_map_path, buffering=self.WRITE_BUFFER_SIZE)
+        self.log(console, "exact-seq dedup kept {} of {} proteins".format(unique_cnt, total_cnt))
+        return (total_cnt, unique_cnt)
+
+
+    ### expand_dedup_clusters ()
+    #
+    #   add back the dropped duplicate genes to the cluster of their kept copy
+    #
+    def expand_dedup_clusters (self, dedup_cluster_path, dup_map_path, cluster_path):
+        expand_dedup_clusters (dedup_cluster_path, dup_map_path, cluster_path, buffering=self.WRITE_BUFFER_SIZE)
+
+
+    ### count_faa_seqs ()
+    #
+    def count_faa_seqs (self, faa_path):
+        seq_cnt = 0
+        with open_text (faa_path, 'r') as faa_handle:
+            for faa_line in faa_handle:
+                if faa_line.startswith('>'):
+                    seq_cnt += 1
+        return seq_cnt
+
+
+    ### choose_cluster_mode ()
+    #
+    #   'auto' uses easy-linclust at or above auto_linclust_min_seqs proteins,
+    #   else easy-cluster (which itself runs linclust before cascaded clustering)
+    #
+    def choose_cluster_mode (self, faa_path, console):
+        seq_cnt = self.count_faa_seqs (faa_path)
+        cluster_mode = 'easy-cluster'
+        if seq_cnt >= self.auto_linclust_min_seqs:
+            cluster_mode = 'easy-linclust'
+        self.log(console, "auto cluster mode: {} for {} proteins (linclust threshold {})".format(cluster_mode, seq_cnt, self.auto_linclust_min_seqs))
+        cluster_mode_params = {'cluster-mode-requested': 'auto',
+                               'auto-linclust-min-seqs': self.auto_linclust_min_seqs,
+                               'cluster-input-seqs': seq_cnt
+                               }
+        return (cluster_mode, cluster_mode_params)
+
+
+    ### parse_mmseqs_version ()
+    #
+    #   version from the log of an mmseqs workflow run, if there
+    #
+    def parse_mmseqs_version (self, mmseqs_outbuf):
+        for mmseqs_outline in mmseqs_outbuf:
+            if 'MMseqs Version:' in mmseqs_outline:
+                mmseqs_version = re.sub(r'^.*MMseqs Version:\s*\\t', '', mmseqs_outline).rstrip()
+                mmseqs_version = re.sub(r'\\n\'$', '', mmseqs_version)
+                return mmseqs_version
+        return None
+
+
+    ### get_mmseqs_input ()
+    #
+    #   faa to cluster (optionally only one copy of identical proteins), its
+    #   cluster basename, and the dup map to expand the clusters with afterwards
+    #
+    def get_mmseqs_input (self, params, cluster_basename, console):
+        if int(params.get('dedup_exact_seqs',0)) == 0:
+            return (params['input_faa_path'], cluster_basename, None)
+        (mmseqs_input_faa_path, dup_map_path) = self.get_dedup_paths (params['input_faa_path'])
+        if int(params.get('force_redo',0)) != 0 or \
+           not os.path.isfile (mmseqs_input_faa_path) or \
+           not os.path.isfile (dup_map_path):
+            self.dedup_faa_file (params['input_faa_path'], mmseqs_input_faa_path, dup_map_path, console)
+        return (mmseqs_input_faa_path, cluster_basename + '-dedup', dup_map_path)
+
+
+    ### get_dedup_paths ()
+    #
+    #   (dedup faa, dup map) written by dedup_faa_file() for input_faa_path
+    #
+    def get_dedup_paths (self, input_faa_path):
+        faa_basename = re.sub(r'\.faa$', '', strip_codec_ext (input_faa_path))
+        return (codec_path (faa_basename+'-dedup.faa', self.get_faa_codec()),
+                codec_path (faa_basename+'-dedup.dup_map', self.intermediate_codec))
+
+
+    ### write_cluster_mode ()
+    #
+    #   record the mode (and auto choice) next to the cluster tsv, for reruns that reuse it
+    #
+    def write_cluster_mode (self, mmseqs_cluster_outfile, cluster_mode, cluster_mode_params):
+        with open (mmseqs_cluster_outfile+self.CLUSTER_MODE_EXT, 'w') as cluster_mode_h:
+            json.dump ({'cluster_mode': cluster_mode, 'cluster_mode_params': cluster_mode_params}, cluster_mode_h)
+
+
+    ### read_cluster_mode ()
+    #
+    #   (cluster_mode, cluster_mode_params) recorded by write_cluster_mode(), else
+    #   chosen again from the faa that was clustered (output from an older version)
+    #
+    def read_cluster_mode (self, mmseqs_cluster_outfile, params, console):
+        cluster_mode_path = mmseqs_cluster_outfile+self.CLUSTER_MODE_EXT
+        if os.path.isfile (cluster_mode_path):
+            with open (cluster_mode_path, 'r') as cluster_mode_h:
+                cluster_mode_rec = json.load (cluster_mode_h)
+            self.log(console, "auto cluster mode: {} (from earlier run)".format(cluster_mode_rec['cluster_mode']))
+            return (cluster_mode_rec['cluster_mode'], cluster_mode_rec['cluster_mode_params'])
+        clustered_faa_path = params['input_faa_path']
+        if int(params.get('dedup_exact_seqs',0)) != 0:
+            (dedup_faa_path, dup_map_path) = self.get_dedup_paths (params['input_faa_path'])
+            if os.path.isfile (dedup_faa_path):
+                clustered_faa_path = dedup_faa_path
+        return self.choose_cluster_mode (clustered_faa_path, console)
+
+
+    ### get_mmseqs_tmp_dir ()
+    #
+    #   params tmp_dir (else config tmp-dir) if it has room for mmseqs temp
+    #   files from faa_path, else None so they stay with the run and db cache
+    #
+    def get_mmseqs_tmp_dir (self, params, faa_path, console):
+        tmp_dir = params.get('tmp_dir') or self.mmseqs_tmp_dir
+        if not tmp_dir:
+            return None
+        try:
+            os.makedirs (tmp_dir, mode=0o777, exist_ok=True)
+        except OSError as e:
+            self.log(console, "unable to use tmp_dir {}: {}.  Using run_dir".format(tmp_dir, str(e)))
+            return None
+
+        faa_bytes = os.path.getsize (faa_path)
+        if path_codec (faa_path) != 'none':
+            faa_bytes *= self.GZIP_FAA_RATIO
+        needed_bytes = faa_bytes * self.MMSEQS_TMP_SPACE_FACTOR
+        free_bytes = get_free_space (tmp_dir)
+        if free_bytes is None or free_bytes < needed_bytes:
+            self.log(console, "tmp_dir {} has {} free, need about {}.  Using run_dir".format(tmp_dir,
+                                                                                          format_memory (free_bytes or 0),
+                                                                                          format_memory (needed_bytes)))
+            return None
+        self.log(console, "mmseqs tmp_dir {} ({} free)".format(tmp_dir, format_memory (free_bytes)))
+        return tmp_dir
+
+
+    ### get_mmseqs_threads_args ()
+    #
+    #   (threads, memory args for the cluster and prefilter steps)
+    #
+    def get_mmseqs_threads_args (self, params, console):
+        (threads, max_memory) = self.get_resource_budget (params.get('threads'), params.get('max_memory'), console)
+        memory_args = []
+        if max_memory:
+            memory_args = ['--split-memory-limit', max_memory]
+        return (threads, memory_args)
+
+
+    ### convert_clusters_for_mOTUpan ()
+    #
+    #   one pass over the cluster tsv (in place of mOTUconvert.py --in_type mmseqs2)
+    #   also saves cluster members for the parse step.  Returns the genome
+    #   clusters for in-process mOTUpan, or None if converted by an earlier run
+    #
+    def convert_clusters_for_mOTUpan (self, mmseqs_cluster_outfile, motupan_genome_cluster_file, cluster_genes_file, params, console):
+        genome_clusters = None
+        if int(params.get('force_redo',0)) != 0 or \
+           not self.have_run_output (motupan_genome_cluster_file) or \
+           not os.path.isfile (cluster_genes_file):
+
+            self.log(console, "converting {} to mOTUpan gene clusters {}".format(mmseqs_cluster_outfile, motupan_genome_cluster_file))
+            (cluster_cnt, genome_clusters) = convert_mmseqs_clusters (find_existing_path (mmseqs_cluster_outfile),
+                                                                      motupan_genome_cluster_file,
+                                                                      cluster_genes_file)
+            self.log(console, "{} clusters across {} genomes".format(cluster_cnt, len(genome_clusters)))
+        return genome_clusters
+
+
+    ### run_mmseqs2_clustering ()
+    #
+    #   steps 1 and 2 of run_mmseqs2_and_mOTUpan_files(): don't need quality scores
+    #
+    def run_mmseqs2_clustering (self, params, console):
+        cov_mode = "0"
+        mmseqs_version = None
+
+        # 1. calculate mmseqs2 clusters
+        #    Note: subprocess shell must be False.  I think bourne shell messes up mmseqs
+        #    seq db is kept in self.mmseqs_db so reruns on the same proteins skip createdb
+        #
+        cluster_basename = os.path.basename (strip_codec_ext (params['input_faa_path']))
+        cluster_basename = re.sub(r'\.faa', '', cluster_basename)
+        cluster_basename = cluster_basename + '-clust'
+        mmseqs_cluster_outfile = os.path.join (params['run_dir'], cluster_basename + '_cluster.tsv')
+        cluster_mode = params['mmseqs_cluster_mode']
+        cluster_mode_params = dict()
+
+        if int(params.get('force_redo',0)) != 0 or \
+           not self.have_run_output (mmseqs_cluster_outfile):
+
+            (mmseqs_input_faa_path, mmseqs_cluster_basename, dup_map_path) = self.get_mmseqs_input (params, cluster_basename, console)
+
+            if cluster_mode == 'auto':
+                (cluster_mode, cluster_mode_params) = self.choose_cluster_mode (mmseqs_input_faa_path, console)
+
+            cluster_args = ['--min-seq-id', str(params['mmseqs_min_seq_id']),
+                            '--cov-mode', str(cov_mode),
+                            '-c', str(params['mmseqs_min_coverage'])]
+            (threads, memory_args) = self.get_mmseqs_threads_args (params, console)
+            mmseqs_tmp_dir = self.get_mmseqs_tmp_dir (params, mmseqs_input_faa_path, console)
+
+            self.log(console, "RUN: mmseqs {} {} {}".format(cluster_mode, mmseqs_input_faa_path, " ".join(cluster_args + memory_args)))
+            mmseqs_start = time.time()
+            (mmseqs_db_entry, mmseqs_outbuf) = self.mmseqs_db.cluster_workflow (mmseqs_input_faa_path,
+                                                                               os.path.join (params['run_dir'], mmseqs_cluster_basename),
+                                                                               cluster_mode,
+                                                                               cluster_args,
+                                                                               threads,
+                                                                               memory_args,
+                                                                               mmseqs_tmp_dir)
+            self.log(console, "mmseqs {} took {:.1f}s".format(cluster_mode, time.time()-mmseqs_start))
+            mmseqs_version = self.parse_mmseqs_version (mmseqs_outbuf)
+            self.mmseqs_db.evict (mmseqs_db_entry)
+
+            # put duplicate genes back in their clusters before converting for mOTUpan
+            if dup_map_path:
+                dedup_cluster_outfile = os.path.join (params['run_dir'], mmseqs_cluster_basename + '_cluster.tsv')
+                self.expand_dedup_clusters (dedup_cluster_outfile, dup_map_path, mmseqs_cluster_outfile)
+            self.write_cluster_mode (mmseqs_cluster_outfile, cluster_mode, cluster_mode_params)
+
+        # clusters from an earlier run
+        if cluster_mode == 'auto':
+            (cluster_mode, cluster_mode_params) = self.read_cluster_mode (mmseqs_cluster_outfile, params, console)
+
+        # clusters from an earlier run or a cached db, so version not in the log
+        if not mmseqs_version:
+            mmseqs_version = self.get_mmseqs_version (params['run_dir'])
+        self.log (console, "MMSEQS VER: '{}'".format(mmseqs_version))  # DEBUG
             
         
-        ### create genome qual file
+        # 2. format genome clusters for mOTUpan
         #
-        checkm_file = os.path.join (this_run_dir, stamp+'.checkm')
-        self.log (console,"creating checkm file {} ...".format(checkm_file))
+        motupan_genome_cluster_file = os.path.join (params['run_dir'], cluster_basename+'-motupan_in.json')
+        cluster_genes_file = codec_path (os.path.join (params['run_dir'], cluster_basename+'-cluster_genes.json'), self.intermediate_codec)
+        genome_clusters = self.convert_clusters_for_mOTUpan (mmseqs_cluster_outfile, motupan_genome_cluster_file, cluster_genes_file, params, console)
 
-        checkm_buf = []
-        header = "\t".join(['Bin Id', 'Completeness', 'Contamination'])
-        checkm_buf.append (header)
-        for genome_name in genome_names:
-            completeness = genome_qual_scores[genome_name]['completeness']
-            contamination = genome_qual_scores[genome_name]['contamination']
-            checkm_buf.append ("\t".join([genome_name, str(completeness), str(contamination)]))
+        return { 'mmseqs_cluster_outfile': mmseqs_cluster_outfile,
+                 'motupan_genome_cluster_file': motupan_genome_cluster_file,
+                 'cluster_genes_file': cluster_genes_file,
+                 'genome_clusters': genome_clusters,
+                 'mmseqs_version': mmseqs_version,
+                 'cov_mode': cov_mode,
+                 'cluster_mode': cluster_mode,
+                 'cluster_mode_params': cluster_mode_params
+                 }
 
-        # write file and save path to return
-        with open (checkm_file, 'w') as checkm_handle:
-            checkm_handle.write ("\n".join(checkm_buf)+"\n")
-        motupan_input_files['input_qual_path'] = checkm_file
 
+    ### run_mmseqs2_sweep_clustering ()
+    #
+    #   steps 1 and 2 for each (min_seq_id, min_coverage) combo, sharing one
+    #   seq db and one prefilter.  Each combo is aligned and clustered in a
+    #   single step (prefilter, align, clust) rather than mmseqs cluster's cascade
+    #
+    def run_mmseqs2_sweep_clustering (self, params, sweep_combo, sweep_tag, console):
+        cov_mode = "0"
 
-        ### set path for output pangenome json file
+        cluster_basename = os.path.basename (strip_codec_ext (params['input_faa_path']))
+        cluster_basename = re.sub(r'\.faa', '', cluster_basename)
+        cluster_basename = cluster_basename + '-clust-' + sweep_tag
+        mmseqs_cluster_outfile = os.path.join (params['run_dir'], cluster_basename + '_cluster.tsv')
+
+        if int(params.get('force_redo',0)) != 0 or \
+           not self.have_run_output (mmseqs_cluster_outfile):
+
+            (mmseqs_input_faa_path, mmseqs_cluster_basename, dup_map_path) = self.get_mmseqs_input (params, cluster_basename, console)
+            align_args = ['--min-seq-id', str(sweep_combo['min_seq_id']),
+                          '--cov-mode', str(cov_mode),
+                          '-c', str(sweep_combo['min_coverage'])]
+            (threads, memory_args) = self.get_mmseqs_threads_args (params, console)
+            mmseqs_tmp_dir = self.get_mmseqs_tmp_dir (params, mmseqs_input_faa_path, console)
+
+            self.log(console, "RUN: mmseqs prefilter/align/clust {} {}".format(mmseqs_input_faa_path, " ".join(align_args)))
+            mmseqs_start = time.time()
+            mmseqs_db_entry = self.mmseqs_db.cluster_from_prefilter (mmseqs_input_faa_path,
+                                                                     os.path.join (params['run_dir'], mmseqs_cluster_basename),
+                                                                     align_args,
+                                                                     threads,
+                                                                     memory_args,
+                                                                     mmseqs_tmp_dir)
+            self.log(console, "mmseqs sweep {} took {:.1f}s".format(sweep_tag, time.time()-mmseqs_start))
+            self.mmseqs_db.evict (mmseqs_db_entry)
+
+            if dup_map_path:
+                dedup_cluster_outfile = os.path.join (params['run_dir'], mmseqs_cluster_basename + '_cluster.tsv')
+                self.expand_dedup_clusters (dedup_cluster_outfile, dup_map_path, mmseqs_cluster_outfile)
+
+        motupan_genome_cluster_file = os.path.join (params['run_dir'], cluster_basename+'-motupan_in.json')
+        cluster_genes_file = codec_path (os.path.join (params['run_dir'], cluster_basename+'-cluster_genes.json'), self.intermediate_codec)
+        genome_clusters = self.convert_clusters_for_mOTUpan (mmseqs_cluster_outfile, motupan_genome_cluster_file, cluster_genes_file, params, console)
+
+        return { 'mmseqs_cluster_outfile': mmseqs_cluster_outfile,
+                 'motupan_genome_cluster_file': motupan_genome_cluster_file,
+                 'cluster_genes_file': cluster_genes_file,
+                 'genome_clusters': genome_clusters,
+                 'mmseqs_version': None,
+                 'cov_mode': cov_mode,
+                 'cluster_mode': 'prefilter-align-clust',
+                 'cluster_mode_params': dict()
+                 }
+
+
+    ### get_sweep_tag ()
+    #
+    def get_sweep_tag (self, sweep_combo):
+        return 'id{}-c{}'.format(sweep_combo['min_seq_id'], sweep_combo['min_coverage'])
+
+    
+    ### run_mOTUpan_and_parse ()
+    #
+    #   steps 3 and 4 of run_mmseqs2_and_mOTUpan_files(): need the quality file
+    #
+    def run_mOTUpan_and_parse (self, params, clustering_files, console):
+        mmseqs_cluster_outfile = clustering_files['mmseqs_cluster_outfile']
+        motupan_genome_cluster_file = clustering_files['motupan_genome_cluster_file']
+        mmseqs_version = clustering_files['mmseqs_version']
+        cov_mode = clustering_files['cov_mode']
+
+        # 3. run mOTUpan
         #
-        motupan_input_files['output_pangenome_json_path'] = os.path.join (this_run_dir, stamp+'-mOTUpan.json')
+        pangenome_basename = os.path.basename (strip_codec_ext (params['input_faa_path']))
+        pangenome_basename = re.sub(r'\.faa', '', pangenome_basename)
+        output_tag = ''
+        if params.get('output_tag'):
+            output_tag = '-'+params['output_tag']
+        motupan_outfile = os.path.join (params['run_dir'], pangenome_basename+output_tag+'-pangenome.mOTUpan')
         
+        if int(params.get('force_redo',0)) != 0 or \
+           not self.have_run_output (motupan_outfile):
+
+            ran_in_process = False
+            if self.motupan_exec_mode != 'subprocess':
+                ran_in_process = self.run_mOTUpan_in_process (params, clustering_files, motupan_outfile, pangenome_basename+output_tag, console)
+
+            if not ran_in_process:
+                # mOTUpan.py only reads plain json
+                if not os.path.isfile (motupan_genome_cluster_file):
+                    decompress_file (find_existing_path (motupan_genome_cluster_file))
+                mOTUpan_cmd = [self.MOTUPAN_BIN]
+                mOTUpan_cmd += ['--gene_clusters_file']
+                mOTUpan_cmd += [motupan_genome_cluster_file]
+                mOTUpan_cmd += ['--checkm']
+                mOTUpan_cmd += [params['input_qual_path']]
+                mOTUpan_cmd += ['--max_iter']
+                mOTUpan_cmd += [str(params['motupan_max_iter'])]
+                mOTUpan_cmd += ['--output']
+                mOTUpan_cmd += [motupan_outfile]
+
+                self.log(console, "RUN: "+" ".join(mOTUpan_cmd))
+                mOTUpan_start = time.time()
+                self.run_subprocess (mOTUpan_cmd, params['run_dir'], console)
+                self.log(console, "mOTUpan subprocess took {:.1f}s".format(time.time()-mOTUpan_start))
 
-        return motupan_input_files
+            
+        # 4. parse mOTUpan to JSON and add genes in each cluster from mmseqs
+        #
+        posterior_qual_file = os.path.basename (params['input_qual_path'])
+        posterior_qual_file = re.sub(r'\.checkm', '', posterior_qual_file)
+        posterior_qual_path = os.path.join (params['run_dir'], posterior_qual_file+output_tag+'-mOTUpan.qual')
+        motupan_json_outfile = motupan_outfile + '.json'
+        
+        if int(params.get('force_redo',0)) != 0 or \
+           not os.path.isfile (motupan_json_outfile) or \
+           not os.path.getsize (motupan_json_outfile) > 0 or \
+           not os.path.isfile (posterior_qual_path) or \
+           not os.path.getsize (posterior_qual_path) > 0:
+
+            parse_mOTUpan_cmd = [self.PARSE_MOTUPAN_BIN]
+            parse_mOTUpan_cmd += ['--mOTUpan_infile']
+            parse_mOTUpan_cmd += [find_existing_path (motupan_outfile)]
+            if clustering_files.get('cluster_genes_file'):
+                parse_mOTUpan_cmd += ['--cluster_genes_file']
+                parse_mOTUpan_cmd += [clustering_files['cluster_genes_file']]
+            else:
+                parse_mOTUpan_cmd += ['--genefamily_mmseqs_infile']
+                parse_mOTUpan_cmd += [find_existing_path (mmseqs_cluster_outfile)]
+            parse_mOTUpan_cmd += ['--id_map_file']
+            parse_mOTUpan_cmd += [params['input_gene_id_map_path']]
+            parse_mOTUpan_cmd += ['--pangenome_outfile']
+            parse_mOTUpan_cmd += [params['output_pangenome_json_path']]
+            parse_mOTUpan_cmd += ['--completeness_outfile']
+            parse_mOTUpan_cmd += [posterior_qual_path]
+            parse_mOTUpan_cmd += ['--force_oldfields']
+            #parse_mOTUpan_cmd += ['True']  # change to 'False' when pangenome typedef updated
+            parse_mOTUpan_cmd += ['False']
+            if params.get('genome_name2ref_path'):
+                parse_mOTUpan_cmd += ['--reference_map_infile']
+                parse_mOTUpan_cmd += [params['genome_name2ref_path']]
+            if params.get('annotation_store_path'):
+                parse_mOTUpan_cmd += ['--annotation_store_file']
+                parse_mOTUpan_cmd += [params['annotation_store_path']]
+            elif params.get('json_genome_obj_paths_file'):
+                parse_mOTUpan_cmd += ['--json_genome_obj_paths_file']
+                parse_mOTUpan_cmd += [params['json_genome_obj_paths_file']]
+
+            # add command line to store params as metadata
+            cluster_args_str = 'cluster-mode='+str(clustering_files['cluster_mode'])
+            cluster_args_str += ';min-seq-id='+str(params['mmseqs_min_seq_id'])
+            cluster_args_str += ';c='+str(params['mmseqs_min_coverage'])
+            cluster_args_str += ';cov-mode='+str(cov_mode)
+            for cluster_mode_key in sorted(clustering_files['cluster_mode_params'].keys()):
+                cluster_args_str += ';'+cluster_mode_key+'='+str(clustering_files['cluster_mode_params'][cluster_mode_key])
+            parse_mOTUpan_cmd += ['--cluster_method_params']
+            parse_mOTUpan_cmd += ['"'+cluster_args_str+'"']
+
+            motupan_args_str = 'max_iter='+str(params['motupan_max_iter'])
+            parse_mOTUpan_cmd += ['--pangenome_method_params']
+            parse_mOTUpan_cmd += ['"'+motupan_args_str+'"']
+
+            # add cluster method version
+            parse_mOTUpan_cmd += ['--version_mmseqs2']
+            parse_mOTUpan_cmd += [mmseqs_version]
+            
+            self.log(console, "RUN: "+" ".join(parse_mOTUpan_cmd))
+            self.run_subprocess (parse_mOTUpan_cmd, params['run_dir'], console)
+
+        # compress large intermediates now that external tools are done with them
+        #
+        cluster_basepath = re.sub(r'_cluster\.tsv$', '', mmseqs_cluster_outfile)
+        self.compress_run_intermediates ([mmseqs_cluster_outfile,
+                                          cluster_basepath+'_all_seqs.fasta',
+                                          cluster_basepath+'_rep_seq.fasta',
+                                          cluster_basepath+'-dedup_cluster.tsv',
+                                          cluster_basepath+'-dedup_all_seqs.fasta',
+                                          cluster_basepath+'-dedup_rep_seq.fasta',
+                                          motupan_genome_cluster_file,
+                                          motupan_outfile],
+                                         console)
+
+        return posterior_qual_path
+
+
+    ### run_mOTUpan_in_process ()
+    #
+    #   mOTUpan through mOTUlizer's API on the in-memory gene clusters.  Returns
+    #   False to fall back to the mOTUpan.py subprocess (unless mode is 'api')
+    #
+    def run_mOTUpan_in_process (self, params, clustering_files, motupan_outfile, run_name, console):
+        # only an API mismatch falls back to mOTUpan.py; run errors propagate
+        try:
+            MOTUpanAPI.check_api()
+        except (ImportError, TypeError) as e:
+            if self.motupan_exec_mode == 'api':
+                raise
+            self.log(console, "mOTUpan in-process unavailable ({}: {}).  Using mOTUpan.py".format(type(e).__name__, str(e)))
+            return False
+
+        genome_clusters = clustering_files.get('genome_clusters')
+        if genome_clusters is None:
+            with open_text (find_existing_path (clustering_files['motupan_genome_cluster_file']), 'r') as gene_clusters_handle:
+                genome_clusters = json.load (gene_clusters_handle)
+        genome_completeness = MOTUpanAPI.read_checkm_completeness (params['input_qual_path'])
+
+        self.log(console, "RUN: mOTUpan in-process (max_iter={}) on {} genomes".format(params['motupan_max_iter'], len(genome_clusters)))
+        mOTUpan_start = time.time()
+        pan_table = MOTUpanAPI.run_motupan (genome_clusters,
+                                            genome_completeness,
+                                            params['motupan_max_iter'],
+                                            name=run_name)
+        self.log(console, "mOTUpan in-process took {:.1f}s".format(time.time()-mOTUpan_start))
+
+        with open_text (motupan_outfile, 'w') as motupan_out_handle:
+            motupan_out_handle.write (pan_table)
+        return True
+
+
+    ### have_run_output ()
+    #
+    #   non-empty output from an earlier run, plain or compressed by compress_run_intermediates()
+    #
+    def have_run_output (self, path):
+        existing_path = find_existing_path (path)
+        return os.path.isfile (existing_path) and os.path.getsize (existing_path) > 0
+
+
+    ### compress_run_intermediates ()
+    #
+    def compress_run_intermediates (self, paths, console):
+        if self.intermediate_codec == 'none':
+            return
+        for path in paths:
+            if os.path.isfile (path):
+                self.log(console, "compressing {} ({})".format(path, self.intermediate_codec))
+                compress_file (path, self.intermediate_codec)
+
+
+    ### get_faa_codec ()
+    #
+    #   mmseqs reads gzipped but not zstd fasta
+    #
+    def get_faa_codec (self):
+        if self.intermediate_codec == 'none':
+            return 'none'
+        return 'gzip'
 
 
     ### save_pangenome_obj ()
@@ -589,12 +1382,8 @@ class kb_motupan:
         provenance[0]['method'] = 'run_kb_motupan'        
 
         # load pg data
-        pg_json_str = ''
-        with open (pangenome_json_file, 'r') as pg_json_file_h:
-            for line in pg_json_file_h:
-                pg_json_str += line
-
-        pg_data = json.loads(pg_json_str)
+        with open_text (pangenome_json_file, 'r') as pg_json_file_h:
+            pg_data = json.load(pg_json_file_h)
         if 'id' not in pg_data:
             pg_data['id'] = output_pangenome_name
         
@@ -615,6 +1404,41 @@ class kb_motupan:
         return pangenome_upa
 
 
+    ### get_completeness_report_text ()
+    #
+    def get_completeness_report_text (self, genome_names, genome_refs, genome_qual_scores, genome_qual_sources, posterior_completeness=None):
+        if posterior_completeness is None:
+            posterior_completeness = dict()
+        report_lines = ['Genome completeness sources:']
+        source_cnts = dict()
+        for genome_i,genome_name in enumerate(genome_names):
+            source = genome_qual_sources[genome_name]
+            source_cnts[source] = source_cnts.get(source, 0) + 1
+            report_lines.append("  {} ({}): completeness={} contamination={} source={} posterior_completeness={}".format(genome_name,
+                                                                                                                       genome_refs[genome_i],
+                                                                                                                       genome_qual_scores[genome_name]['completeness'],
+                                                                                                                       genome_qual_scores[genome_name]['contamination'],
+                                                                                                                       source,
+                                                                                                                       posterior_completeness.get(genome_name, 'N/A')))
+        report_lines.insert(1, '  '+', '.join(["{}: {}".format(source, source_cnts[source]) for source in sorted(source_cnts.keys())]))
+        return "\n".join(report_lines)+"\n"
+
+
+    ### get_posterior_completeness ()
+    #
+    def get_posterior_completeness (self, posterior_qual_path):
+        posterior_completeness = dict()
+        if not posterior_qual_path or not os.path.isfile(posterior_qual_path):
+            return posterior_completeness
+        with open_text (posterior_qual_path, 'r') as posterior_qual_handle:
+            for line in posterior_qual_handle:
+                qual_info = line.rstrip().split("\t")
+                if qual_info[0] == 'Bin Id':
+                    continue
+                posterior_completeness[qual_info[0]] = qual_info[1]
+        return posterior_completeness
+
+
     ### create_motupan_report ()
     #
     def create_motupan_report (self,
@@ -625,7 +1449,8 @@ class kb_motupan:
                                pcp_file_links,
                                pcp_html_links,
                                show_circle_plot,
-                               console):
+                               console,
+                               report_message=None):
 
         objects_created = []
         file_links = []
@@ -681,6 +1506,8 @@ class kb_motupan:
         }
         if objects_created is not None:
             report_params['objects_created'] = objects_created
+        if report_message:
+            report_params['message'] = report_message
             
         report_info = self.reportClient.create_extended_report(report_params)        
         return report_info
@@ -725,6 +1552,63 @@ class kb_motupan:
         if not os.path.exists(self.scratch):
             os.makedirs(self.scratch)
 
+        # local genome cache (genome obj versions are immutable)
+        genome_cache_dir = config.get('genome-cache-dir')
+        if not genome_cache_dir:
+            genome_cache_dir = os.path.join(self.scratch, 'genome_cache')
+        genome_cache_max_mb = int(config.get('genome-cache-max-mb') or 10240)
+        try:
+            self.genome_cache = GenomeCache(genome_cache_dir, genome_cache_max_mb * 1024 * 1024)
+        except Exception as e:
+            logging.warning("unable to use genome cache dir {}: {}".format(genome_cache_dir, str(e)))
+            self.genome_cache = None
+
+        # local completeness/contamination cache (optionally seeded from, and written back to, a shared export)
+        qual_score_cache_db = config.get('qual-score-cache-db')
+        if not qual_score_cache_db:
+            qual_score_cache_db = os.path.join(self.scratch, 'qual_score_cache.sqlite')
+        self.qual_score_cache_export = config.get('qual-score-cache-export') or None
+        try:
+            self.qual_score_cache = QualScoreCache(qual_score_cache_db)
+            qual_score_cache_import = config.get('qual-score-cache-import')
+            if qual_score_cache_import and os.path.isfile(qual_score_cache_import):
+                import_cnt = self.qual_score_cache.import_tsv(qual_score_cache_import)
+                logging.info("imported {} qual scores from {}".format(import_cnt, qual_score_cache_import))
+        except Exception as e:
+            logging.warning("unable to use qual score cache {}: {}".format(qual_score_cache_db, str(e)))
+            self.qual_score_cache = None
+
+        # GTDB metadata TSV with CheckM scores (optional)
+        self.gtdb_metadata_file = config.get('gtdb-metadata-file')
+        if self.gtdb_metadata_file and not os.path.isfile(self.gtdb_metadata_file):
+            logging.warning("gtdb-metadata-file {} not found".format(self.gtdb_metadata_file))
+            self.gtdb_metadata_file = None
+        self.gtdb_metadata_index = os.path.join(self.scratch, 'gtdb_metadata_index.sqlite')
+
+        # protein count at which mmseqs_cluster_mode 'auto' switches to easy-linclust
+        self.auto_linclust_min_seqs = int(config.get('auto-linclust-min-seqs') or 1000000)
+
+        # run mOTUpan in-process via mOTUlizer ('auto' falls back to mOTUpan.py), 'api', or 'subprocess'
+        self.motupan_exec_mode = config.get('motupan-exec-mode') or 'auto'
+        if self.motupan_exec_mode not in ['auto', 'api', 'subprocess']:
+            raise ValueError ("motupan-exec-mode must be 'auto', 'api', or 'subprocess', not '{}'".format(self.motupan_exec_mode))
+
+        # codec for run intermediates ('none', 'gzip', or 'zstd' if zstandard installed)
+        self.intermediate_codec = resolve_codec(config.get('intermediate-compression', 'gzip'))
+
+        # node-local fast storage (SSD or tmpfs) for mmseqs temp files, else run_dir
+        self.mmseqs_tmp_dir = config.get('tmp-dir') or None
+
+        # MMseqs2 seq dbs and prefilter results kept across runs (keyed by faa content)
+        mmseqs_db_cache_dir = config.get('mmseqs-db-cache-dir')
+        if not mmseqs_db_cache_dir:
+            mmseqs_db_cache_dir = os.path.join(self.scratch, 'mmseqs_db_cache')
+        mmseqs_db_cache_max_mb = int(config.get('mmseqs-db-cache-max-mb') or 51200)
+        self.mmseqs_db = MMseqsDB(self.MMSEQS_BIN,
+                                  mmseqs_db_cache_dir,
+                                  mmseqs_db_cache_max_mb * 1024 * 1024,
+                                  lambda run_cmd, run_dir: self.run_subprocess(run_cmd, run_dir))
+
         # set i/o dirs
         timestamp = int((datetime.utcnow() - datetime.utcfromtimestamp(0)).total_seconds() * 1000)
         self.input_dir = os.path.join(self.scratch, 'input.' + str(timestamp))
@@ -749,12 +1633,16 @@ class kb_motupan:
            "file_path", parameter "genome_name2ref_path" of type "file_path",
            parameter "run_dir" of type "file_path", parameter
            "json_genome_obj_paths_file" of type "file_path", parameter
+           "annotation_store_path" of type "file_path", parameter
            "output_pangenome_json_path" of type "file_path", parameter
            "mmseqs_cluster_mode" of String, parameter "mmseqs_min_seq_id" of
            Double, parameter "mmseqs_min_coverage" of Double, parameter
-           "motupan_max_iter" of Long
+           "motupan_max_iter" of Long, parameter "dedup_exact_seqs" of type
+           "bool", parameter "threads" of Long, parameter "max_memory" of
+           String, parameter "tmp_dir" of type "file_path"
         :returns: instance of type "run_mmseqs2_and_mOTUpan_files_Output" ->
-           structure: parameter "pangenome_json" of type "file_path"
+           structure: parameter "pangenome_json" of type "file_path",
+           parameter "posterior_qual" of type "file_path"
         """
         # ctx is the context object
         # return variables are: output
@@ -791,160 +1679,127 @@ class kb_motupan:
         # 3. run mOTUpan
         # 4. parse mOTUpan to JSON and add genes in each cluster from mmseqs
         # (5. optionally add functions to pangenome clusters)
-
-        
-        # 1. calculate mmseqs2 clusters
-        #    Note: subprocess shell must be False.  I think bourne shell messes up mmseqs
         #
-        cluster_basename = os.path.basename (params['input_faa_path'])
-        cluster_basename = re.sub(r'\.faa', '', cluster_basename)
-        cluster_basename = cluster_basename + '-clust'
-        mmseqs_cluster_outfile = os.path.join (params['run_dir'], cluster_basename + '_cluster.tsv')
+        # run_kb_motupan() calls the two stages separately so clustering can
+        # overlap with CheckM
 
-        if int(params.get('force_redo',0)) != 0 or \
-           not os.path.isfile (mmseqs_cluster_outfile) or \
-           not os.path.getsize (mmseqs_cluster_outfile) > 0:
-
-            cov_mode = "0"
-            mmseqs_workdir = 'mmseqs_work'
-            mmseqs_cmd = [self.MMSEQS_BIN]
-            mmseqs_cmd += [params['mmseqs_cluster_mode']]
-            mmseqs_cmd += [params['input_faa_path']]
-            mmseqs_cmd += [cluster_basename]
-            mmseqs_cmd += [mmseqs_workdir]
-            mmseqs_cmd += ['--min-seq-id']
-            mmseqs_cmd += [str(params['mmseqs_min_seq_id'])]
-            mmseqs_cmd += ['--cov-mode']
-            mmseqs_cmd += [str(cov_mode)]
-            mmseqs_cmd += ['-c']
-            mmseqs_cmd += [str(params['mmseqs_min_coverage'])]
-            
-            self.log(console, "RUN: "+" ".join(mmseqs_cmd))
-            #self.run_subprocess (mmseqs_cmd, params['run_dir'], console)  # too verbose
-            (mmseqs_retcode, mmseqs_outbuf) = self.run_subprocess (mmseqs_cmd, params['run_dir'])
-            # get mmseqs_version
-            mmseqs_version = 'FOOBAR'
-            for mmseqs_outline in mmseqs_outbuf:
-                #self.log (console, "MMSEQS LINE: ''{}".format(mmseqs_outline))  # DEBUG
-                if 'MMseqs Version:' in mmseqs_outline:
-                    mmseqs_version = re.sub(r'^.*MMseqs Version:\s*\\t', '', mmseqs_outline).rstrip()
-                    mmseqs_version = re.sub(r'\\n\'$', '', mmseqs_version)
-                    break
-            self.log (console, "MMSEQS VER: '{}'".format(mmseqs_version))  # DEBUG
+        clustering_files = self.run_mmseqs2_clustering (params, console)
+        posterior_qual_path = self.run_mOTUpan_and_parse (params, clustering_files, console)
 
-            # clean up mmseqs_workdir because symlinks to nothng mess up archive
-            (rundir_path, faa_file) = os.path.split (params['input_faa_path'])
-            mmseqs_workdir_path = os.path.join (rundir_path, mmseqs_workdir)
-            shutil.rmtree (mmseqs_workdir_path)
             
-        
-        # 2. format genome clusters for mOTUpan
+        # Return
         #
-        motupan_genome_cluster_file = os.path.join (params['run_dir'], cluster_basename+'-motupan_in.json')
-
-        if int(params.get('force_redo',0)) != 0 or \
-           not os.path.isfile (motupan_genome_cluster_file) or \
-           not os.path.getsize (motupan_genome_cluster_file) > 0:
-
-            mOTUconvert_cmd = [self.MOTUCONVERT_BIN]
-            mOTUconvert_cmd += ['--in_type']
-            mOTUconvert_cmd += ['mmseqs2']
-            mOTUconvert_cmd += ['-o']
-            mOTUconvert_cmd += [motupan_genome_cluster_file]
-            mOTUconvert_cmd += [mmseqs_cluster_outfile]
-            
-            self.log(console, "RUN: "+" ".join(mOTUconvert_cmd))
-            self.run_subprocess (mOTUconvert_cmd, params['run_dir'], console)
+        output = { 'pangenome_json': params['output_pangenome_json_path'],
+                   'posterior_qual': posterior_qual_path
+                   }
+        self.log(console, "run_mmseqs2_and_motupan_files DONE")
 
-            
-        # 3. run mOTUpan
-        #
-        pangenome_basename = os.path.basename (params['input_faa_path'])
-        pangenome_basename = re.sub(r'\.faa', '', pangenome_basename)
-        motupan_outfile = os.path.join (params['run_dir'], pangenome_basename+'-pangenome.mOTUpan')
-        
-        if int(params.get('force_redo',0)) != 0 or \
-           not os.path.isfile (motupan_outfile) or \
-           not os.path.getsize (motupan_outfile) > 0:
-
-            mOTUpan_cmd = [self.MOTUPAN_BIN]
-            mOTUpan_cmd += ['--gene_clusters_file']
-            mOTUpan_cmd += [motupan_genome_cluster_file]
-            mOTUpan_cmd += ['--checkm']
-            mOTUpan_cmd += [params['input_qual_path']]
-            mOTUpan_cmd += ['--max_iter']
-            mOTUpan_cmd += [str(params['motupan_max_iter'])]
-            mOTUpan_cmd += ['--output']
-            mOTUpan_cmd += [motupan_outfile]
-            
-            self.log(console, "RUN: "+" ".join(mOTUpan_cmd))
-            self.run_subprocess (mOTUpan_cmd, params['run_dir'], console)
+        #END run_mmseqs2_and_mOTUpan_files
 
-            
-        # 4. parse mOTUpan to JSON and add genes in each cluster from mmseqs
-        #
-        posterior_qual_file = os.path.basename (params['input_qual_path'])
-        posterior_qual_file = re.sub(r'\.checkm', '', posterior_qual_file)
-        posterior_qual_path = os.path.join (params['run_dir'], posterior_qual_file+'-mOTUpan.qual')
-        motupan_json_outfile = motupan_outfile + '.json'
-        
-        if int(params.get('force_redo',0)) != 0 or \
-           not os.path.isfile (motupan_json_outfile) or \
-           not os.path.getsize (motupan_json_outfile) > 0 or \
-           not os.path.isfile (posterior_qual_path) or \
-           not os.path.getsize (posterior_qual_path) > 0:
+        # At some point might do deeper type checking...
+        if not isinstance(output, dict):
+            raise ValueError('Method run_mmseqs2_and_mOTUpan_files return value ' +
+                             'output is not type dict as required.')
+        # return the results
+        return [output]
 
-            parse_mOTUpan_cmd = [self.PARSE_MOTUPAN_BIN]
-            parse_mOTUpan_cmd += ['--mOTUpan_infile']
-            parse_mOTUpan_cmd += [motupan_outfile]
-            parse_mOTUpan_cmd += ['--genefamily_mmseqs_infile']
-            parse_mOTUpan_cmd += [mmseqs_cluster_outfile]
-            parse_mOTUpan_cmd += ['--id_map_file']
-            parse_mOTUpan_cmd += [params['input_gene_id_map_path']]
-            parse_mOTUpan_cmd += ['--pangenome_outfile']
-            parse_mOTUpan_cmd += [params['output_pangenome_json_path']]
-            parse_mOTUpan_cmd += ['--completeness_outfile']
-            parse_mOTUpan_cmd += [posterior_qual_path]
-            parse_mOTUpan_cmd += ['--force_oldfields']
-            #parse_mOTUpan_cmd += ['True']  # change to 'False' when pangenome typedef updated
-            parse_mOTUpan_cmd += ['False']
-            if params.get('genome_name2ref_path'):
-                parse_mOTUpan_cmd += ['--reference_map_infile']
-                parse_mOTUpan_cmd += [params['genome_name2ref_path']]
-            if params.get('json_genome_obj_paths_file'):
-                parse_mOTUpan_cmd += ['--json_genome_obj_paths_file']
-                parse_mOTUpan_cmd += [params['json_genome_obj_paths_file']]
+    def run_mmseqs2_and_mOTUpan_sweep(self, ctx, params):
+        """
+        :param params: instance of type
+           "run_mmseqs2_and_mOTUpan_sweep_Params"
+           (run_mmseqs2_and_mOTUpan_sweep() ** **  Method for running mmseqs2
+           and mOTUpan from files for several **  (min_seq_id, min_coverage)
+           combos, sharing one mmseqs2 seq db and **  prefilter.
+           output_pangenome_json_path is the base name for the **  per-combo
+           pangenome JSON files.) -> structure: parameter "input_faa_path" of
+           type "file_path", parameter "input_qual_path" of type "file_path",
+           parameter "input_gene_id_map_path" of type "file_path", parameter
+           "genome_name2ref_path" of type "file_path", parameter "run_dir" of
+           type "file_path", parameter "json_genome_obj_paths_file" of type
+           "file_path", parameter "annotation_store_path" of type
+           "file_path", parameter "output_pangenome_json_path" of type
+           "file_path", parameter "sweep_combos" of list of type
+           "mmseqs_sweep_combo" -> structure: parameter "min_seq_id" of
+           Double, parameter "min_coverage" of Double, parameter
+           "motupan_max_iter" of Long, parameter "dedup_exact_seqs" of type
+           "bool", parameter "threads" of Long, parameter "max_memory" of
+           String, parameter "tmp_dir" of type "file_path"
+        :returns: instance of type "run_mmseqs2_and_mOTUpan_sweep_Output" ->
+           structure: parameter "sweep_results" of list of type
+           "mmseqs_sweep_result" -> structure: parameter "min_seq_id" of
+           Double, parameter "min_coverage" of Double, parameter
+           "pangenome_json" of type "file_path", parameter "posterior_qual"
+           of type "file_path"
+        """
+        # ctx is the context object
+        # return variables are: output
+        #BEGIN run_mmseqs2_and_mOTUpan_sweep
+        console = []
+        tool_name = 'run_mmseqs2_and_motupan_sweep'
+        self.log(console, 'Running ' + tool_name + ' with params=')
+        self.log(console, "\n" + pformat(params))
 
-            # add command line to store params as metadata
-            cluster_args_str = 'cluster-mode='+str(params['mmseqs_cluster_mode'])
-            cluster_args_str += ';min-seq-id='+str(params['mmseqs_min_seq_id'])
-            cluster_args_str += ';c='+str(params['mmseqs_min_coverage'])
-            cluster_args_str += ';cov-mode='+str(cov_mode)
-            parse_mOTUpan_cmd += ['--cluster_method_params']
-            parse_mOTUpan_cmd += ['"'+cluster_args_str+'"']
+        #### do some basic checks
+        #
+        required_params =  ['input_faa_path',
+                            'input_qual_path',
+                            'input_gene_id_map_path',
+                            'run_dir',
+                            'output_pangenome_json_path',
+                            'sweep_combos',
+                            'motupan_max_iter'
+                            ]
+        self.check_params (params, required_params)
+        if len(params['sweep_combos']) == 0:
+            raise ValueError ("sweep_combos must have at least one (min_seq_id, min_coverage) combo")
+        for sweep_combo in params['sweep_combos']:
+            self.check_params (sweep_combo, ['min_seq_id', 'min_coverage'])
 
-            motupan_args_str = 'max_iter='+str(params['motupan_max_iter'])
-            parse_mOTUpan_cmd += ['--pangenome_method_params']
-            parse_mOTUpan_cmd += ['"'+motupan_args_str+'"']
 
-            # add cluster method version
-            parse_mOTUpan_cmd += ['--version_mmseqs2']
-            parse_mOTUpan_cmd += [mmseqs_version]
-            
-            self.log(console, "RUN: "+" ".join(parse_mOTUpan_cmd))
-            self.run_subprocess (parse_mOTUpan_cmd, params['run_dir'], console)
+        # workflow, once per combo (seq db and prefilter shared by all combos)
+        #
+        # 1. align prefilter hits and cluster with the combo's thresholds
+        # 2. format genome clusters for mOTUpan
+        # 3. run mOTUpan
+        # 4. parse mOTUpan to JSON and add genes in each cluster from mmseqs
+        #
+        mmseqs_version = self.get_mmseqs_version (params['run_dir'])
+        pangenome_json_basepath = strip_codec_ext (params['output_pangenome_json_path'])
+        pangenome_json_ext = params['output_pangenome_json_path'][len(pangenome_json_basepath):]
+        pangenome_json_basepath = re.sub(r'\.json$', '', pangenome_json_basepath)
+
+        sweep_results = []
+        for sweep_combo in params['sweep_combos']:
+            sweep_tag = self.get_sweep_tag (sweep_combo)
+            self.log(console, "SWEEP COMBO {}".format(sweep_tag))
+
+            combo_params = dict(params)
+            combo_params['mmseqs_min_seq_id'] = sweep_combo['min_seq_id']
+            combo_params['mmseqs_min_coverage'] = sweep_combo['min_coverage']
+            combo_params['output_tag'] = sweep_tag
+            combo_params['output_pangenome_json_path'] = pangenome_json_basepath+'-'+sweep_tag+'.json'+pangenome_json_ext
+
+            clustering_files = self.run_mmseqs2_sweep_clustering (combo_params, sweep_combo, sweep_tag, console)
+            clustering_files['mmseqs_version'] = mmseqs_version
+            posterior_qual_path = self.run_mOTUpan_and_parse (combo_params, clustering_files, console)
+
+            sweep_results.append ({ 'min_seq_id': sweep_combo['min_seq_id'],
+                                    'min_coverage': sweep_combo['min_coverage'],
+                                    'pangenome_json': combo_params['output_pangenome_json_path'],
+                                    'posterior_qual': posterior_qual_path
+                                    })
 
             
         # Return
         #
-        output = { 'pangenome_json': params['output_pangenome_json_path'] }
-        self.log(console, "run_mmseqs2_and_motupan_files DONE")
+        output = { 'sweep_results': sweep_results }
+        self.log(console, "run_mmseqs2_and_motupan_sweep DONE")
 
-        #END run_mmseqs2_and_mOTUpan_files
+        #END run_mmseqs2_and_mOTUpan_sweep
 
         # At some point might do deeper type checking...
         if not isinstance(output, dict):
-            raise ValueError('Method run_mmseqs2_and_mOTUpan_files return value ' +
+            raise ValueError('Method run_mmseqs2_and_mOTUpan_sweep return value ' +
                              'output is not type dict as required.')
         # return the results
         return [output]
@@ -956,15 +1811,25 @@ class kb_motupan:
            widget) -> structure: parameter "workspace_name" of Long,
            parameter "input_ref" of type "data_obj_ref", parameter
            "output_pangenome_name" of type "data_obj_name", parameter
-           "checkm_version" of String, parameter "mmseqs_cluster_mode" of
-           String, parameter "mmseqs_min_seq_id" of Double, parameter
-           "mmseqs_min_coverage" of Double, parameter "motupan_max_iter" of
-           Long, parameter "pcp_input_genome_ref" of type "data_obj_ref",
-           parameter "pcp_input_compare_genome_refs" of list of type
-           "data_obj_ref", parameter "pcp_input_outgroup_genome_refs" of list
-           of type "data_obj_ref", parameter "pcp_save_featuresets" of type
-           "bool", parameter "pcp_genome_disp_name_config" of String,
-           parameter "run_as_test_mode" of type "bool"
+           "checkm_version" of String, parameter "completeness_mode" of
+           String, parameter "prior_completeness" of Double, parameter
+           "genome_prior_completeness" of mapping from String to Double,
+           parameter "mmseqs_cluster_mode" of String, parameter
+           "mmseqs_min_seq_id" of Double, parameter "mmseqs_min_coverage" of
+           Double, parameter "motupan_max_iter" of Long, parameter
+           "pcp_input_genome_ref" of type "data_obj_ref", parameter
+           "pcp_input_compare_genome_refs" of list of type "data_obj_ref",
+           parameter "pcp_input_outgroup_genome_refs" of list of type
+           "data_obj_ref", parameter "pcp_save_featuresets" of type "bool",
+           parameter "pcp_genome_disp_name_config" of String, parameter
+           "run_as_test_mode" of type "bool", parameter
+           "genome_fetch_chunk_size" of Long, parameter
+           "genome_fetch_threads" of Long, parameter "genome_fetch_mode" of
+           String, parameter "use_genome_cache" of type "bool", parameter
+           "checkm_parallel_jobs" of Long, parameter "checkm_threads" of
+           Long, parameter "dedup_exact_seqs" of type "bool", parameter
+           "threads" of Long, parameter "max_memory" of String, parameter
+           "tmp_dir" of type "file_path"
         :returns: instance of type "ReportResults" (Report results **   
            report_name: The name of the report object in the workspace. **   
            report_ref: The UPA of the report object, e.g. wsid/objid/ver.) ->
@@ -992,45 +1857,117 @@ class kb_motupan:
         params = self.validate_and_default_params (params, console)
 
         
-        #### STEP 2: get genomes and write obj json to file
-        self.log(console, "GETTING INPUT GENOME OBJECTS")
-        (genome_refs, genome_objs) = self.get_genome_objs (params['input_ref'], console)
+        #### STEP 2: get genomes and write faa, id map, and slim obj json to file
+        self.log(console, "GETTING AND INGESTING INPUT GENOME OBJECTS")
+        genome_input_refs = self.get_genome_refs (params['input_ref'], console)
+        motupan_input_files = self.prepare_run_dir (console)
+        genome_objs_iter = self.iter_genome_objs (genome_input_refs,
+                                                  console,
+                                                  fetch_chunk_size=params['genome_fetch_chunk_size'],
+                                                  fetch_threads=params['genome_fetch_threads'],
+                                                  fetch_mode=params['genome_fetch_mode'],
+                                                  use_genome_cache=(int(params['use_genome_cache']) != 0))
+        (genome_names,
+         genome_refs,
+         embedded_qual_scores) = self.ingest_genome_objs (genome_objs_iter,
+                                                          motupan_input_files,
+                                                          params['checkm_version'],
+                                                          console)
         
 
-        #### STEP 3: get completeness scores
+        #### STEP 3: get completeness scores from genome objs, cache, and GTDB metadata,
+        #            then start CheckM on the rest (runs alongside clustering)
         self.log(console, "GETTING COMPLETENESS SCORES")
         run_as_test_mode = 0
         if 'run_as_test_mode' in params:
             run_as_test_mode = int(params['run_as_test_mode'])
-        genome_qual_scores = self.get_genome_qual_scores (params['workspace_name'],
-                                                          genome_refs,
-                                                          genome_objs,
-                                                          params['checkm_version'],
-                                                          run_as_test_mode,
-                                                          console)
-        
-
-        ### STEP 4: prepare files
-        self.log(console, "PREPARING FILES")
-        motupan_input_files = self.prepare_motupan_files (genome_objs, genome_qual_scores, console)
-        
-
-        ### STEP 5: run MMseqs2 and mOTUpan on files
-        self.log(console, "RUNNING MMSEQS2 and MOTUPAN")
+        genome_qual_scores = dict()
+        genome_qual_sources = dict()
+        unresolved_genomes = [{'name': genome_name, 'ref': genome_refs[genome_i]} for genome_i,genome_name in enumerate(genome_names)]
+        providers = self.get_completeness_providers (embedded_qual_scores,
+                                                     params['checkm_version'],
+                                                     console,
+                                                     completeness_mode=params['completeness_mode'],
+                                                     prior_completeness=params['prior_completeness'],
+                                                     genome_prior_completeness=params.get('genome_prior_completeness'))
+        unresolved_genomes = self.get_genome_qual_scores (providers, unresolved_genomes, genome_qual_scores, genome_qual_sources, console)
+
+        # mmseqs gives up CheckM's share of the threads only while CheckM is running
+        mmseqs_threads = params['threads']
+        qual_executor = None
+        qual_future = None
+        if unresolved_genomes and params['completeness_mode'] == 'checkm':
+            mmseqs_threads = params['mmseqs_threads']
+            checkm_provider = self.get_checkm_provider (params['workspace_name'],
+                                                        params['checkm_version'],
+                                                        run_as_test_mode,
+                                                        console,
+                                                        checkm_parallel_jobs=params['checkm_parallel_jobs'],
+                                                        checkm_threads=params['checkm_threads'])
+            qual_executor = ThreadPoolExecutor(max_workers=1)
+            qual_future = qual_executor.submit (self.get_genome_qual_scores,
+                                                [checkm_provider],
+                                                unresolved_genomes,
+                                                genome_qual_scores,
+                                                genome_qual_sources,
+                                                console)
+
+
+        ### STEP 4: run MMseqs2 clustering on faa while completeness scores are found
+        self.log(console, "RUNNING MMSEQS2")
         motupan_files_params = {
             'input_faa_path': motupan_input_files['input_faa_path'],
-            'input_qual_path': motupan_input_files['input_qual_path'],
-            'genome_name2ref_path': motupan_input_files['genome_name2ref_path'],
             'input_gene_id_map_path': motupan_input_files['input_gene_id_map_path'],
             'run_dir': motupan_input_files['run_dir'],
-            'json_genome_obj_paths_file': motupan_input_files['json_genome_obj_paths_file'],
-            'output_pangenome_json_path': motupan_input_files['output_pangenome_json_path'],
+            'annotation_store_path': motupan_input_files['annotation_store_path'],
             'mmseqs_cluster_mode': params['mmseqs_cluster_mode'],
             'mmseqs_min_seq_id': params['mmseqs_min_seq_id'],
             'mmseqs_min_coverage': params['mmseqs_min_coverage'],
-            'motupan_max_iter': params['motupan_max_iter']
+            'motupan_max_iter': params['motupan_max_iter'],
+            'dedup_exact_seqs': params['dedup_exact_seqs'],
+            'threads': mmseqs_threads,
+            'max_memory': params['max_memory'],
+            'tmp_dir': params.get('tmp_dir')
         }
-        motupan_output_files = self.run_mmseqs2_and_mOTUpan_files (ctx, motupan_files_params)[0]
+        clustering_start = time.time()
+        try:
+            clustering_files = self.run_mmseqs2_clustering (motupan_files_params, console)
+        except Exception as e:
+            # CheckM runs as kb_Msuite jobs that can't be stopped from here, so it is
+            # allowed to finish (its scores still go to the qual score cache for a
+            # rerun) before the clustering error is raised
+            if qual_future is not None:
+                self.log(console, "clustering failed ({}: {}).  Waiting for CheckM to finish".format(type(e).__name__, str(e)))
+                qual_executor.shutdown (wait=True)
+            raise
+        self.log(console, "clustering done in {:.1f}s".format(time.time()-clustering_start))
+
+        # join: mOTUpan needs the quality scores
+        if qual_future is not None:
+            self.log(console, "waiting for completeness scores")
+            unresolved_genomes = qual_future.result()
+            qual_executor.shutdown()
+        if unresolved_genomes:
+            raise ValueError ("unable to get completeness scores for genomes: "+", ".join([genome['name'] for genome in unresolved_genomes]))
+        self.export_qual_score_cache (console)
+        
+
+        ### STEP 5: prepare quality files and run mOTUpan on clusters
+        self.log(console, "PREPARING FILES")
+        motupan_input_files = self.prepare_motupan_files (motupan_input_files,
+                                                          genome_names,
+                                                          genome_refs,
+                                                          genome_qual_scores,
+                                                          genome_qual_sources,
+                                                          console)
+        self.log(console, "RUNNING MOTUPAN")
+        motupan_files_params['input_qual_path'] = motupan_input_files['input_qual_path']
+        motupan_files_params['genome_name2ref_path'] = motupan_input_files['genome_name2ref_path']
+        motupan_files_params['output_pangenome_json_path'] = motupan_input_files['output_pangenome_json_path']
+        posterior_qual_path = self.run_mOTUpan_and_parse (motupan_files_params, clustering_files, console)
+        motupan_output_files = { 'pangenome_json': motupan_files_params['output_pangenome_json_path'],
+                                 'posterior_qual': posterior_qual_path
+                                 }
 
         
         ### STEP 6: save pangenome object
@@ -1064,7 +2001,12 @@ class kb_motupan:
                                                   pcp_file_links,
                                                   pcp_html_links,
                                                   show_circle_plot,
-                                                  console)
+                                                  console,
+                                                  report_message=self.get_completeness_report_text (genome_names,
+                                                                                                    genome_refs,
+                                                                                                    genome_qual_scores,
+                                                                                                    genome_qual_sources,
+                                                                                                    posterior_completeness=self.get_posterior_completeness(motupan_output_files.get('posterior_qual'))))
         
         output = {'report_name': report_info['name'],
                   'report_ref': report_info['ref']
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from kb_motupan.Utils.AnnotationCache import AnnotationCache, get_genome_ordinals, open_genome_obj_annotations, open_store_annotations
+from kb_motupan.Utils.AnnotationStore import AnnotationStore
+from kb_motupan.Utils.GeneCodes import GeneIdTable, ORDINAL_BITS
+
+
+class AnnotationCacheTest(unittest.TestCase):
+
+    FEATURES = {'genome_A': [{'id': 'a_1', 'aliases': [['gene', 'dnaK'], ['locus', 'X_1']], 'functions': ['chaperone'], 'protein_translation': 'MKV'},
+                             {'id': 'a_2', 'functions': [], 'protein_translation': 'MAAA'},
+                             {'id': 'a_3', 'functions': ['unclustered'], 'protein_translation': 'MW'}],
+                'genome_B': [{'id': 'b_1', 'aliases': [['gene', 'dnaK']], 'functions': ['chaperone', 'ATPase'], 'protein_translation': 'MKI'}]}
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.gene_id_table = GeneIdTable()
+        for genome_name in sorted(self.FEATURES.keys()):
+            for gene_i, feature in enumerate(self.FEATURES[genome_name]):
+                self.gene_id_table.add("{}_{}".format(genome_name, gene_i+1), feature['id'])
+        # a_3 isn't in any cluster
+        self.cluster_genes = self.gene_id_table.encode_cluster_genes({'clust_1': ['genome_B_1', 'genome_A_1'],
+                                                                      'clust_2': ['genome_A_2']})
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def check_annotations(self, annotation_cache):
+        self.assertEqual(set(annotation_cache.get_genome_names()), set(self.FEATURES.keys()))
+        # cluster order: genome B before genome A
+        self.assertEqual(annotation_cache.get(1, 1), (['dnaK'], ['chaperone', 'ATPase'], 'MKI'))
+        self.assertEqual(annotation_cache.get(0, 2), ([], [], 'MAAA'))
+        self.assertEqual(annotation_cache.get(0, 1), (['dnaK'], ['chaperone'], 'MKV'))
+        self.assertIsNone(annotation_cache.get(0, 3))
+        self.assertIsNone(annotation_cache.get(2, 1))
+        self.assertEqual(annotation_cache.gene_cnt, 3)
+
+    # HIDE @unittest.skip("skipped test_genome_ordinals_01()")  # uncomment to skip
+    def test_genome_ordinals_01 (self):
+        genome_ordinals = get_genome_ordinals(self.cluster_genes)
+        self.assertEqual({genome_i: list(ordinals) for genome_i, ordinals in genome_ordinals.items()},
+                         {0: [1, 2], 1: [1]})
+        self.assertEqual(self.cluster_genes['clust_1'][0], (1 << ORDINAL_BITS) | 1)
+
+    # HIDE @unittest.skip("skipped test_store_annotations_02()")  # uncomment to skip
+    def test_store_annotations_02 (self):
+        annotation_store_file = os.path.join(self.scratch, 'annotations.sqlite')
+        annotation_store = AnnotationStore(annotation_store_file)
+        for genome_name in sorted(self.FEATURES.keys()):
+            annotation_store.add_genome(genome_name, self.FEATURES[genome_name])
+        self.assertEqual(annotation_store.get_feature_annotations('genome_A', {'a_2', 'a_3', 'missing'}),
+                         {'a_2': ([], [], 'MAAA'), 'a_3': ([], ['unclustered'], 'MW')})
+        self.check_annotations(open_store_annotations(annotation_store_file, self.gene_id_table, self.cluster_genes))
+
+    # HIDE @unittest.skip("skipped test_genome_obj_annotations_03()")  # uncomment to skip
+    def test_genome_obj_annotations_03 (self):
+        genome_obj_paths = dict()
+        for genome_name in sorted(self.FEATURES.keys()):
+            genome_obj_paths[genome_name] = os.path.join(self.scratch, genome_name+'.json')
+            with open(genome_obj_paths[genome_name], 'w') as genome_obj_h:
+                json.dump({'id': genome_name, 'features': self.FEATURES[genome_name]}, genome_obj_h)
+        self.check_annotations(open_genome_obj_annotations(genome_obj_paths, self.gene_id_table, self.cluster_genes))
+
+    # HIDE @unittest.skip("skipped test_one_load_per_genome_04()")  # uncomment to skip
+    def test_one_load_per_genome_04 (self):
+        loads = []
+
+        def load_feature_annotations(genome_name, feature_ids):
+            loads.append((genome_name, sorted(feature_ids)))
+            return {feature['id']: ([], [], feature['protein_translation']) for feature in self.FEATURES[genome_name]}
+
+        annotation_cache = AnnotationCache(self.FEATURES.keys(), load_feature_annotations, self.gene_id_table, self.cluster_genes)
+        self.assertEqual(loads, [])
+        for (genome_i, ordinal) in [(1, 1), (0, 1), (1, 1), (0, 2), (0, 1)]:
+            annotation_cache.get(genome_i, ordinal)
+        self.assertEqual(loads, [('genome_A', ['a_1', 'a_2']), ('genome_B', ['b_1'])])
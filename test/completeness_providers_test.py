@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_motupan.Utils.CompletenessProviders import (CheckMProvider, GTDBMetadataProvider,
+                                                    get_completeness_providers, resolve_genome_qual_scores)
+from kb_motupan.Utils.QualScoreCache import QualScoreCache
+
+
+class CompletenessProvidersTest(unittest.TestCase):
+
+    GENOMES = [{'name': 'embedded_GCA_000000001.1', 'ref': '1/1/1'},
+               {'name': 'cached_GCA_000000002.1', 'ref': '1/2/1'},
+               {'name': 'gtdb_GCF_000000003.2_ASM3v2', 'ref': '1/3/1'},
+               {'name': 'unscored', 'ref': '1/4/1'}]
+
+    GTDB_ROWS = [['accession', 'ambiguous_bases', 'checkm_completeness', 'checkm_contamination'],
+                 ['GB_GCA_000000001.1', '0', '11.0', '1.0'],
+                 ['GB_GCA_000000002.1', '0', '22.0', '2.0'],
+                 ['RS_GCF_000000003.2', '0', '33.0', '3.0']]
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.log_msgs = []
+        self.gtdb_metadata_file = os.path.join(self.scratch, 'gtdb_metadata.tsv')
+        with open(self.gtdb_metadata_file, 'w') as gtdb_h:
+            for row in self.GTDB_ROWS:
+                gtdb_h.write("\t".join(row)+"\n")
+        self.qual_score_cache = QualScoreCache(os.path.join(self.scratch, 'qual_scores.sqlite'))
+        self.qual_score_cache.put_many({'1/1/1': {'completeness': 81.0, 'contamination': 0.5},
+                                        '1/2/1': {'completeness': 82.0, 'contamination': 0.5}}, 'CheckM-1')
+        self.embedded_qual_scores = {'embedded_GCA_000000001.1': {'completeness': 91.0, 'contamination': 0.1}}
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def get_providers(self, **kwargs):
+        return get_completeness_providers(self.embedded_qual_scores,
+                                          'CheckM-1',
+                                          self.log_msgs.append,
+                                          qual_score_cache=self.qual_score_cache,
+                                          gtdb_metadata_file=self.gtdb_metadata_file,
+                                          gtdb_metadata_index=os.path.join(self.scratch, 'gtdb_index.sqlite'),
+                                          **kwargs)
+
+    def resolve(self, providers):
+        (genome_qual_scores, genome_qual_sources) = (dict(), dict())
+        unresolved_genomes = resolve_genome_qual_scores(providers, list(self.GENOMES), genome_qual_scores, genome_qual_sources, self.log_msgs.append)
+        return (unresolved_genomes, genome_qual_scores, genome_qual_sources)
+
+    # HIDE @unittest.skip("skipped test_provider_priority_01()")  # uncomment to skip
+    def test_provider_priority_01 (self):
+        providers = self.get_providers()
+        self.assertEqual([provider.name for provider in providers], ['genome_obj', 'cache', 'gtdb_metadata'])
+
+        (unresolved_genomes, genome_qual_scores, genome_qual_sources) = self.resolve(providers)
+        # each genome is scored by the first provider that has it
+        self.assertEqual(genome_qual_sources, {'embedded_GCA_000000001.1': 'genome_obj',
+                                               'cached_GCA_000000002.1': 'cache',
+                                               'gtdb_GCF_000000003.2_ASM3v2': 'gtdb_metadata'})
+        self.assertEqual(genome_qual_scores['embedded_GCA_000000001.1']['completeness'], 91.0)
+        self.assertEqual(genome_qual_scores['cached_GCA_000000002.1']['completeness'], 82.0)
+        self.assertEqual(genome_qual_scores['gtdb_GCF_000000003.2_ASM3v2'], {'completeness': 33.0, 'contamination': 3.0})
+        self.assertEqual(unresolved_genomes, [{'name': 'unscored', 'ref': '1/4/1'}])
+
+    # HIDE @unittest.skip("skipped test_gtdb_accession_02()")  # uncomment to skip
+    def test_gtdb_accession_02 (self):
+        for (genome_name, accession) in [('GCA_000000001.1', 'GCA_000000001.1'),
+                                         ('Ecoli_GCF_000005845.2_ASM584v2', 'GCF_000005845.2'),
+                                         ('GCA_00000001.1', None),
+                                         ('GCA_000000001', None),
+                                         ('GCX_000000001.1', None)]:
+            self.assertEqual(GTDBMetadataProvider.get_accession(genome_name), accession, genome_name)
+
+        gtdb_provider = GTDBMetadataProvider(self.gtdb_metadata_file, os.path.join(self.scratch, 'gtdb_index.sqlite'), self.log_msgs.append)
+        self.assertEqual(gtdb_provider.get_scores([{'name': 'x_GCA_000000002.1', 'ref': '1/9/1'},
+                                                   {'name': 'x_GCA_000000002.2', 'ref': '1/9/2'},
+                                                   {'name': 'no_accession', 'ref': '1/9/3'}]),
+                         {'x_GCA_000000002.1': {'completeness': 22.0, 'contamination': 2.0}})
+
+        # GTDB scores are CheckM-1 scores
+        providers = get_completeness_providers(self.embedded_qual_scores, 'CheckM-2', self.log_msgs.append,
+                                               gtdb_metadata_file=self.gtdb_metadata_file,
+                                               gtdb_metadata_index=os.path.join(self.scratch, 'gtdb_index.sqlite'))
+        self.assertEqual([provider.name for provider in providers], ['genome_obj'])
+
+    # HIDE @unittest.skip("skipped test_genome_prior_override_03()")  # uncomment to skip
+    def test_genome_prior_override_03 (self):
+        providers = self.get_providers(genome_prior_completeness={'1/1/1': 50,
+                                                                  'embedded_GCA_000000001.1': 60,
+                                                                  'unscored': 70})
+        self.assertEqual(providers[0].name, 'user_prior')
+
+        (unresolved_genomes, genome_qual_scores, genome_qual_sources) = self.resolve(providers)
+        # user priors win over embedded scores, and the ref wins over the name
+        self.assertEqual(genome_qual_scores['embedded_GCA_000000001.1'], {'completeness': 50.0, 'contamination': 'N/A'})
+        self.assertEqual(genome_qual_scores['unscored'], {'completeness': 70.0, 'contamination': 'N/A'})
+        self.assertEqual(genome_qual_sources['embedded_GCA_000000001.1'], 'user_prior')
+        self.assertEqual(genome_qual_sources['cached_GCA_000000002.1'], 'cache')
+        self.assertEqual(unresolved_genomes, [])
+
+    # HIDE @unittest.skip("skipped test_checkm_gets_unresolved_only_04()")  # uncomment to skip
+    def test_checkm_gets_unresolved_only_04 (self):
+        checkm_runs = []
+
+        def run_checkm(genomes):
+            checkm_runs.append([genome['name'] for genome in genomes])
+            return {genome['name']: {'completeness': 99.0, 'contamination': 0.0} for genome in genomes}
+
+        # checkm mode: the chain has no fallback, so CheckM sees only what's left
+        (unresolved_genomes, genome_qual_scores, genome_qual_sources) = self.resolve(self.get_providers())
+        unresolved_genomes = resolve_genome_qual_scores([CheckMProvider(run_checkm, name='CheckM-1')],
+                                                        unresolved_genomes, genome_qual_scores, genome_qual_sources, self.log_msgs.append)
+        self.assertEqual(checkm_runs, [['unscored']])
+        self.assertEqual(genome_qual_sources['unscored'], 'CheckM-1')
+        self.assertEqual(unresolved_genomes, [])
+
+        # fast mode: the uniform prior takes the rest, so there is nothing left for CheckM
+        (unresolved_genomes, genome_qual_scores, genome_qual_sources) = self.resolve(self.get_providers(completeness_mode='fast', prior_completeness=80))
+        self.assertEqual(genome_qual_sources['unscored'], 'uniform_prior')
+        self.assertEqual(genome_qual_scores['unscored'], {'completeness': 80.0, 'contamination': 'N/A'})
+        self.assertEqual(unresolved_genomes, [])
+        resolve_genome_qual_scores([CheckMProvider(run_checkm, name='CheckM-1')],
+                                   unresolved_genomes, genome_qual_scores, genome_qual_sources, self.log_msgs.append)
+        self.assertEqual(checkm_runs, [['unscored']])
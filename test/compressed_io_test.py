@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_motupan.Utils import CompressedIO
+from kb_motupan.Utils.CompressedIO import (codec_path, compress_file, decompress_file, find_existing_path,
+                                           open_text, path_codec, resolve_codec, strip_codec_ext)
+
+
+class CompressedIOTest(unittest.TestCase):
+
+    TEXT = "clust_1\tgenome_A_1\nclust_1\tgène_B_2\n" * 100
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def get_codecs(self):
+        codecs = ['none', 'gzip']
+        if CompressedIO.zstandard is not None:
+            codecs.append('zstd')
+        return codecs
+
+    # HIDE @unittest.skip("skipped test_codec_round_trip_01()")  # uncomment to skip
+    def test_codec_round_trip_01 (self):
+        for codec in self.get_codecs():
+            path = codec_path(os.path.join(self.scratch, 'clusters.tsv'), codec)
+            self.assertEqual(path_codec(path), codec)
+            self.assertEqual(strip_codec_ext(path), os.path.join(self.scratch, 'clusters.tsv'))
+            with open_text(path, 'w') as out_handle:
+                out_handle.write(self.TEXT)
+            with open_text(path, 'r') as in_handle:
+                self.assertEqual(in_handle.read(), self.TEXT)
+            os.remove(path)
+
+    # HIDE @unittest.skip("skipped test_compress_decompress_02()")  # uncomment to skip
+    def test_compress_decompress_02 (self):
+        path = os.path.join(self.scratch, 'clusters.tsv')
+        for codec in self.get_codecs()[1:]:
+            with open_text(path, 'w') as out_handle:
+                out_handle.write(self.TEXT)
+            compressed_path = compress_file(path, codec)
+            self.assertEqual(compressed_path, codec_path(path, codec))
+            self.assertFalse(os.path.exists(path))
+            with open_text(compressed_path, 'r') as in_handle:
+                self.assertEqual(in_handle.read(), self.TEXT)
+
+            self.assertEqual(decompress_file(compressed_path), path)
+            self.assertFalse(os.path.exists(compressed_path))
+            with open(path, 'r', encoding='utf-8') as in_handle:
+                self.assertEqual(in_handle.read(), self.TEXT)
+
+        self.assertEqual(compress_file(path, 'none'), path)
+
+    # HIDE @unittest.skip("skipped test_find_existing_path_03()")  # uncomment to skip
+    def test_find_existing_path_03 (self):
+        path = os.path.join(self.scratch, 'clusters.tsv')
+        self.assertEqual(find_existing_path(path), path)
+
+        with open_text(codec_path(path, 'gzip'), 'w') as out_handle:
+            out_handle.write(self.TEXT)
+        self.assertEqual(find_existing_path(path), path+'.gz')
+
+        with open_text(path, 'w') as out_handle:
+            out_handle.write(self.TEXT)
+        self.assertEqual(find_existing_path(path), path)
+
+    # HIDE @unittest.skip("skipped test_resolve_codec_04()")  # uncomment to skip
+    def test_resolve_codec_04 (self):
+        self.assertEqual(resolve_codec(None), 'none')
+        self.assertEqual(resolve_codec('GZ'), 'gzip')
+        self.assertEqual(resolve_codec('zst'), 'zstd' if CompressedIO.zstandard is not None else 'gzip')
+        with self.assertRaises(ValueError):
+            resolve_codec('bz2')
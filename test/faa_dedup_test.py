@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_motupan.Utils.FaaDedup import dedup_faa_file, expand_dedup_clusters
+
+
+class FaaDedupTest(unittest.TestCase):
+
+    # genome_B_2 repeats genome_A_1 across a different line wrap,
+    # genome_A_3 and genome_B_3 repeat genome_A_2
+    FAA = (">genome_A_1 dnaK\nMKVLAAGIDL\nGTTNS\n"
+           ">genome_A_2\nMAAAW\n"
+           ">genome_A_3\nMAAAW\n"
+           ">genome_B_1\nMKIL\n"
+           ">genome_B_2 dnaK\nMKV\nLAAGIDLGTTNS\n"
+           ">genome_B_3\nMAAA\nW\n")
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.faa_path = os.path.join(self.scratch, 'all.faa')
+        with open(self.faa_path, 'w') as faa_h:
+            faa_h.write(self.FAA)
+        self.dedup_faa_path = os.path.join(self.scratch, 'all.dedup.faa')
+        self.dup_map_path = os.path.join(self.scratch, 'all.dup_map.tsv')
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def read_clusters(self, cluster_path):
+        clusters = dict()
+        with open(cluster_path, 'r') as cluster_h:
+            for line in cluster_h:
+                (cluster_id, gene_id) = line.rstrip().split("\t")
+                clusters.setdefault(cluster_id, []).append(gene_id)
+        return clusters
+
+    # HIDE @unittest.skip("skipped test_dedup_faa_01()")  # uncomment to skip
+    def test_dedup_faa_01 (self):
+        self.assertEqual(dedup_faa_file(self.faa_path, self.dedup_faa_path, self.dup_map_path), (6, 3))
+        with open(self.dedup_faa_path, 'r') as dedup_faa_h:
+            self.assertEqual(dedup_faa_h.read(),
+                             ">genome_A_1 dnaK\nMKVLAAGIDLGTTNS\n"
+                             ">genome_A_2\nMAAAW\n"
+                             ">genome_B_1\nMKIL\n")
+        with open(self.dup_map_path, 'r') as dup_map_h:
+            self.assertEqual(dup_map_h.read(),
+                             "genome_A_2\tgenome_A_3\n"
+                             "genome_A_1\tgenome_B_2\n"
+                             "genome_A_2\tgenome_B_3\n")
+
+    # HIDE @unittest.skip("skipped test_expand_clusters_02()")  # uncomment to skip
+    def test_expand_clusters_02 (self):
+        dedup_faa_file(self.faa_path, self.dedup_faa_path, self.dup_map_path)
+
+        # stand-in for mmseqs over the deduped faa: genome_B_1 joins genome_A_1
+        dedup_cluster_path = os.path.join(self.scratch, 'dedup_cluster.tsv')
+        with open(dedup_cluster_path, 'w') as dedup_cluster_h:
+            dedup_cluster_h.write("genome_A_1\tgenome_A_1\n"
+                                  "genome_A_1\tgenome_B_1\n"
+                                  "genome_A_2\tgenome_A_2\n")
+        cluster_path = os.path.join(self.scratch, 'cluster.tsv')
+        expand_dedup_clusters(dedup_cluster_path, self.dup_map_path, cluster_path)
+
+        clusters = self.read_clusters(cluster_path)
+        input_gene_ids = [line[1:].split()[0] for line in self.FAA.splitlines() if line.startswith('>')]
+        expanded_gene_ids = [gene_id for cluster_gene_ids in clusters.values() for gene_id in cluster_gene_ids]
+        # every input gene comes back exactly once
+        self.assertEqual(sorted(expanded_gene_ids), sorted(input_gene_ids))
+        # and each duplicate sits in its kept copy's cluster
+        self.assertEqual({cluster_id: sorted(gene_ids) for cluster_id, gene_ids in clusters.items()},
+                         {'genome_A_1': ['genome_A_1', 'genome_B_1', 'genome_B_2'],
+                          'genome_A_2': ['genome_A_2', 'genome_A_3', 'genome_B_3']})
+
+    # HIDE @unittest.skip("skipped test_no_dups_03()")  # uncomment to skip
+    def test_no_dups_03 (self):
+        with open(self.faa_path, 'w') as faa_h:
+            faa_h.write(">g_1\nMKV\n>g_2\nMKI\n")
+        self.assertEqual(dedup_faa_file(self.faa_path, self.dedup_faa_path, self.dup_map_path), (2, 2))
+        self.assertEqual(os.path.getsize(self.dup_map_path), 0)
+
+        dedup_cluster_path = os.path.join(self.scratch, 'dedup_cluster.tsv')
+        with open(dedup_cluster_path, 'w') as dedup_cluster_h:
+            dedup_cluster_h.write("g_1\tg_1\ng_2\tg_2\n")
+        cluster_path = os.path.join(self.scratch, 'cluster.tsv')
+        expand_dedup_clusters(dedup_cluster_path, self.dup_map_path, cluster_path)
+        self.assertEqual(self.read_clusters(cluster_path), {'g_1': ['g_1'], 'g_2': ['g_2']})
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_motupan.Utils.GeneCodes import ORDINAL_BITS
+from kb_motupan.Utils.GeneIdMap import GeneIdMap, GeneIdMapWriter, GENE_ID_MAP_EXT, is_gene_id_map, open_gene_id_map
+
+
+class GeneIdMapTest(unittest.TestCase):
+
+    GENOME_GENE_IDS = [('genome_A', ['gene_1', 'gene_2', 'gène_3']),
+                       ('genome_B', []),
+                       ('genome_C', ['c_1'])]
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    def write_map(self):
+        map_path = os.path.join(self.scratch, 'run'+GENE_ID_MAP_EXT)
+        with GeneIdMapWriter(map_path) as writer:
+            for (genome_name, source_gene_ids) in self.GENOME_GENE_IDS:
+                writer.add_genome(genome_name)
+                for gene_i, source_gene_id in enumerate(source_gene_ids):
+                    self.assertEqual(writer.add_gene(source_gene_id), gene_i+1)
+        return map_path
+
+    # HIDE @unittest.skip("skipped test_binary_round_trip_01()")  # uncomment to skip
+    def test_binary_round_trip_01 (self):
+        map_path = self.write_map()
+        self.assertTrue(is_gene_id_map(map_path))
+        self.assertEqual(os.listdir(self.scratch), [os.path.basename(map_path)])
+
+        gene_id_map = open_gene_id_map(map_path)
+        self.assertIsInstance(gene_id_map, GeneIdMap)
+        try:
+            self.assertEqual(gene_id_map.genome_names, [genome_name for (genome_name, source_gene_ids) in self.GENOME_GENE_IDS])
+            for genome_i, (genome_name, source_gene_ids) in enumerate(self.GENOME_GENE_IDS):
+                self.assertEqual(gene_id_map.genome_index[genome_name], genome_i)
+                self.assertEqual(list(gene_id_map.source_gene_ids[genome_i]), [None] + source_gene_ids)
+            self.assertEqual(gene_id_map.lookup('genome_A_3'), 'gène_3')
+            self.assertEqual(gene_id_map.encode('genome_C_1'), (2 << ORDINAL_BITS) | 1)
+            with self.assertRaises(IndexError):
+                gene_id_map.source_gene_ids[0][4]
+            with self.assertRaises(ValueError):
+                gene_id_map.add('genome_A_4', 'gene_4')
+        finally:
+            gene_id_map.close()
+
+    # HIDE @unittest.skip("skipped test_text_map_fallback_02()")  # uncomment to skip
+    def test_text_map_fallback_02 (self):
+        map_path = os.path.join(self.scratch, 'run.gene_id_map')
+        with open(map_path, 'w', encoding='utf-8') as map_handle:
+            for (genome_name, source_gene_ids) in self.GENOME_GENE_IDS:
+                for gene_i, source_gene_id in enumerate(source_gene_ids):
+                    map_handle.write("{}_{}\t{}.f:{}\n".format(genome_name, gene_i+1, genome_name, source_gene_id))
+        self.assertFalse(is_gene_id_map(map_path))
+
+        gene_id_table = open_gene_id_map(map_path)
+        self.assertNotIsInstance(gene_id_table, GeneIdMap)
+        self.assertEqual(gene_id_table.lookup('genome_A_3'), 'gène_3')
+        self.assertEqual(gene_id_table.lookup('genome_C_1'), 'c_1')
+
+    # HIDE @unittest.skip("skipped test_writer_error_cleanup_03()")  # uncomment to skip
+    def test_writer_error_cleanup_03 (self):
+        map_path = os.path.join(self.scratch, 'run'+GENE_ID_MAP_EXT)
+        with self.assertRaises(RuntimeError):
+            with GeneIdMapWriter(map_path) as writer:
+                writer.add_genome('genome_A')
+                writer.add_gene('gene_1')
+                raise RuntimeError('interrupted')
+        self.assertEqual(os.listdir(self.scratch), [])
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import unittest
+
+from kb_motupan.Utils.JSONStream import dump_streaming
+
+
+class JSONStreamTest(unittest.TestCase):
+
+    ORTHOLOGS = [{'id': 'clust_1',
+                  'orthologs': [['gene_1', 1, '1/2/3'], ['gène_2', 2, '1/4/5']],
+                  'function': 'kinase;ATP binding',
+                  'protein_translation_source': None},
+                 {'id': 'clust_2',
+                  'orthologs': [],
+                  'gene_name': [],
+                  'mean_copies': 1.5}]
+
+    def get_pangenome_obj(self, orthologs):
+        return {'id': 'pg',
+                'name': 'pg',
+                'orthologs': orthologs,
+                'genome_refs': ['1/2/3', '1/4/5'],
+                'genome_name_to_ref': {'genome_A': '1/2/3'}}
+
+    def assertDumpMatches(self, orthologs, **dump_kwargs):
+        expected = io.StringIO()
+        json.dump(self.get_pangenome_obj(list(orthologs)), expected, **dump_kwargs)
+        streamed = io.StringIO()
+        dump_streaming(self.get_pangenome_obj(iter(orthologs)), streamed, **dump_kwargs)
+        self.assertEqual(streamed.getvalue(), expected.getvalue())
+
+    # HIDE @unittest.skip("skipped test_matches_json_dump_01()")  # uncomment to skip
+    def test_matches_json_dump_01 (self):
+        self.assertDumpMatches(self.ORTHOLOGS, indent=4, ensure_ascii=False)
+        self.assertDumpMatches(self.ORTHOLOGS, indent=2, ensure_ascii=True)
+
+    # HIDE @unittest.skip("skipped test_empty_stream_02()")  # uncomment to skip
+    def test_empty_stream_02 (self):
+        self.assertDumpMatches([], indent=4, ensure_ascii=False)
+
+    # HIDE @unittest.skip("skipped test_generator_consumed_once_03()")  # uncomment to skip
+    def test_generator_consumed_once_03 (self):
+        yielded = []
+
+        def gen_orthologs():
+            for ortholog in self.ORTHOLOGS:
+                yielded.append(ortholog['id'])
+                yield ortholog
+
+        streamed = io.StringIO()
+        dump_streaming(self.get_pangenome_obj(gen_orthologs()), streamed)
+        self.assertEqual(yielded, ['clust_1', 'clust_2'])
+        self.assertEqual(json.loads(streamed.getvalue()), self.get_pangenome_obj(self.ORTHOLOGS))
+
+    # HIDE @unittest.skip("skipped test_empty_obj_04()")  # uncomment to skip
+    def test_empty_obj_04 (self):
+        streamed = io.StringIO()
+        dump_streaming({}, streamed)
+        self.assertEqual(streamed.getvalue(), json.dumps({}, indent=4))
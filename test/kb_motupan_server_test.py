@@ -337,6 +337,63 @@ class kb_motupanTest(unittest.TestCase):
 
         pass
 
+
+    #### test_run_mmseqs2_and_mptupan_sweep_04 ():
+    #
+    # HIDE @unittest.skip("skipped test_run_mmseqs2_and_mptupan_sweep_04()")  # uncomment to skip
+    def test_run_mmseqs2_and_mptupan_sweep_04 (self):
+        method = 'test_run_mmseqs2_and_mptupan_sweep_04'
+        msg = "RUNNING: " + method + "()"
+        print("\n\n" + msg)
+        print("=" * len(msg) + "\n\n")
+
+        # put test data somewhere to run
+        run_dir = os.path.join(self.scratch, 'motupan_sweep_test')
+        if not os.path.exists(run_dir):
+            os.makedirs(run_dir)
+
+        target = 'g__Archaeoglobus'
+        output_pg_path = os.path.join (run_dir, target+'-mOTUpan-pangenome.json')
+        faa_file = target+'.faa'
+        qual_file = target+'.checkm'
+        id_map_file = target+'.gene_id_map'
+        genome_id_map_file = target+'.genome_name_to_ref.map'
+        faa_path = os.path.join (run_dir, faa_file)
+        qual_path = os.path.join (run_dir, qual_file)
+        id_map_path = os.path.join (run_dir, id_map_file)
+        genome_id_map_path = os.path.join (run_dir, genome_id_map_file)
+        shutil.copy (os.path.join('data',faa_file), faa_path)
+        shutil.copy (os.path.join('data',qual_file), qual_path)
+        shutil.copy (os.path.join('data',id_map_file), id_map_path)
+        shutil.copy (os.path.join('data',genome_id_map_file), genome_id_map_path)
+
+
+        sweep_combos = [ {'min_seq_id': 0.0, 'min_coverage': 0.8},
+                         {'min_seq_id': 0.5, 'min_coverage': 0.8},
+                         {'min_seq_id': 0.9, 'min_coverage': 0.9}
+                         ]
+        params = { 'input_faa_path': faa_path,
+                   'input_qual_path': qual_path,
+                   'input_gene_id_map_path': id_map_path,
+                   'genome_name2ref_path': genome_id_map_path,
+                   'run_dir': run_dir,
+                   'output_pangenome_json_path': output_pg_path,
+                   'sweep_combos': sweep_combos,
+                   'motupan_max_iter': 1,
+                   'force_redo': 1
+        }
+        
+        ret = self.serviceImpl.run_mmseqs2_and_mOTUpan_sweep (self.ctx, params)
+
+        print('RESULT:')
+        pprint(ret)
+
+        self.assertEqual (len(ret[0]['sweep_results']), len(sweep_combos))
+        for sweep_result in ret[0]['sweep_results']:
+            self.assertTrue (os.path.isfile (sweep_result['pangenome_json']))
+
+        pass
+
     
     #### test_upload_pangenomes ():
     #
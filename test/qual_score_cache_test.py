@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from kb_motupan.Utils.QualScoreCache import QualScoreCache
+
+
+class QualScoreCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch)
+
+    # HIDE @unittest.skip("skipped test_put_get_01()")  # uncomment to skip
+    def test_put_get_01 (self):
+        qual_score_cache = QualScoreCache(os.path.join(self.scratch, 'a.sqlite'))
+        qual_score_cache.put_many({'1/2/3': {'completeness': 97.5, 'contamination': 1.25},
+                                   '1/4/5': {'completeness': 90}}, 'v1.0.18')
+        self.assertEqual(qual_score_cache.get_many(['1/2/3', '1/4/5', '1/6/7'], 'v1.0.18'),
+                         {'1/2/3': {'completeness': 97.5, 'contamination': 1.25},
+                          '1/4/5': {'completeness': 90.0, 'contamination': 'N/A'}})
+        self.assertEqual(qual_score_cache.get_many(['1/2/3'], 'v1.2.2'), {})
+
+    # HIDE @unittest.skip("skipped test_export_union_02()")  # uncomment to skip
+    def test_export_union_02 (self):
+        tsv_path = os.path.join(self.scratch, 'shared', 'qual_scores.tsv')
+        os.makedirs(os.path.dirname(tsv_path))
+        worker_a = QualScoreCache(os.path.join(self.scratch, 'a.sqlite'))
+        worker_b = QualScoreCache(os.path.join(self.scratch, 'b.sqlite'))
+        worker_a.put_many({'1/2/3': {'completeness': 97.5, 'contamination': 1.25}}, 'v1.0.18')
+        worker_b.put_many({'1/4/5': {'completeness': 88.0, 'contamination': 3.5}}, 'v1.0.18')
+        worker_b.put_many({'1/2/3': {'completeness': 96.0, 'contamination': 1.5}}, 'v1.2.2')
+
+        self.assertEqual(worker_a.export_tsv(tsv_path), 1)
+        self.assertEqual(worker_b.export_tsv(tsv_path), 3)
+
+        # neither worker's scores are lost, and no temp files are left behind
+        reader = QualScoreCache(os.path.join(self.scratch, 'reader.sqlite'))
+        self.assertEqual(reader.import_tsv(tsv_path), 3)
+        self.assertEqual(reader.get_many(['1/2/3', '1/4/5'], 'v1.0.18'),
+                         {'1/2/3': {'completeness': 97.5, 'contamination': 1.25},
+                          '1/4/5': {'completeness': 88.0, 'contamination': 3.5}})
+        self.assertEqual(reader.get_many(['1/2/3'], 'v1.2.2'),
+                         {'1/2/3': {'completeness': 96.0, 'contamination': 1.5}})
+        self.assertEqual(sorted(os.listdir(os.path.dirname(tsv_path))), ['qual_scores.tsv', 'qual_scores.tsv.lock'])
+
+        # a later export from the first worker keeps the second worker's rows
+        self.assertEqual(worker_a.export_tsv(tsv_path), 3)
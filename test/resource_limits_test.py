@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from kb_motupan.Utils import ResourceLimits
+from kb_motupan.Utils.ResourceLimits import get_cpu_limit, get_memory_limit, parse_memory, format_memory
+
+
+class ResourceLimitsTest(unittest.TestCase):
+
+    HOST_CPUS = 8
+    PAGE_SIZE = 4096
+    HOST_MEMORY = 16 * 1024**3
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.cgroup_root = os.path.join(self.scratch, 'cgroup')
+        self.patches = [mock.patch.object(ResourceLimits, 'CGROUP_ROOT', self.cgroup_root),
+                        mock.patch.object(ResourceLimits.os, 'sched_getaffinity', return_value=set(range(self.HOST_CPUS)), create=True),
+                        mock.patch.object(ResourceLimits.os, 'sysconf', side_effect=self.sysconf)]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.scratch)
+
+    def sysconf(self, name):
+        return {'SC_PAGE_SIZE': self.PAGE_SIZE, 'SC_PHYS_PAGES': self.HOST_MEMORY // self.PAGE_SIZE}[name]
+
+    def write_cgroup_files(self, cgroup_files):
+        shutil.rmtree(self.cgroup_root, ignore_errors=True)
+        for (rel_path, content) in cgroup_files.items():
+            path = os.path.join(self.cgroup_root, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as cgroup_h:
+                cgroup_h.write(content+"\n")
+
+    # HIDE @unittest.skip("skipped test_cpu_limit_01()")  # uncomment to skip
+    def test_cpu_limit_01 (self):
+        for (cgroup_files, cpu_cnt) in [({}, 8),
+                                        # cgroup v2
+                                        ({'cpu.max': 'max 100000'}, 8),
+                                        ({'cpu.max': '400000 100000'}, 4),
+                                        ({'cpu.max': '250000 100000'}, 2),
+                                        ({'cpu.max': '50000 100000'}, 1),
+                                        ({'cpu.max': '3200000 100000'}, 8),
+                                        ({'cpu.max': '300000'}, 3),
+                                        # cgroup v1
+                                        ({'cpu/cpu.cfs_quota_us': '-1', 'cpu/cpu.cfs_period_us': '100000'}, 8),
+                                        ({'cpu/cpu.cfs_quota_us': '200000', 'cpu/cpu.cfs_period_us': '100000'}, 2),
+                                        ({'cpu/cpu.cfs_quota_us': '200000'}, 8),
+                                        # v2 wins over v1
+                                        ({'cpu.max': 'max 100000', 'cpu/cpu.cfs_quota_us': '200000', 'cpu/cpu.cfs_period_us': '100000'}, 8)]:
+            self.write_cgroup_files(cgroup_files)
+            self.assertEqual(get_cpu_limit(), cpu_cnt, cgroup_files)
+
+    # HIDE @unittest.skip("skipped test_memory_limit_02()")  # uncomment to skip
+    def test_memory_limit_02 (self):
+        for (cgroup_files, mem_bytes) in [({}, self.HOST_MEMORY),
+                                          # cgroup v2
+                                          ({'memory.max': 'max'}, self.HOST_MEMORY),
+                                          ({'memory.max': str(4 * 1024**3)}, 4 * 1024**3),
+                                          ({'memory.max': str(64 * 1024**3)}, self.HOST_MEMORY),
+                                          # cgroup v1
+                                          ({'memory/memory.limit_in_bytes': str(2 * 1024**3)}, 2 * 1024**3),
+                                          ({'memory/memory.limit_in_bytes': '9223372036854771712'}, self.HOST_MEMORY),
+                                          # v2 "max" falls through to v1
+                                          ({'memory.max': 'max', 'memory/memory.limit_in_bytes': str(3 * 1024**3)}, 3 * 1024**3)]:
+            self.write_cgroup_files(cgroup_files)
+            self.assertEqual(get_memory_limit(), mem_bytes, cgroup_files)
+
+        # no physical memory reading: the cgroup limit alone, else unknown
+        with mock.patch.object(ResourceLimits.os, 'sysconf', side_effect=ValueError):
+            self.write_cgroup_files({'memory.max': str(4 * 1024**3)})
+            self.assertEqual(get_memory_limit(), 4 * 1024**3)
+            self.write_cgroup_files({'memory.max': 'max'})
+            self.assertIsNone(get_memory_limit())
+
+    # HIDE @unittest.skip("skipped test_parse_memory_03()")  # uncomment to skip
+    def test_parse_memory_03 (self):
+        for (mem_str, mem_bytes) in [('1024', 1024),
+                                     (2048, 2048),
+                                     ('16G', 16 * 1024**3),
+                                     ('16g', 16 * 1024**3),
+                                     ('16GB', 16 * 1024**3),
+                                     (' 512 M ', 512 * 1024**2),
+                                     ('8K', 8 * 1024),
+                                     ('1T', 1024**4)]:
+            self.assertEqual(parse_memory(mem_str), mem_bytes, mem_str)
+
+        for mem_str in ['', 'G', '1.5G', '-1G', '16X', '16 GiB']:
+            with self.assertRaises(ValueError, msg=mem_str):
+                parse_memory(mem_str)
+
+    # HIDE @unittest.skip("skipped test_format_memory_04()")  # uncomment to skip
+    def test_format_memory_04 (self):
+        for (mem_bytes, mem_str) in [(16 * 1024**3, '16G'),
+                                     (16 * 1024**3 + 512 * 1024**2, '16G'),
+                                     (1024**3, '1G'),
+                                     (1024**3 - 1, '1023M'),
+                                     (512 * 1024**2, '512M'),
+                                     (1024, '1M'),
+                                     (0, '1M')]:
+            self.assertEqual(format_memory(mem_bytes), mem_str, mem_bytes)
+            if mem_bytes >= 1024**2:
+                self.assertLessEqual(parse_memory(mem_str), mem_bytes)